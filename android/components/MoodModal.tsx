@@ -1,4 +1,4 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import {
   ActivityIndicator,
   Alert,
@@ -21,6 +21,10 @@ import TagPicker from './TagPicker';
 import { scheduleReminder } from '@/lib/useNotifications';
 import { friendlyError } from '@/lib/errors';
 
+// Sent as clientMutationId so retrying after a lost response can't log twice
+const newMutationId = () =>
+  `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
 export default function MoodModal({ onSaved }: { onSaved: () => void }) {
   const open = useStore((s) => s.moodModalOpen);
   const close = useStore((s) => s.closeMoodModal);
@@ -31,6 +35,7 @@ export default function MoodModal({ onSaved }: { onSaved: () => void }) {
   const [selectedTags, setSelectedTags] = useState<string[]>([]);
 
   const [logResult, logMood] = useMutation(LOG_MOOD_MUTATION);
+  const mutationId = useRef(newMutationId());
 
   const submit = async () => {
     if (!mood || !userId) return;
@@ -39,6 +44,7 @@ export default function MoodModal({ onSaved }: { onSaved: () => void }) {
         mood,
         notes: notes || null,
         tags: selectedTags.length ? selectedTags : null,
+        clientMutationId: mutationId.current,
       },
     });
     if (result.error) {
@@ -46,6 +52,7 @@ export default function MoodModal({ onSaved }: { onSaved: () => void }) {
       return;
     }
     scheduleReminder();
+    mutationId.current = newMutationId();
     setMood(null);
     setNotes('');
     setSelectedTags([]);
@@ -55,6 +62,7 @@ export default function MoodModal({ onSaved }: { onSaved: () => void }) {
 
   useEffect(() => {
     if (!open) {
+      mutationId.current = newMutationId();
       setMood(null);
       setNotes('');
       setSelectedTags([]);
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 """Generate client-specific GraphQL files from shared .graphql operations."""
 
+import json
+from hashlib import sha256
 from pathlib import Path
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
@@ -11,8 +13,11 @@ CLJS_ORDER = [
     "users",
     "user",
     "mood-entries",
+    "mood-stats",
+    "changes-since",
     "tags",
     "log-mood",
+    "log-moods",
     "archive-entry",
     "update-tag-metadata",
     "archive-tag",
@@ -25,9 +30,17 @@ CLJS_ORDER = [
     "search-users",
 ]
 
-TS_QUERIES_ORDER = ["users", "mood-entries", "search-users", "tags"]
+TS_QUERIES_ORDER = [
+    "users",
+    "mood-entries",
+    "mood-stats",
+    "changes-since",
+    "search-users",
+    "tags",
+]
 TS_MUTATIONS_ORDER = [
     "log-mood",
+    "log-moods",
     "update-tag-metadata",
     "archive-tag",
     "unarchive-tag",
@@ -54,15 +67,16 @@ def to_screaming_snake(name: str) -> str:
 # -- ClojureScript ------------------------------------------------------------
 
 
+def cljs_text(content: str) -> str:
+    """The query string as the ClojureScript literal evaluates it."""
+    first, *rest = content.split("\n")
+    return "\n".join([first, *("   " + line for line in rest)])
+
+
 def format_cljs_def(name: str, content: str) -> str:
     suffix = "mutation" if is_mutation(content) else "query"
     def_name = f"{name}-{suffix}"
-    lines = content.split("\n")
-    if len(lines) == 1:
-        return f'(def {def_name}\n  "{content}")'
-    first, *rest = lines
-    indented = "\n".join("   " + line for line in rest)
-    return f'(def {def_name}\n  "{first}\n{indented}")'
+    return f'(def {def_name}\n  "{cljs_text(content)}")'
 
 
 def generate_cljs() -> None:
@@ -81,11 +95,16 @@ def generate_cljs() -> None:
 # -- TypeScript ----------------------------------------------------------------
 
 
+def ts_text(content: str) -> str:
+    """The query string as the TypeScript template literal evaluates it."""
+    indented = "\n".join("  " + line for line in content.split("\n"))
+    return f"\n{indented}\n"
+
+
 def format_ts_export(name: str, content: str) -> str:
     suffix = "MUTATION" if is_mutation(content) else "QUERY"
     const_name = f"{to_screaming_snake(name)}_{suffix}"
-    indented = "\n".join("  " + line for line in content.split("\n"))
-    return f"export const {const_name} = `\n{indented}\n`;"
+    return f"export const {const_name} = `{ts_text(content)}`;"
 
 
 def generate_ts() -> None:
@@ -103,7 +122,27 @@ def generate_ts() -> None:
     print(f"  {path.relative_to(REPO_ROOT)}")
 
 
+# -- Persisted query manifest ---------------------------------------------------
+
+
+def build_manifest() -> dict[str, str]:
+    """sha256 → query text for every operation, as each client sends it."""
+    manifest = {}
+    for path in sorted(OPS_DIR.glob("*.graphql")):
+        content = read_operation(path.stem)
+        for text in (content, cljs_text(content), ts_text(content)):
+            manifest[sha256(text.encode()).hexdigest()] = text
+    return manifest
+
+
+def generate_manifest() -> None:
+    path = REPO_ROOT / "graphql" / "persisted-queries.json"
+    path.write_text(json.dumps(build_manifest(), indent=2, sort_keys=True) + "\n")
+    print(f"  {path.relative_to(REPO_ROOT)}")
+
+
 if __name__ == "__main__":
     print("Generated:")
     generate_cljs()
     generate_ts()
+    generate_manifest()
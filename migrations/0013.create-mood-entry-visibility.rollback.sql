@@ -0,0 +1,2 @@
+DROP TABLE IF EXISTS mood_entry_visibility;
+DROP FUNCTION IF EXISTS mood_share_allows(uuid, uuid);
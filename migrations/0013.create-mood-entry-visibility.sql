@@ -0,0 +1,54 @@
+-- depends: 0012.auth-codes-failed-attempts
+
+-- Whether a share rule lets its viewer see a given entry. Mirrors the
+-- include/exclude filter logic of the live timeline query.
+CREATE OR REPLACE FUNCTION mood_share_allows(share_id uuid, entry_id uuid)
+RETURNS boolean AS $$
+    SELECT (
+        NOT EXISTS (
+            SELECT 1 FROM mood_share_filters f
+            WHERE f.mood_share_id = share_id
+              AND f.is_include = true
+              AND f.archived_at IS NULL
+        )
+        OR EXISTS (
+            SELECT 1 FROM mood_share_filters f
+            JOIN mood_entry_tags met ON met.mood_entry_id = entry_id
+            WHERE f.mood_share_id = share_id
+              AND f.is_include = true
+              AND f.archived_at IS NULL
+              AND met.tag_name ~ f.pattern
+        )
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM mood_share_filters f
+        JOIN mood_entry_tags met ON met.mood_entry_id = entry_id
+        WHERE f.mood_share_id = share_id
+          AND f.is_include = false
+          AND f.archived_at IS NULL
+          AND met.tag_name ~ f.pattern
+    )
+$$ LANGUAGE sql STABLE;
+
+CREATE TABLE IF NOT EXISTS mood_entry_visibility (
+    viewer_id   uuid    NOT NULL REFERENCES users (id),
+    entry_id    uuid    NOT NULL REFERENCES mood_entries (id),
+    user_id     uuid    NOT NULL REFERENCES users (id),
+    PRIMARY KEY (viewer_id, entry_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_mood_entry_visibility_author
+    ON mood_entry_visibility (viewer_id, user_id, entry_id);
+
+-- Authors always see their own entries
+INSERT INTO mood_entry_visibility (viewer_id, entry_id, user_id)
+SELECT me.user_id, me.id, me.user_id
+FROM mood_entries me
+ON CONFLICT DO NOTHING;
+
+INSERT INTO mood_entry_visibility (viewer_id, entry_id, user_id)
+SELECT ms.shared_with, me.id, me.user_id
+FROM mood_entries me
+JOIN mood_shares ms ON ms.user_id = me.user_id AND ms.archived_at IS NULL
+WHERE mood_share_allows(ms.id, me.id)
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,29 @@
+CREATE OR REPLACE FUNCTION mood_share_allows(share_id uuid, entry_id uuid)
+RETURNS boolean AS $$
+    SELECT (
+        NOT EXISTS (
+            SELECT 1 FROM mood_share_filters f
+            WHERE f.mood_share_id = share_id
+              AND f.is_include = true
+              AND f.archived_at IS NULL
+        )
+        OR EXISTS (
+            SELECT 1 FROM mood_share_filters f
+            JOIN mood_entry_tags met ON met.mood_entry_id = entry_id
+            WHERE f.mood_share_id = share_id
+              AND f.is_include = true
+              AND f.archived_at IS NULL
+              AND met.tag_name ~ f.pattern
+        )
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM mood_share_filters f
+        JOIN mood_entry_tags met ON met.mood_entry_id = entry_id
+        WHERE f.mood_share_id = share_id
+          AND f.is_include = false
+          AND f.archived_at IS NULL
+          AND met.tag_name ~ f.pattern
+    )
+$$ LANGUAGE sql STABLE;
+
+DROP TABLE IF EXISTS share_filter_tag_matches;
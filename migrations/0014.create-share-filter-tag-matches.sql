@@ -0,0 +1,49 @@
+-- depends: 0013.create-mood-entry-visibility
+
+-- Tags matched by each share filter's regex, computed once when the filter
+-- or the tag is created instead of on every visibility check.
+CREATE TABLE IF NOT EXISTS share_filter_tag_matches (
+    filter_id   uuid    NOT NULL REFERENCES mood_share_filters (id) ON DELETE CASCADE,
+    tag_name    text    NOT NULL REFERENCES tags (name),
+    PRIMARY KEY (filter_id, tag_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_share_filter_tag_matches_tag_name
+    ON share_filter_tag_matches (tag_name);
+
+INSERT INTO share_filter_tag_matches (filter_id, tag_name)
+SELECT f.id, t.name
+FROM mood_share_filters f
+JOIN tags t ON t.name ~ f.pattern
+WHERE f.archived_at IS NULL
+ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION mood_share_allows(share_id uuid, entry_id uuid)
+RETURNS boolean AS $$
+    SELECT (
+        NOT EXISTS (
+            SELECT 1 FROM mood_share_filters f
+            WHERE f.mood_share_id = share_id
+              AND f.is_include = true
+              AND f.archived_at IS NULL
+        )
+        OR EXISTS (
+            SELECT 1 FROM mood_share_filters f
+            JOIN share_filter_tag_matches m ON m.filter_id = f.id
+            JOIN mood_entry_tags met
+              ON met.mood_entry_id = entry_id AND met.tag_name = m.tag_name
+            WHERE f.mood_share_id = share_id
+              AND f.is_include = true
+              AND f.archived_at IS NULL
+        )
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM mood_share_filters f
+        JOIN share_filter_tag_matches m ON m.filter_id = f.id
+        JOIN mood_entry_tags met
+          ON met.mood_entry_id = entry_id AND met.tag_name = m.tag_name
+        WHERE f.mood_share_id = share_id
+          AND f.is_include = false
+          AND f.archived_at IS NULL
+    )
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,2 @@
+ALTER TABLE mood_entry_visibility DROP COLUMN IF EXISTS delta;
+DROP FUNCTION IF EXISTS previous_visible_mood(uuid, uuid, uuid);
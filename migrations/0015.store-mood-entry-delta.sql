@@ -0,0 +1,23 @@
+-- depends: 0014.create-share-filter-tag-matches
+
+-- Mood of the entry before entry_id by the same author, skipping archived
+-- entries and entries the viewer cannot see.
+CREATE OR REPLACE FUNCTION previous_visible_mood(viewer_id uuid, author_id uuid, entry_id uuid)
+RETURNS integer AS $$
+    SELECT pm.mood
+    FROM mood_entry_visibility pv
+    JOIN mood_entries pm ON pm.id = pv.entry_id
+    WHERE pv.viewer_id = previous_visible_mood.viewer_id
+      AND pv.user_id = author_id
+      AND pv.entry_id < previous_visible_mood.entry_id
+      AND pm.archived_at IS NULL
+    ORDER BY pv.entry_id DESC
+    LIMIT 1
+$$ LANGUAGE sql STABLE;
+
+ALTER TABLE mood_entry_visibility ADD COLUMN IF NOT EXISTS delta integer;
+
+UPDATE mood_entry_visibility v
+SET delta = me.mood - previous_visible_mood(v.viewer_id, v.user_id, v.entry_id)
+FROM mood_entries me
+WHERE me.id = v.entry_id;
@@ -0,0 +1,5 @@
+ALTER TABLE mood_entry_visibility DROP COLUMN IF EXISTS archived;
+
+CREATE INDEX IF NOT EXISTS idx_mood_entries_user_id ON mood_entries (user_id);
+
+DROP INDEX IF EXISTS idx_mood_entries_user_id_id;
@@ -0,0 +1,17 @@
+-- depends: 0015.store-mood-entry-delta
+
+CREATE INDEX IF NOT EXISTS idx_mood_entries_user_id_id
+    ON mood_entries (user_id, id DESC);
+
+DROP INDEX IF EXISTS idx_mood_entries_user_id;
+
+-- Lets a timeline page be cut from the visibility index alone, before
+-- joining mood_entries for the row data.
+ALTER TABLE mood_entry_visibility
+    ADD COLUMN IF NOT EXISTS archived boolean NOT NULL DEFAULT false;
+
+UPDATE mood_entry_visibility v
+SET archived = true
+FROM mood_entries me
+WHERE me.id = v.entry_id
+  AND me.archived_at IS NOT NULL;
@@ -0,0 +1 @@
+DROP TABLE IF EXISTS mood_daily_rollups;
@@ -0,0 +1,24 @@
+-- depends: 0016.mood-entries-keyset-index
+
+-- Per-viewer daily aggregates of unarchived entries, so stats respect the
+-- same share filters as the timeline.
+CREATE TABLE IF NOT EXISTS mood_daily_rollups (
+    viewer_id   uuid    NOT NULL REFERENCES users (id),
+    user_id     uuid    NOT NULL REFERENCES users (id),
+    day         date    NOT NULL,
+    entry_count integer NOT NULL,
+    mood_sum    bigint  NOT NULL,
+    mood_min    integer NOT NULL,
+    mood_max    integer NOT NULL,
+    PRIMARY KEY (viewer_id, user_id, day)
+);
+
+INSERT INTO mood_daily_rollups
+    (viewer_id, user_id, day, entry_count, mood_sum, mood_min, mood_max)
+SELECT v.viewer_id, v.user_id, (me.created_at AT TIME ZONE 'UTC')::date,
+       count(*), sum(me.mood), min(me.mood), max(me.mood)
+FROM mood_entry_visibility v
+JOIN mood_entries me ON me.id = v.entry_id
+WHERE NOT v.archived
+GROUP BY 1, 2, 3
+ON CONFLICT DO NOTHING;
@@ -0,0 +1 @@
+DROP INDEX IF EXISTS idx_mood_entry_visibility_entry_id;
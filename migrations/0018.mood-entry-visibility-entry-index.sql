@@ -0,0 +1,6 @@
+-- depends: 0017.create-mood-daily-rollups
+
+-- Per-entry maintenance (archiving, delta and rollup refreshes, imports)
+-- looks rows up by entry_id across every viewer.
+CREATE INDEX IF NOT EXISTS idx_mood_entry_visibility_entry_id
+    ON mood_entry_visibility (entry_id);
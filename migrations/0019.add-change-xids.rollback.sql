@@ -0,0 +1,17 @@
+DROP INDEX IF EXISTS idx_tags_change_xid;
+DROP INDEX IF EXISTS idx_users_change_xid;
+DROP INDEX IF EXISTS idx_mood_entry_visibility_viewer_change;
+
+DROP TRIGGER IF EXISTS mood_entry_visibility_change_xid ON mood_entry_visibility;
+DROP TRIGGER IF EXISTS mood_share_filters_change_xid ON mood_share_filters;
+DROP TRIGGER IF EXISTS mood_shares_change_xid ON mood_shares;
+DROP TRIGGER IF EXISTS tags_change_xid ON tags;
+DROP TRIGGER IF EXISTS users_change_xid ON users;
+
+ALTER TABLE mood_entry_visibility DROP COLUMN IF EXISTS change_xid;
+ALTER TABLE mood_share_filters DROP COLUMN IF EXISTS change_xid;
+ALTER TABLE mood_shares DROP COLUMN IF EXISTS change_xid;
+ALTER TABLE tags DROP COLUMN IF EXISTS change_xid;
+ALTER TABLE users DROP COLUMN IF EXISTS change_xid;
+
+DROP FUNCTION IF EXISTS stamp_change_xid();
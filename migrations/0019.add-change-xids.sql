@@ -0,0 +1,54 @@
+-- depends: 0018.mood-entry-visibility-entry-index
+
+-- Every row a client syncs records the transaction that last wrote it, so
+-- changesSince can return rows written after a snapshot's xmin. Existing
+-- rows get '0' (no table rewrite); inserts default to the current
+-- transaction and updates are stamped by trigger.
+CREATE OR REPLACE FUNCTION stamp_change_xid() RETURNS trigger AS $$
+BEGIN
+    NEW.change_xid := pg_current_xact_id();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT '0';
+ALTER TABLE tags ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT '0';
+ALTER TABLE mood_shares ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT '0';
+ALTER TABLE mood_share_filters
+    ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT '0';
+ALTER TABLE mood_entry_visibility
+    ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT '0';
+
+ALTER TABLE users ALTER COLUMN change_xid SET DEFAULT pg_current_xact_id();
+ALTER TABLE tags ALTER COLUMN change_xid SET DEFAULT pg_current_xact_id();
+ALTER TABLE mood_shares ALTER COLUMN change_xid SET DEFAULT pg_current_xact_id();
+ALTER TABLE mood_share_filters
+    ALTER COLUMN change_xid SET DEFAULT pg_current_xact_id();
+ALTER TABLE mood_entry_visibility
+    ALTER COLUMN change_xid SET DEFAULT pg_current_xact_id();
+
+CREATE OR REPLACE TRIGGER users_change_xid
+    BEFORE UPDATE ON users
+    FOR EACH ROW WHEN (OLD IS DISTINCT FROM NEW)
+    EXECUTE FUNCTION stamp_change_xid();
+CREATE OR REPLACE TRIGGER tags_change_xid
+    BEFORE UPDATE ON tags
+    FOR EACH ROW WHEN (OLD IS DISTINCT FROM NEW)
+    EXECUTE FUNCTION stamp_change_xid();
+CREATE OR REPLACE TRIGGER mood_shares_change_xid
+    BEFORE UPDATE ON mood_shares
+    FOR EACH ROW WHEN (OLD IS DISTINCT FROM NEW)
+    EXECUTE FUNCTION stamp_change_xid();
+CREATE OR REPLACE TRIGGER mood_share_filters_change_xid
+    BEFORE UPDATE ON mood_share_filters
+    FOR EACH ROW WHEN (OLD IS DISTINCT FROM NEW)
+    EXECUTE FUNCTION stamp_change_xid();
+CREATE OR REPLACE TRIGGER mood_entry_visibility_change_xid
+    BEFORE UPDATE ON mood_entry_visibility
+    FOR EACH ROW WHEN (OLD IS DISTINCT FROM NEW)
+    EXECUTE FUNCTION stamp_change_xid();
+
+CREATE INDEX IF NOT EXISTS idx_mood_entry_visibility_viewer_change
+    ON mood_entry_visibility (viewer_id, change_xid);
+CREATE INDEX IF NOT EXISTS idx_users_change_xid ON users (change_xid);
+CREATE INDEX IF NOT EXISTS idx_tags_change_xid ON tags (change_xid);
@@ -0,0 +1,13 @@
+-- depends: 0019.add-change-xids
+
+-- Client-supplied idempotency keys (clientMutationId) and the id of the row
+-- the first request created, so retries return it instead of writing again.
+-- No foreign keys: rows are short-lived and expire after a TTL.
+CREATE TABLE IF NOT EXISTS mutation_keys (
+    user_id    uuid        NOT NULL,
+    mutation   text        NOT NULL,
+    key        text        NOT NULL,
+    result_id  uuid        NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, mutation, key)
+);
@@ -0,0 +1,3 @@
+DROP TRIGGER IF EXISTS change_events_notify ON change_events;
+DROP FUNCTION IF EXISTS notify_change_event();
+DROP TABLE IF EXISTS change_events;
@@ -0,0 +1,34 @@
+-- depends: 0020.create-mutation-keys
+
+-- Outbox of data changes, written in the same transaction as the change.
+-- Each insert is announced with NOTIFY on commit; listeners that lost their
+-- connection catch up from the table. Large payloads are left out of the
+-- notification (which is limited to 8000 bytes) and read from the row.
+CREATE TABLE IF NOT EXISTS change_events (
+    id         bigint      GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    topic      text        NOT NULL,
+    payload    jsonb       NOT NULL DEFAULT '{}',
+    created_at timestamptz NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_events_created_at
+    ON change_events (created_at);
+
+CREATE OR REPLACE FUNCTION notify_change_event() RETURNS trigger AS $$
+DECLARE
+    message text;
+BEGIN
+    message := json_build_object(
+        'id', NEW.id, 'topic', NEW.topic, 'payload', NEW.payload
+    )::text;
+    IF octet_length(message) > 7900 THEN
+        message := json_build_object('id', NEW.id, 'topic', NEW.topic)::text;
+    END IF;
+    PERFORM pg_notify('moods_change_events', message);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER change_events_notify
+    AFTER INSERT ON change_events
+    FOR EACH ROW EXECUTE FUNCTION notify_change_event();
@@ -0,0 +1 @@
+DROP FUNCTION IF EXISTS mood_share_allows_live(uuid, uuid);
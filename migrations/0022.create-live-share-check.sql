@@ -0,0 +1,33 @@
+-- depends: 0021.create-change-events
+
+-- The share filter logic evaluated with `~` against the entry's tags, as
+-- mood_share_allows was before 0014. Used by the live timeline query only,
+-- so it stays an independent check of share_filter_tag_matches and the
+-- visibility table derived from it.
+CREATE OR REPLACE FUNCTION mood_share_allows_live(share_id uuid, entry_id uuid)
+RETURNS boolean AS $$
+    SELECT (
+        NOT EXISTS (
+            SELECT 1 FROM mood_share_filters f
+            WHERE f.mood_share_id = share_id
+              AND f.is_include = true
+              AND f.archived_at IS NULL
+        )
+        OR EXISTS (
+            SELECT 1 FROM mood_share_filters f
+            JOIN mood_entry_tags met ON met.mood_entry_id = entry_id
+            WHERE f.mood_share_id = share_id
+              AND f.is_include = true
+              AND f.archived_at IS NULL
+              AND met.tag_name ~ f.pattern
+        )
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM mood_share_filters f
+        JOIN mood_entry_tags met ON met.mood_entry_id = entry_id
+        WHERE f.mood_share_id = share_id
+          AND f.is_include = false
+          AND f.archived_at IS NULL
+          AND met.tag_name ~ f.pattern
+    )
+$$ LANGUAGE sql STABLE;
@@ -1,20 +1,29 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
+from datetime import timedelta
+from hashlib import sha256
 from pathlib import Path
 
 from starlette.applications import Starlette
+from starlette.datastructures import MutableHeaders
 from starlette.middleware import Middleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.cors import CORSMiddleware
 from starlette.requests import Request
 from starlette.responses import FileResponse, JSONResponse, Response
-from starlette.routing import Mount, Route
+from starlette.routing import Mount, Route, WebSocketRoute
 from starlette.staticfiles import StaticFiles
 
 from moods.config import settings
+from moods.data import TagCatalog, UserCache
+from moods.data.mutation_keys import purge_mutation_keys
 from moods.db import apply_migrations, create_pool
+from moods.event_bus import EventBus
+from moods.query_cache import QueryCache
 from moods.resolvers import create_gql
 from moods.resolvers.auth import COOKIE_NAME
+from moods.routes import create_export, create_import
 
 WEB_PUBLIC = Path(__file__).parent.parent.parent / "web" / "resources" / "public"
 
@@ -50,6 +59,50 @@ class AuthCookieMiddleware(BaseHTTPMiddleware):
         return response
 
 
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class ETagMiddleware(BaseHTTPMiddleware):
+    """
+    Strong ETags on GraphQL query responses, answering If-None-Match with 304.
+
+    The tag is a hash of the serialized body, so it saves the transfer but not
+    the execution. Mutation responses are passed through untouched, and only
+    GET and HEAD are answered conditionally; a POST query is tagged but always
+    gets its body.
+    """
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        request.state.graphql_query = False
+        response = await call_next(request)
+        if not request.state.graphql_query or response.status_code != 200:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = f'"{sha256(body).hexdigest()[:32]}"'
+        # Copied from the raw list so repeated headers (Set-Cookie) survive
+        headers = MutableHeaders(raw=list(response.raw_headers))
+        headers["ETag"] = etag
+        # Responses depend on who is asking, so only the client may store
+        # them, and it must revalidate each time
+        headers["Cache-Control"] = "private, no-cache"
+        headers.add_vary_header("Authorization, Cookie")
+
+        if_none_match = request.headers.get("if-none-match")
+        if (
+            request.method in ("GET", "HEAD")
+            and if_none_match
+            and _etag_matches(if_none_match, etag)
+        ):
+            del headers["content-length"]
+            del headers["content-type"]
+            return Response(status_code=304, headers=headers)
+        return Response(body, status_code=200, headers=headers)
+
+
 def create_app() -> Starlette:
 
     @asynccontextmanager
@@ -57,15 +110,50 @@ def create_app() -> Starlette:
         apply_migrations()
         pool = await create_pool()
         app.state.pool = pool
-        app.state.graphql = create_gql(pool, settings)
+        app.state.events = EventBus(
+            retention=timedelta(hours=settings.change_event_retention_hours)
+        )
+        await app.state.events.start()
+        app.state.query_cache = QueryCache()
+        app.state.user_cache = UserCache(
+            ttl=timedelta(seconds=settings.user_cache_ttl_seconds)
+        )
+        tag_catalog = TagCatalog(pool)
+        await tag_catalog.snapshot()
+        # Writes from other processes reach these caches through the bus
+        follow_tasks = [
+            asyncio.create_task(app.state.user_cache.follow(app.state.events)),
+            asyncio.create_task(tag_catalog.follow(app.state.events)),
+        ]
+        purge_task = asyncio.create_task(
+            purge_mutation_keys(
+                pool, ttl=timedelta(hours=settings.mutation_key_ttl_hours)
+            )
+        )
+        app.state.graphql = create_gql(
+            pool,
+            settings,
+            app.state.events,
+            query_cache=app.state.query_cache,
+            user_cache=app.state.user_cache,
+            tag_catalog=tag_catalog,
+        )
+        app.state.export = create_export(pool, settings)
+        app.state.imports = create_import(pool, settings, tag_catalog=tag_catalog)
         yield
+        for task in (*follow_tasks, purge_task):
+            task.cancel()
+        await app.state.events.stop()
         await pool.close()
 
-    class _GraphQLProxy:
-        """Routes to the GraphQL ASGI app stored in app.state during lifespan."""
+    class _StateProxy:
+        """Routes to an ASGI app stored in app.state during lifespan."""
+
+        def __init__(self, name: str):
+            self.name = name
 
         async def __call__(self, scope, receive, send):
-            await scope["app"].state.graphql(scope, receive, send)
+            await getattr(scope["app"].state, self.name)(scope, receive, send)
 
     async def health(request):
         checks = {}
@@ -81,7 +169,14 @@ def create_app() -> Starlette:
 
         healthy = all(v == "ok" for v in checks.values())
         return JSONResponse(
-            {"status": "healthy" if healthy else "degraded", "checks": checks},
+            {
+                "status": "healthy" if healthy else "degraded",
+                "checks": checks,
+                "caches": {
+                    **request.app.state.query_cache.stats(),
+                    "users": request.app.state.user_cache.stats(),
+                },
+            },
             status_code=200 if healthy else 503,
         )
 
@@ -90,7 +185,10 @@ def create_app() -> Starlette:
 
     routes = [
         Route("/health", health, methods=["GET"]),
-        Route("/graphql", _GraphQLProxy(), methods=["GET", "POST"]),
+        Route("/graphql", _StateProxy("graphql"), methods=["GET", "POST"]),
+        WebSocketRoute("/graphql", _StateProxy("graphql")),
+        Mount("/export", _StateProxy("export")),
+        Mount("/import", _StateProxy("imports")),
     ]
 
     if (WEB_PUBLIC / "js").is_dir():
@@ -118,6 +216,7 @@ def create_app() -> Starlette:
             ),
             Middleware(SecurityHeadersMiddleware),
             Middleware(AuthCookieMiddleware),
+            Middleware(ETagMiddleware),
         ],
     )
 
@@ -1,7 +1,21 @@
+from .changes import Changes
+from .imports import Imports
 from .loaders import create_loaders
 from .moods import Moods
 from .shares import Shares
+from .tag_catalog import TagCatalog
 from .tags import Tags
+from .user_cache import UserCache
 from .users import Users
 
-__all__ = ["Moods", "Shares", "Tags", "Users", "create_loaders"]
+__all__ = [
+    "Changes",
+    "Imports",
+    "Moods",
+    "Shares",
+    "TagCatalog",
+    "Tags",
+    "UserCache",
+    "Users",
+    "create_loaders",
+]
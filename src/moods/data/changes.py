@@ -0,0 +1,72 @@
+from asyncpg import Pool
+
+from .shares import attach_filters
+from .utils import decode_cursor, encode_cursor, queries
+
+# More changed entries than this and the client is better off refetching.
+CHANGES_LIMIT = 500
+
+
+def _decode_token(token: str) -> str:
+    try:
+        since = decode_cursor(token)
+    except ValueError:
+        since = ""
+    if not since.isdigit():
+        raise ValueError("Invalid changes token")
+    return since
+
+
+class Changes:
+    def __init__(self, pool: Pool):
+        self.pool = pool
+
+    async def get_changes(self, *, viewer_id: str, token: str | None) -> dict:
+        """Entries, tags, users and share rules written since token."""
+        since = _decode_token(token) if token is not None else None
+
+        async with (
+            self.pool.acquire() as conn,
+            conn.transaction(isolation="repeatable_read", readonly=True),
+        ):
+            watermark = await queries.get_change_watermark(conn)
+            changes = {
+                "token": encode_cursor(watermark),
+                "resync": True,
+                "entries": [],
+                "tags": [],
+                "users": [],
+                "shared_with": [],
+            }
+            if since is None or await queries.has_incoming_share_changes(
+                conn, viewer_id=viewer_id, since=since
+            ):
+                return changes
+
+            entries = [
+                dict(r)
+                async for r in queries.get_changed_entries(
+                    conn, viewer_id=viewer_id, since=since, row_limit=CHANGES_LIMIT + 1
+                )
+            ]
+            if len(entries) > CHANGES_LIMIT:
+                return changes
+
+            shares = [
+                dict(r)
+                async for r in queries.get_changed_shares(
+                    conn, user_id=viewer_id, since=since
+                )
+            ]
+            changes.update(
+                resync=False,
+                entries=entries,
+                tags=[
+                    dict(r) async for r in queries.get_changed_tags(conn, since=since)
+                ],
+                users=[
+                    dict(r) async for r in queries.get_changed_users(conn, since=since)
+                ],
+                shared_with=await attach_filters(conn, shares),
+            )
+            return changes
@@ -0,0 +1,159 @@
+import asyncio
+import csv
+import json
+from collections.abc import Iterable, Iterator
+from datetime import UTC, datetime
+
+from asyncpg import Pool
+
+from .outbox import MOOD_ENTRIES_IMPORTED, emit_event
+from .shares import match_new_tags
+from .tag_catalog import TagCatalog, announce_created_tags
+from .utils import EPOCH, queries, uuid7
+
+# mood_entries.mood is an integer column
+MOOD_MIN = -(2**31)
+MOOD_MAX = 2**31 - 1
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[tuple[int, dict | None]]:
+    """Yield (line number, object) per non-blank line; None if it isn't JSON."""
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError:
+            raw = None
+        yield line_no, raw if isinstance(raw, dict) else None
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[tuple[int, dict | None]]:
+    """Yield (line number, row) for a CSV file with a header row."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _parse_entry(raw: dict | None) -> tuple[int, str, datetime, list[str]]:
+    """Validate one exported entry (NDJSON or CSV). Raises ValueError."""
+    if raw is None:
+        raise ValueError("Malformed row")
+
+    mood = raw.get("mood")
+    if isinstance(mood, str) and mood.strip().lstrip("-").isdigit():
+        mood = int(mood)
+    if not isinstance(mood, int) or isinstance(mood, bool):
+        raise ValueError("mood must be an integer")
+    if not MOOD_MIN <= mood <= MOOD_MAX:
+        raise ValueError(f"mood must be between {MOOD_MIN} and {MOOD_MAX}")
+
+    notes = raw.get("notes") or ""
+    if not isinstance(notes, str):
+        raise ValueError("notes must be a string")
+    # Postgres text can't hold NUL; caught here it rejects the row, not the COPY
+    if "\x00" in notes:
+        raise ValueError("notes must not contain NUL characters")
+
+    created_at = raw.get("createdAt")
+    try:
+        created_at = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError):
+        raise ValueError("createdAt must be an ISO 8601 timestamp") from None
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=UTC)
+    if created_at < EPOCH:
+        raise ValueError("createdAt must be after 1970")
+
+    tags = raw.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(";")
+    if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+        raise ValueError("tags must be a list of strings")
+    if any("\x00" in t for t in tags):
+        raise ValueError("tags must not contain NUL characters")
+    tags = list(dict.fromkeys(t.strip().lower() for t in tags if t.strip()))
+
+    return mood, notes, created_at, tags
+
+
+def _prepare_entries(
+    rows: Iterable[tuple[int, dict | None]],
+) -> tuple[list[dict], list[tuple], list[tuple]]:
+    """Staging records for the valid rows, and the rejects."""
+    rejected = []
+    entries = []
+    entry_tags = []
+    for line, raw in rows:
+        try:
+            mood, notes, created_at, tags = _parse_entry(raw)
+        except ValueError as e:
+            rejected.append({"line": line, "error": str(e)})
+            continue
+        entry_id = uuid7(created_at)
+        entries.append((line, entry_id, mood, notes, created_at))
+        entry_tags.extend((entry_id, tag) for tag in tags)
+    return rejected, entries, entry_tags
+
+
+class Imports:
+    def __init__(self, pool: Pool, *, tag_catalog: TagCatalog | None = None):
+        self.pool = pool
+        self.tag_catalog = tag_catalog
+
+    async def import_entries(
+        self, user_id: str, rows: Iterable[tuple[int, dict | None]]
+    ) -> dict:
+        """Load historical entries for a user in one transaction."""
+        # Parsing a large file would otherwise hold up the event loop
+        rejected, entries, entry_tags = await asyncio.to_thread(_prepare_entries, rows)
+
+        imported = 0
+        async with self.pool.acquire() as conn, conn.transaction():
+            await queries.create_import_entries_staging(conn)
+            await queries.create_import_tags_staging(conn)
+            await conn.copy_records_to_table("import_entries", records=entries)
+            await conn.copy_records_to_table("import_entry_tags", records=entry_tags)
+            await queries.analyze_import_staging(conn)
+
+            # Later copies of a row in the file, then rows already imported
+            rejected.extend(
+                [
+                    {"line": r["line"], "error": f"Duplicate of line {r['first_line']}"}
+                    async for r in queries.remove_repeated_import_entries(conn)
+                ]
+            )
+            rejected.extend(
+                [
+                    {"line": r["line"], "error": "Duplicate of an existing entry"}
+                    async for r in queries.remove_import_duplicates(
+                        conn, user_id=user_id
+                    )
+                ]
+            )
+
+            created_tags = await announce_created_tags(
+                conn, queries.merge_import_tags(conn)
+            )
+            await match_new_tags(conn, created_tags)
+            imported = await queries.merge_import_entries(conn, user_id=user_id)
+            if imported:
+                await queries.merge_import_entry_tags(conn)
+
+                # Visibility and deltas are worked out in staging so each
+                # visibility row is written once, with its delta.
+                await queries.create_import_visibility_staging(conn)
+                await queries.stage_import_visibility(conn, user_id=user_id)
+                await queries.analyze_import_visibility(conn)
+                await queries.stage_import_deltas(conn, user_id=user_id)
+                await queries.merge_import_visibility(conn, user_id=user_id)
+                await queries.merge_import_deltas(conn)
+                await queries.add_import_rollups(conn, user_id=user_id)
+                await emit_event(
+                    conn, MOOD_ENTRIES_IMPORTED, user_id=user_id, count=imported
+                )
+
+        if created_tags and self.tag_catalog is not None:
+            self.tag_catalog.invalidate()
+        rejected.sort(key=lambda r: r["line"])
+        return {"imported": imported, "rejected": rejected}
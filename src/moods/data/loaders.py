@@ -1,51 +1,125 @@
 from collections import defaultdict
+from typing import NamedTuple
+from uuid import UUID
 
 from aiodataloader import DataLoader
 from asyncpg import Pool
 
-from .utils import queries
+from .moods import Moods
+from .tag_catalog import TagCatalog
+from .user_cache import UserCache
+from .utils import decode_cursor, page_size, queries
 
 
 class UserLoader(DataLoader):
-    def __init__(self, pool: Pool):
+    def __init__(self, pool: Pool, cache: UserCache | None = None):
         super().__init__()
         self.pool = pool
+        self.cache = cache
 
     async def batch_load_fn(self, user_ids):
-        rows = [
-            dict(r)
-            async for r in queries.get_users_by_ids(self.pool, ids=list(user_ids))
-        ]
-        by_id = {str(r["id"]): r for r in rows}
+        if self.cache is None:
+            by_id = await self._fetch(user_ids)
+        else:
+            by_id = self.cache.get_many(user_ids)
+            missing = [uid for uid in user_ids if str(uid) not in by_id]
+            if missing:
+                generation = self.cache.generation
+                fetched = await self._fetch(missing)
+                self.cache.put_many(fetched.values(), generation)
+                by_id.update(fetched)
         return [by_id.get(str(uid)) for uid in user_ids]
 
+    async def _fetch(self, user_ids) -> dict[str, dict]:
+        return {
+            str(r["id"]): dict(r)
+            async for r in queries.get_users_by_ids(self.pool, ids=list(user_ids))
+        }
+
 
 class MoodEntryTagsLoader(DataLoader):
-    def __init__(self, pool: Pool):
+    def __init__(self, pool: Pool, catalog: TagCatalog):
         super().__init__()
         self.pool = pool
+        self.catalog = catalog
 
     async def batch_load_fn(self, entry_ids):
-        rows = [
-            dict(r)
-            async for r in queries.get_tags_for_entries(
-                self.pool, mood_entry_ids=list(entry_ids)
-            )
-        ]
+        tags = await self.catalog.snapshot()
         by_entry = defaultdict(list)
-        for r in rows:
-            by_entry[str(r["mood_entry_id"])].append(
-                {
-                    "name": r["name"],
-                    "metadata": r["metadata"],
-                    "archived_at": r["archived_at"],
-                }
-            )
+        async for r in queries.get_entry_tag_names(
+            self.pool, mood_entry_ids=list(entry_ids)
+        ):
+            by_entry[str(r["mood_entry_id"])].append(tags.get(r["tag_name"]))
         return [by_entry.get(str(eid), []) for eid in entry_ids]
 
 
-def create_loaders(pool: Pool) -> dict:
+class ShareRulesLoader(DataLoader):
+    """Active shares of each owner, with their filters, as Shares.get_shares."""
+
+    def __init__(self, pool: Pool):
+        super().__init__()
+        self.pool = pool
+
+    async def batch_load_fn(self, user_ids):
+        by_owner = defaultdict(list)
+        async for r in queries.get_shares_for_users(self.pool, user_ids=list(user_ids)):
+            by_owner[str(r["user_id"])].append(dict(r))
+        return [by_owner.get(str(uid), []) for uid in user_ids]
+
+
+class EntriesPage(NamedTuple):
+    viewer_id: str
+    user_id: str
+    first: int | None
+    after: str | None
+    include_archived: bool
+    fields: frozenset[str]
+
+
+class EntriesPageLoader(DataLoader):
+    """User.entries pages, one query per viewer and field selection."""
+
+    def __init__(self, moods: Moods):
+        super().__init__()
+        self.moods = moods
+
+    async def batch_load_fn(self, keys):
+        results: list = [None] * len(keys)
+        batches = defaultdict(list)
+        for i, key in enumerate(keys):
+            try:
+                # Bad arguments fail their own field, not the whole batch
+                page_size(key.first)
+                if key.after:
+                    UUID(decode_cursor(key.after))
+            except ValueError as e:
+                results[i] = e
+                continue
+            batches[(key.viewer_id, key.fields)].append(i)
+
+        for (viewer_id, fields), indexes in batches.items():
+            connections = await self.moods.get_author_pages(
+                viewer_id=viewer_id,
+                pages=[keys[i]._asdict() for i in indexes],
+                fields=fields,
+            )
+            for i, connection in zip(indexes, connections, strict=True):
+                results[i] = connection
+        return results
+
+
+def create_loaders(
+    pool: Pool,
+    user_cache: UserCache | None = None,
+    tag_catalog: TagCatalog | None = None,
+    moods: Moods | None = None,
+) -> dict:
+    tag_catalog = tag_catalog or TagCatalog(pool)
     return {
-        "user_loader": UserLoader(pool),
-        "mood_entry_tags_loader": MoodEntryTagsLoader(pool),
+        "user_loader": UserLoader(pool, user_cache),
+        "mood_entry_tags_loader": MoodEntryTagsLoader(pool, tag_catalog),
+        "share_rules_loader": ShareRulesLoader(pool),
+        "entries_page_loader": EntriesPageLoader(
+            moods or Moods(pool, tag_catalog=tag_catalog)
+        ),
     }
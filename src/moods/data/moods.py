@@ -1,16 +1,60 @@
+import heapq
+from collections.abc import AsyncIterator, Collection
+from datetime import UTC, datetime, timedelta
+from itertools import islice
+from operator import itemgetter
+
 from asyncpg import Pool
 
+from .mutation_keys import MUTATION_KEY_TTL, claim_mutation_keys
+from .outbox import MOOD_ENTRIES_ARCHIVED, MOOD_ENTRIES_LOGGED, emit_event
+from .shares import match_new_tags
+from .tag_catalog import TagCatalog, TagSnapshot, announce_created_tags
 from .utils import (
-    DEFAULT_PAGE_SIZE,
     build_connection,
     decode_cursor,
+    page_size,
     queries,
+    uuid7,
 )
 
+AUTHOR_COLUMNS = ("name", "email", "icon", "settings", "archived_at")
+
+
+def _entry_row(row, *, tags: TagSnapshot | None, with_user: bool) -> dict:
+    """An entry row with its tags resolved and its author folded into `user`."""
+    entry = dict(row)
+    names = entry.pop("tag_names") or []
+    author = {column: entry.pop(f"author_{column}") for column in AUTHOR_COLUMNS}
+    if tags is not None:
+        entry["tags"] = [tags.get(name) for name in names]
+    if with_user:
+        entry["user"] = {"id": entry["user_id"], **author}
+    return entry
+
+
+def _projection(fields: Collection[str] | None) -> dict:
+    """Page query flags for the MoodEntry fields a caller needs, None for all."""
+    return {
+        "with_notes": fields is None or "notes" in fields,
+        "with_tags": fields is None or "tags" in fields,
+        "with_user": fields is None or "user" in fields,
+    }
+
 
 class Moods:
-    def __init__(self, pool: Pool):
+    def __init__(
+        self,
+        pool: Pool,
+        *,
+        use_visibility_index: bool = True,
+        mutation_key_ttl: timedelta = MUTATION_KEY_TTL,
+        tag_catalog: TagCatalog | None = None,
+    ):
         self.pool = pool
+        self.use_visibility_index = use_visibility_index
+        self.mutation_key_ttl = mutation_key_ttl
+        self.tag_catalog = tag_catalog or TagCatalog(pool)
 
     async def get_mood_entries(
         self,
@@ -20,42 +64,338 @@ class Moods:
         first: int | None = None,
         after: str | None = None,
         viewer_id: str | None = None,
+        fields: Collection[str] | None = None,
     ) -> dict:
-        limit = first or DEFAULT_PAGE_SIZE
+        """A page of the entries the viewer can see, reading only `fields`."""
+        limit = page_size(first)
         after_id = decode_cursor(after) if after else None
+        projection = _projection(fields)
+        tags = await self.tag_catalog.snapshot() if projection["with_tags"] else None
 
-        rows = [
-            dict(r)
-            async for r in queries.get_mood_entries(
-                self.pool,
+        if not self.use_visibility_index:
+            rows = [
+                _entry_row(r, tags=tags, with_user=projection["with_user"])
+                async for r in queries.get_mood_entries_live(
+                    self.pool,
+                    user_ids=user_ids,
+                    include_archived=include_archived,
+                    after_id=after_id,
+                    page_limit=limit + 1,
+                    viewer_id=viewer_id,
+                    with_delta=fields is None or "delta" in fields,
+                    **projection,
+                )
+            ]
+        else:
+            rows = await self._get_feed_entries(
                 user_ids=user_ids,
                 include_archived=include_archived,
                 after_id=after_id,
                 page_limit=limit + 1,
                 viewer_id=viewer_id,
+                tags=tags,
+                **projection,
             )
-        ]
         return build_connection(rows, "id", limit)
 
+    async def _get_feed_entries(
+        self,
+        *,
+        user_ids: list[str] | None,
+        include_archived: bool,
+        after_id: str | None,
+        page_limit: int,
+        viewer_id: str | None,
+        tags: TagSnapshot | None,
+        with_notes: bool,
+        with_tags: bool,
+        with_user: bool,
+    ) -> list[dict]:
+        """One bounded page per visible author, merged newest first."""
+        async with self.pool.acquire() as conn:
+            author_ids = [
+                r["user_id"]
+                async for r in queries.get_visible_authors(
+                    conn, viewer_id=viewer_id, user_ids=user_ids
+                )
+            ]
+            pages = [
+                [
+                    _entry_row(r, tags=tags, with_user=with_user)
+                    async for r in queries.get_author_mood_entries(
+                        conn,
+                        user_id=author_id,
+                        include_archived=include_archived,
+                        after_id=after_id,
+                        page_limit=page_limit,
+                        viewer_id=viewer_id,
+                        with_notes=with_notes,
+                        with_tags=with_tags,
+                        with_user=with_user,
+                    )
+                ]
+                for author_id in author_ids
+            ]
+        merged = heapq.merge(*pages, key=itemgetter("id"), reverse=True)
+        return list(islice(merged, page_limit))
+
+    async def get_author_pages(
+        self,
+        *,
+        viewer_id: str,
+        pages: list[dict],
+        fields: Collection[str] | None = None,
+    ) -> list[dict]:
+        """Single-author pages for User.entries, shaped like get_mood_entries."""
+        if not self.use_visibility_index:
+            return [
+                await self.get_mood_entries(
+                    user_ids=[page["user_id"]],
+                    include_archived=page["include_archived"],
+                    first=page["first"],
+                    after=page["after"],
+                    viewer_id=viewer_id,
+                    fields=fields,
+                )
+                for page in pages
+            ]
+
+        limits = [page_size(page["first"]) for page in pages]
+        projection = _projection(fields)
+        tags = await self.tag_catalog.snapshot() if projection["with_tags"] else None
+        rows_by_page = [[] for _ in pages]
+        async for r in queries.get_authors_mood_entries(
+            self.pool,
+            viewer_id=viewer_id,
+            user_ids=[page["user_id"] for page in pages],
+            include_archived=[page["include_archived"] for page in pages],
+            after_ids=[
+                decode_cursor(page["after"]) if page["after"] else None
+                for page in pages
+            ],
+            page_limits=[limit + 1 for limit in limits],
+            **projection,
+        ):
+            entry = _entry_row(r, tags=tags, with_user=projection["with_user"])
+            rows_by_page[entry.pop("page") - 1].append(entry)
+        return [
+            build_connection(rows, "id", limit)
+            for rows, limit in zip(rows_by_page, limits, strict=True)
+        ]
+
+    async def get_visible_authors(
+        self, *, viewer_id: str, user_ids: list[str] | None = None
+    ) -> set[str]:
+        """The viewer plus everyone sharing with them, narrowed to user_ids."""
+        return {
+            str(r["user_id"])
+            async for r in queries.get_visible_authors(
+                self.pool, viewer_id=viewer_id, user_ids=user_ids
+            )
+        }
+
+    async def get_visible_entries(
+        self, *, viewer_id: str, entry_ids: list[str]
+    ) -> list[dict]:
+        """The given unarchived entries that pass the viewer's share filters."""
+        return [
+            dict(r)
+            async for r in queries.get_visible_mood_entries(
+                self.pool, viewer_id=viewer_id, entry_ids=entry_ids
+            )
+        ]
+
+    async def get_mood_stats(
+        self,
+        *,
+        viewer_id: str,
+        user_ids: list[str] | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        bucket: str = "day",
+    ) -> list[dict]:
+        return [
+            dict(r)
+            async for r in queries.get_mood_stats(
+                self.pool,
+                viewer_id=viewer_id,
+                user_ids=user_ids,
+                start=start,
+                end=end,
+                bucket=bucket,
+            )
+        ]
+
+    async def export_mood_entries(
+        self,
+        *,
+        viewer_id: str,
+        user_ids: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> AsyncIterator[dict]:
+        """Yield every entry the viewer can see from a server-side cursor."""
+        if self.use_visibility_index:
+            cursor = queries.export_mood_entries_cursor
+        else:
+            cursor = queries.export_mood_entries_live_cursor
+        async with cursor(
+            self.pool,
+            viewer_id=viewer_id,
+            user_ids=user_ids,
+            include_archived=include_archived,
+        ) as cursor:
+            async for r in cursor:
+                yield dict(r)
+
     async def create_mood_entry(
-        self, *, user_id: str, mood: int, notes: str, tags: list[str] | None = None
+        self,
+        *,
+        user_id: str,
+        mood: int,
+        notes: str,
+        tags: list[str] | None = None,
+        client_mutation_id: str | None = None,
     ) -> dict:
+        """Log an entry; a repeated client_mutation_id returns the first one."""
+        entry_id = uuid7(datetime.now(UTC))
+        created_tags = []
+
         async with self.pool.acquire() as conn, conn.transaction():
+            if client_mutation_id is not None:
+                stored = await claim_mutation_keys(
+                    conn,
+                    user_id=user_id,
+                    mutation="logMood",
+                    keys={client_mutation_id: entry_id},
+                    ttl=self.mutation_key_ttl,
+                )
+                if stored[client_mutation_id] != entry_id:
+                    [row] = await self._get_entries_by_ids(
+                        conn, [stored[client_mutation_id]]
+                    )
+                    return row
+
             row = await queries.create_mood_entry(
-                conn, user_id=user_id, mood=mood, notes=notes
+                conn, id=entry_id, user_id=user_id, mood=mood, notes=notes
             )
             entry = dict(row)
 
-            for tag_name in tags or []:
-                await queries.ensure_tag(conn, name=tag_name)
-                await queries.add_mood_entry_tag(
-                    conn, mood_entry_id=entry["id"], tag_name=tag_name
+            if tags:
+                created_tags = await announce_created_tags(
+                    conn,
+                    queries.add_entry_tags(conn, entry_id=entry["id"], tag_names=tags),
                 )
+                await match_new_tags(conn, created_tags)
+
+            await queries.add_entries_visibility(conn, entry_ids=[entry["id"]])
+            await queries.refresh_entries_delta(conn, entry_ids=[entry["id"]])
+            await queries.add_entries_rollups(conn, entry_ids=[entry["id"]])
+            await emit_event(
+                conn, MOOD_ENTRIES_LOGGED, user_id=user_id, entry_ids=[entry["id"]]
+            )
 
+        if created_tags:
+            self.tag_catalog.invalidate()
         return entry
 
+    async def create_mood_entries(
+        self, *, user_id: str, entries: list[dict]
+    ) -> list[dict]:
+        """Log entries in one transaction; reused mutation ids return the first."""
+        if not entries:
+            return []
+
+        # Sorted so the ids, and with them the timeline, follow input order
+        now = datetime.now(UTC)
+        ids = sorted(uuid7(now) for _ in entries)
+
+        keys = {}
+        for entry_id, entry in zip(ids, entries, strict=True):
+            if entry.get("client_mutation_id") is not None:
+                keys.setdefault(entry["client_mutation_id"], entry_id)
+
+        created_tags = []
+        async with self.pool.acquire() as conn, conn.transaction():
+            stored = {}
+            if keys:
+                stored = await claim_mutation_keys(
+                    conn,
+                    user_id=user_id,
+                    mutation="logMood",
+                    keys=keys,
+                    ttl=self.mutation_key_ttl,
+                )
+
+            result_ids = []
+            new = []
+            for entry_id, entry in zip(ids, entries, strict=True):
+                key = entry.get("client_mutation_id")
+                result_id = stored[key] if key is not None else entry_id
+                result_ids.append(result_id)
+                if result_id == entry_id:
+                    new.append((entry_id, entry))
+
+            rows = {}
+            if new:
+                new_ids = [entry_id for entry_id, _ in new]
+                entry_ids = []
+                tag_names = []
+                for entry_id, entry in new:
+                    for tag_name in entry.get("tags") or []:
+                        entry_ids.append(entry_id)
+                        tag_names.append(tag_name)
+
+                async for r in queries.create_mood_entries(
+                    conn,
+                    ids=new_ids,
+                    user_id=user_id,
+                    moods=[e["mood"] for _, e in new],
+                    notes=[e["notes"] for _, e in new],
+                ):
+                    rows[r["id"]] = dict(r)
+                if tag_names:
+                    created_tags = await announce_created_tags(
+                        conn,
+                        queries.add_entries_tags(
+                            conn, entry_ids=entry_ids, tag_names=tag_names
+                        ),
+                    )
+                    await match_new_tags(conn, created_tags)
+
+                await queries.add_entries_visibility(conn, entry_ids=new_ids)
+                await queries.refresh_entries_delta(conn, entry_ids=new_ids)
+                await queries.add_entries_rollups(conn, entry_ids=new_ids)
+                await emit_event(
+                    conn, MOOD_ENTRIES_LOGGED, user_id=user_id, entry_ids=new_ids
+                )
+
+            replayed = [i for i in result_ids if i not in rows]
+            if replayed:
+                for row in await self._get_entries_by_ids(conn, replayed):
+                    rows[row["id"]] = row
+
+        if created_tags:
+            self.tag_catalog.invalidate()
+        return [rows[result_id] for result_id in result_ids]
+
+    async def _get_entries_by_ids(self, conn, ids: list) -> list[dict]:
+        return [dict(r) async for r in queries.get_mood_entries_by_ids(conn, ids=ids)]
+
     async def archive_mood_entry(self, entry_id: str, user_id: str) -> dict:
-        row = await queries.archive_mood_entry(self.pool, id=entry_id, user_id=user_id)
-        if not row:
-            raise ValueError("Mood entry not found or already archived")
+        async with self.pool.acquire() as conn, conn.transaction():
+            row = await queries.archive_mood_entry(conn, id=entry_id, user_id=user_id)
+            if not row:
+                row = await queries.get_archived_mood_entry(
+                    conn, id=entry_id, user_id=user_id
+                )
+                if not row:
+                    raise ValueError("Mood entry not found")
+                return dict(row)
+            await queries.archive_entry_visibility(conn, entry_id=row["id"])
+            await queries.refresh_delta_after_archive(conn, entry_id=row["id"])
+            await queries.clear_entry_day_rollups(conn, entry_id=row["id"])
+            await queries.add_entry_day_rollups(conn, entry_id=row["id"])
+            await emit_event(
+                conn, MOOD_ENTRIES_ARCHIVED, user_id=user_id, entry_ids=[row["id"]]
+            )
         return dict(row)
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from datetime import timedelta
+from uuid import UUID
+
+import asyncpg
+from asyncpg import Pool
+
+from .utils import queries
+
+log = logging.getLogger(__name__)
+
+MUTATION_KEY_TTL = timedelta(hours=24)
+PURGE_INTERVAL = timedelta(hours=1)
+
+
+async def claim_mutation_keys(
+    conn,
+    *,
+    user_id: str,
+    mutation: str,
+    keys: dict[str, UUID],
+    ttl: timedelta = MUTATION_KEY_TTL,
+) -> dict[str, UUID]:
+    """The id stored per clientMutationId: the proposed one if new, else the first."""
+    ttl_seconds = ttl.total_seconds()
+    stored = {
+        r["key"]: r["result_id"]
+        async for r in queries.get_live_mutation_keys(
+            conn,
+            user_id=user_id,
+            mutation=mutation,
+            keys=list(keys),
+            ttl_seconds=ttl_seconds,
+        )
+    }
+    missing = {k: v for k, v in keys.items() if k not in stored}
+    if not missing:
+        return stored
+
+    async for r in queries.claim_mutation_keys(
+        conn,
+        user_id=user_id,
+        mutation=mutation,
+        keys=list(missing),
+        result_ids=list(missing.values()),
+        ttl_seconds=ttl_seconds,
+    ):
+        stored[r["key"]] = r["result_id"]
+    if len(stored) < len(keys):
+        # Claimed by a concurrent request that has since committed
+        async for r in queries.get_live_mutation_keys(
+            conn,
+            user_id=user_id,
+            mutation=mutation,
+            keys=[k for k in keys if k not in stored],
+            ttl_seconds=ttl_seconds,
+        ):
+            stored[r["key"]] = r["result_id"]
+    return stored
+
+
+async def purge_mutation_keys(
+    pool: Pool,
+    *,
+    ttl: timedelta = MUTATION_KEY_TTL,
+    interval: timedelta = PURGE_INTERVAL,
+) -> None:
+    """Delete expired keys every interval, off the mutations' path."""
+    while True:
+        try:
+            await queries.purge_mutation_keys(pool, ttl_seconds=ttl.total_seconds())
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            log.exception("Purging mutation keys failed")
+        await asyncio.sleep(interval.total_seconds())
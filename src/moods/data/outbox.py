@@ -0,0 +1,24 @@
+"""Change events written to the change_events outbox."""
+
+from .utils import queries
+
+# Topics and their payloads
+MOOD_ENTRIES_LOGGED = "mood_entries_logged"  # user_id, entry_ids
+MOOD_ENTRIES_ARCHIVED = "mood_entries_archived"  # user_id, entry_ids
+MOOD_ENTRIES_IMPORTED = "mood_entries_imported"  # user_id, count
+TAG_UPDATED = "tag_updated"  # name
+TAGS_CREATED = "tags_created"  # names
+USER_UPDATED = "user_updated"  # user_id
+SHARING_UPDATED = "sharing_updated"  # user_id, viewer_ids
+
+
+async def emit_event(conn, topic: str, **payload) -> None:
+    """Add an event to the outbox; UUIDs are stored as strings."""
+    payload = {k: _to_json(v) for k, v in payload.items()}
+    await queries.add_change_event(conn, topic=topic, payload=payload)
+
+
+def _to_json(value):
+    if isinstance(value, list):
+        return [_to_json(v) for v in value]
+    return value if isinstance(value, int | str) else str(value)
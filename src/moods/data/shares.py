@@ -1,71 +1,139 @@
+from uuid import UUID
+
 from asyncpg import Pool
 
+from .outbox import SHARING_UPDATED, emit_event
 from .utils import queries
 
 
+async def attach_filters(conn, shares: list[dict]) -> list[dict]:
+    """Set each share's active filters as share["filters"]."""
+    if not shares:
+        return shares
+
+    share_ids = [s["id"] for s in shares]
+    filters = [
+        dict(r) async for r in queries.get_filters_for_shares(conn, share_ids=share_ids)
+    ]
+
+    filters_by_share = {}
+    for f in filters:
+        filters_by_share.setdefault(f["mood_share_id"], []).append(f)
+
+    for share in shares:
+        share["filters"] = filters_by_share.get(share["id"], [])
+
+    return shares
+
+
+async def match_new_filters(conn, filter_ids: list) -> None:
+    """Record which tags match share filters this transaction created."""
+    if filter_ids:
+        await queries.lock_filter_tag_matches(conn)
+        await queries.add_filter_tag_matches(conn, filter_ids=filter_ids)
+
+
+async def match_new_tags(conn, tag_names: list[str]) -> None:
+    """Record which active share filters match tags this transaction created."""
+    if tag_names:
+        await queries.lock_filter_tag_matches(conn)
+        await queries.add_tag_filter_matches(conn, tag_names=tag_names)
+
+
 class Shares:
     def __init__(self, pool: Pool):
         self.pool = pool
 
     async def get_shares(self, user_id: str) -> list[dict]:
+        return await self._get_shares(self.pool, user_id)
+
+    async def _get_shares(self, conn, user_id: str) -> list[dict]:
         shares = [
-            dict(r)
-            async for r in queries.get_shares_for_user(self.pool, user_id=user_id)
-        ]
-        if not shares:
-            return []
-
-        share_ids = [s["id"] for s in shares]
-        filters = [
-            dict(r)
-            async for r in queries.get_filters_for_shares(
-                self.pool, share_ids=share_ids
-            )
+            dict(r) async for r in queries.get_shares_for_user(conn, user_id=user_id)
         ]
+        return await attach_filters(conn, shares)
 
-        filters_by_share = {}
-        for f in filters:
-            filters_by_share.setdefault(f["mood_share_id"], []).append(f)
+    async def set_shares(self, user_id: str, rules: list[dict]) -> bool:
+        """Make the active shares match rules; returns whether anything changed."""
+        wanted = {}
+        for rule in rules:
+            # Keyed like the rows read back, whatever case the client sent
+            viewer_id = str(UUID(rule["user_id"]))
+            filters = wanted.setdefault(viewer_id, {})
+            for f in rule.get("filters", []):
+                filters[(f["pattern"], f["is_include"])] = None
 
-        for share in shares:
-            share["filters"] = filters_by_share.get(share["id"], [])
+        async with self.pool.acquire() as conn, conn.transaction():
+            await queries.lock_shares_for_user(conn, user_id=user_id)
+            existing = {
+                str(s["shared_with"]): s for s in await self._get_shares(conn, user_id)
+            }
 
-        return shares
+            removed = [s["id"] for v, s in existing.items() if v not in wanted]
+            added = [v for v in wanted if v not in existing]
+            changed = {v for v in existing if v not in wanted} | set(added)
 
-    async def set_shares(self, user_id: str, rules: list[dict]) -> list[dict]:
-        async with self.pool.acquire() as conn, conn.transaction():
-            # Get existing active shares to archive their filters too
-            existing = [
-                dict(r)
-                async for r in queries.get_shares_for_user(conn, user_id=user_id)
-            ]
-            if existing:
-                share_ids = [s["id"] for s in existing]
-                await queries.archive_filters_for_shares(conn, share_ids=share_ids)
-            await queries.archive_shares_for_user(conn, user_id=user_id)
-
-            results = []
-            for rule in rules:
-                share = dict(
-                    await queries.create_share(
+            stale_filter_ids = []
+            new_filters = []
+            for viewer_id, share in existing.items():
+                if viewer_id not in wanted:
+                    continue
+                current = {(f["pattern"], f["is_include"]): f for f in share["filters"]}
+                stale = [
+                    f["id"] for k, f in current.items() if k not in wanted[viewer_id]
+                ]
+                fresh = [k for k in wanted[viewer_id] if k not in current]
+                if stale or fresh:
+                    changed.add(viewer_id)
+                    stale_filter_ids.extend(stale)
+                    new_filters.extend((share["id"], *k) for k in fresh)
+
+            if not changed:
+                return False
+
+            if removed:
+                await queries.archive_filters_for_shares(conn, share_ids=removed)
+                await queries.archive_shares(conn, share_ids=removed)
+            if stale_filter_ids:
+                await queries.archive_filters(conn, filter_ids=stale_filter_ids)
+            if added:
+                async for share in queries.create_shares(
+                    conn, user_id=user_id, shared_with=added
+                ):
+                    viewer_id = str(share["shared_with"])
+                    new_filters.extend((share["id"], *k) for k in wanted[viewer_id])
+
+            if new_filters:
+                share_ids, patterns, is_includes = zip(*new_filters, strict=True)
+                filter_ids = [
+                    r["id"]
+                    async for r in queries.create_share_filters(
                         conn,
-                        user_id=user_id,
-                        shared_with=rule["user_id"],
+                        share_ids=list(share_ids),
+                        patterns=list(patterns),
+                        is_includes=list(is_includes),
                     )
-                )
-
-                share["filters"] = []
-                for f in rule.get("filters", []):
-                    filter_row = dict(
-                        await queries.create_share_filter(
-                            conn,
-                            mood_share_id=share["id"],
-                            pattern=f["pattern"],
-                            is_include=f["is_include"],
-                        )
-                    )
-                    share["filters"].append(filter_row)
+                ]
+                await match_new_filters(conn, filter_ids)
 
-                results.append(share)
+            viewer_ids = list(changed)
+            await queries.clear_shared_visibility(
+                conn, user_id=user_id, viewer_ids=viewer_ids
+            )
+            await queries.add_shared_visibility(
+                conn, user_id=user_id, viewer_ids=viewer_ids
+            )
+            await queries.refresh_shared_delta(
+                conn, user_id=user_id, viewer_ids=viewer_ids
+            )
+            await queries.clear_shared_rollups(
+                conn, user_id=user_id, viewer_ids=viewer_ids
+            )
+            await queries.add_shared_rollups(
+                conn, user_id=user_id, viewer_ids=viewer_ids
+            )
+            await emit_event(
+                conn, SHARING_UPDATED, user_id=user_id, viewer_ids=viewer_ids
+            )
 
-        return results
+        return True
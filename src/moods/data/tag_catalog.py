@@ -0,0 +1,117 @@
+"""Process-local snapshot of the tags table."""
+
+import asyncio
+import bisect
+import re
+from collections.abc import AsyncIterable, Iterable
+from types import MappingProxyType
+
+from asyncpg import Pool
+
+from .outbox import TAG_UPDATED, TAGS_CREATED, emit_event
+from .utils import queries
+
+# pg_trgm's default for the `%` operator
+SIMILARITY_THRESHOLD = 0.3
+
+
+def _trigrams(text: str) -> set[str]:
+    """pg_trgm's trigrams: each word padded with two spaces before, one after."""
+    trigrams = set()
+    for word in re.findall(r"[^\W_]+", text.lower()):
+        padded = f"  {word} "
+        trigrams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def similarity(a: str, b: str) -> float:
+    """Trigram similarity as computed by pg_trgm's similarity()."""
+    a_trigrams, b_trigrams = _trigrams(a), _trigrams(b)
+    if not a_trigrams or not b_trigrams:
+        return 0.0
+    shared = len(a_trigrams & b_trigrams)
+    return shared / (len(a_trigrams) + len(b_trigrams) - shared)
+
+
+async def announce_created_tags(conn, rows: AsyncIterable) -> list[str]:
+    """Drain a query returning created tag names and announce them."""
+    names = [r["name"] async for r in rows]
+    if names:
+        await emit_event(conn, TAGS_CREATED, names=names)
+    return names
+
+
+class TagSnapshot:
+    def __init__(self, version: int, rows: Iterable[dict]):
+        self.version = version
+        self.tags = MappingProxyType(
+            {row["name"]: MappingProxyType(dict(row)) for row in rows}
+        )
+        self.names = tuple(sorted(self.tags))
+
+    def get(self, name: str) -> MappingProxyType:
+        # Created by a write this snapshot predates, so still at the defaults
+        return self.tags.get(name) or MappingProxyType(
+            {"name": name, "metadata": {}, "archived_at": None}
+        )
+
+    def page(
+        self, *, include_archived: bool, after_name: str | None, limit: int
+    ) -> list:
+        """Tags in name order after after_name, at most limit of them."""
+        start = bisect.bisect_right(self.names, after_name) if after_name else 0
+        rows = []
+        for name in self.names[start:]:
+            tag = self.tags[name]
+            if include_archived or tag["archived_at"] is None:
+                rows.append(tag)
+                if len(rows) == limit:
+                    break
+        return rows
+
+    def search(
+        self, query: str, *, include_archived: bool, after_name: str | None, limit: int
+    ) -> list:
+        """Tags matching `name % query`, most similar first, like pg_trgm."""
+        scored = []
+        for name, tag in self.tags.items():
+            if after_name is not None and name <= after_name:
+                continue
+            if not include_archived and tag["archived_at"] is not None:
+                continue
+            score = similarity(name, query)
+            if score >= SIMILARITY_THRESHOLD:
+                scored.append((-score, name, tag))
+        scored.sort(key=lambda s: s[:2])
+        return [tag for _score, _name, tag in scored[:limit]]
+
+
+class TagCatalog:
+    def __init__(self, pool: Pool):
+        self.pool = pool
+        self.version = 0
+        self._snapshot: TagSnapshot | None = None
+        self._lock = asyncio.Lock()
+
+    async def snapshot(self) -> TagSnapshot:
+        """The current snapshot, rebuilt first if a write has committed since."""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.version:
+            return snapshot
+        async with self._lock:
+            # Concurrent readers wait for one rebuild rather than each running it
+            if self._snapshot is None or self._snapshot.version != self.version:
+                version = self.version
+                rows = [dict(r) async for r in queries.get_all_tags(self.pool)]
+                self._snapshot = TagSnapshot(version, rows)
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        """Call after a transaction that wrote tags commits."""
+        self.version += 1
+
+    async def follow(self, events) -> None:
+        """Invalidate on tag writes by any process, as announced on the bus."""
+        async with events.subscribe(TAG_UPDATED, TAGS_CREATED) as subscription:
+            async for _event in subscription:
+                self.invalidate()
@@ -1,11 +1,14 @@
 from asyncpg import Pool
 
-from .utils import DEFAULT_PAGE_SIZE, build_connection, decode_cursor, queries
+from .outbox import TAG_UPDATED, emit_event
+from .tag_catalog import TagCatalog
+from .utils import build_connection, decode_cursor, page_size, queries
 
 
 class Tags:
-    def __init__(self, pool: Pool):
+    def __init__(self, pool: Pool, *, catalog: TagCatalog | None = None):
         self.pool = pool
+        self.catalog = catalog or TagCatalog(pool)
 
     async def get_tags(
         self,
@@ -15,42 +18,49 @@ class Tags:
         first: int | None = None,
         after: str | None = None,
     ) -> dict:
-        limit = first or DEFAULT_PAGE_SIZE
+        """A page of tags from the catalog snapshot; no query once it's built."""
+        limit = page_size(first)
         after_name = decode_cursor(after) if after else None
 
+        snapshot = await self.catalog.snapshot()
         if search:
-            gen = queries.search_tags(
-                self.pool,
-                query=search,
+            rows = snapshot.search(
+                search,
                 include_archived=include_archived,
                 after_name=after_name,
-                page_limit=limit + 1,
+                limit=limit + 1,
             )
         else:
-            gen = queries.get_tags(
-                self.pool,
+            rows = snapshot.page(
                 include_archived=include_archived,
                 after_name=after_name,
-                page_limit=limit + 1,
+                limit=limit + 1,
             )
-
-        rows = [dict(r) async for r in gen]
         return build_connection(rows, "name", limit)
 
     async def update_tag_metadata(self, name: str, metadata: dict) -> dict:
-        row = await queries.update_tag_metadata(self.pool, name=name, metadata=metadata)
-        if not row:
-            raise ValueError("Tag not found")
+        async with self.pool.acquire() as conn, conn.transaction():
+            row = await queries.update_tag_metadata(conn, name=name, metadata=metadata)
+            if not row:
+                raise ValueError("Tag not found")
+            await emit_event(conn, TAG_UPDATED, name=row["name"])
+        self.catalog.invalidate()
         return dict(row)
 
     async def archive_tag(self, name: str) -> dict:
-        row = await queries.archive_tag(self.pool, name=name)
-        if not row:
-            raise ValueError("Tag not found or already archived")
+        async with self.pool.acquire() as conn, conn.transaction():
+            row = await queries.archive_tag(conn, name=name)
+            if not row:
+                raise ValueError("Tag not found or already archived")
+            await emit_event(conn, TAG_UPDATED, name=row["name"])
+        self.catalog.invalidate()
         return dict(row)
 
     async def unarchive_tag(self, name: str) -> dict:
-        row = await queries.unarchive_tag(self.pool, name=name)
-        if not row:
-            raise ValueError("Tag not found or not archived")
+        async with self.pool.acquire() as conn, conn.transaction():
+            row = await queries.unarchive_tag(conn, name=name)
+            if not row:
+                raise ValueError("Tag not found or not archived")
+            await emit_event(conn, TAG_UPDATED, name=row["name"])
+        self.catalog.invalidate()
         return dict(row)
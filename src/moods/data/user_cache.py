@@ -0,0 +1,68 @@
+"""Process-wide cache of user rows behind UserLoader."""
+
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from datetime import timedelta
+
+from .outbox import USER_UPDATED
+
+USER_CACHE_TTL = timedelta(minutes=1)
+MAX_USERS = 10_000
+
+
+class UserCache:
+    def __init__(self, *, ttl: timedelta = USER_CACHE_TTL, max_size: int = MAX_USERS):
+        self.ttl = ttl.total_seconds()
+        self.max_size = max_size
+        self.data: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation, so a read that raced a write is not
+        # stored after the write has already invalidated the row
+        self.generation = 0
+
+    def get_many(self, user_ids: Iterable) -> dict[str, dict]:
+        """Cached rows for the ids, by id as a string; misses are left out."""
+        now = time.monotonic()
+        found = {}
+        for user_id in map(str, user_ids):
+            entry = self.data.get(user_id)
+            if entry is None or entry[0] <= now:
+                self.data.pop(user_id, None)
+                self.misses += 1
+                continue
+            self.data.move_to_end(user_id)
+            self.hits += 1
+            found[user_id] = entry[1]
+        return found
+
+    def put_many(self, rows: Iterable[dict], generation: int) -> None:
+        """Store rows read when `generation` was current, unless since stale."""
+        if generation != self.generation:
+            return
+        expires_at = time.monotonic() + self.ttl
+        for row in rows:
+            self.data[str(row["id"])] = (expires_at, row)
+            self.data.move_to_end(str(row["id"]))
+        while len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+
+    def invalidate(self, user_id) -> None:
+        self.generation += 1
+        self.data.pop(str(user_id), None)
+
+    async def follow(self, events) -> None:
+        """Invalidate users written by any process, as announced on the bus."""
+        async with events.subscribe(USER_UPDATED) as subscription:
+            async for event in subscription:
+                self.invalidate(event["payload"]["user_id"])
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
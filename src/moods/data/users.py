@@ -1,11 +1,29 @@
+from datetime import UTC, datetime, timedelta
+
 from asyncpg import Pool
 
-from .utils import queries
+from .mutation_keys import MUTATION_KEY_TTL, claim_mutation_keys
+from .outbox import USER_UPDATED, emit_event
+from .user_cache import UserCache
+from .utils import queries, uuid7
 
 
 class Users:
-    def __init__(self, pool: Pool):
+    def __init__(
+        self,
+        pool: Pool,
+        *,
+        mutation_key_ttl: timedelta = MUTATION_KEY_TTL,
+        cache: UserCache | None = None,
+    ):
         self.pool = pool
+        self.mutation_key_ttl = mutation_key_ttl
+        self.cache = cache
+
+    def _invalidate(self, user_id) -> None:
+        # After commit, so a concurrent read can't cache the old row again
+        if self.cache is not None:
+            self.cache.invalidate(user_id)
 
     async def get_users(self, include_archived: bool = False) -> list[dict]:
         return [
@@ -15,16 +33,49 @@ class Users:
             )
         ]
 
-    async def create_user(self, name: str, email: str) -> dict:
-        row = await queries.create_user(self.pool, name=name, email=email)
+    async def create_user(
+        self,
+        name: str,
+        email: str,
+        *,
+        created_by: str | None = None,
+        client_mutation_id: str | None = None,
+    ) -> dict:
+        """Create a user; a repeated client_mutation_id returns the first one."""
+        user_id = uuid7(datetime.now(UTC))
+
+        async with self.pool.acquire() as conn, conn.transaction():
+            if client_mutation_id is not None:
+                stored = await claim_mutation_keys(
+                    conn,
+                    user_id=created_by,
+                    mutation="createUser",
+                    keys={client_mutation_id: user_id},
+                    ttl=self.mutation_key_ttl,
+                )
+                if stored[client_mutation_id] != user_id:
+                    row = await queries.get_user_by_id(
+                        conn, id=stored[client_mutation_id]
+                    )
+                    return dict(row)
+
+            row = await queries.create_user(conn, id=user_id, name=name, email=email)
+            await emit_event(conn, USER_UPDATED, user_id=row["id"])
+        self._invalidate(row["id"])
         return dict(row)
 
     async def update_user_settings(self, id: str, settings: dict) -> dict:
-        row = await queries.update_user_settings(self.pool, id=id, settings=settings)
+        async with self.pool.acquire() as conn, conn.transaction():
+            row = await queries.update_user_settings(conn, id=id, settings=settings)
+            await emit_event(conn, USER_UPDATED, user_id=row["id"])
+        self._invalidate(row["id"])
         return dict(row)
 
     async def archive_user(self, id: str) -> dict:
-        row = await queries.archive_user(self.pool, id=id)
+        async with self.pool.acquire() as conn, conn.transaction():
+            row = await queries.archive_user(conn, id=id)
+            await emit_event(conn, USER_UPDATED, user_id=row["id"])
+        self._invalidate(row["id"])
         return dict(row)
 
     async def search_users(self, query: str, page_limit: int = 20) -> list[dict]:
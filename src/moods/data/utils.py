@@ -1,5 +1,8 @@
+import secrets
 from base64 import b64decode, b64encode
+from datetime import UTC, datetime, timedelta
 from pathlib import Path
+from uuid import UUID
 
 import aiosql
 
@@ -8,6 +11,23 @@ SQL_DIR = Path(__file__).parent.parent / "sql"
 queries = aiosql.from_path(str(SQL_DIR), "asyncpg")
 
 DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+def uuid7(at: datetime) -> UUID:
+    """Build a UUIDv7 whose timestamp is `at`, matching the uuidv7() SQL default."""
+    unix_ms = (at - EPOCH) // timedelta(milliseconds=1)
+    rand = secrets.randbits(74)
+    value = (
+        (unix_ms << 80)
+        | (0x7 << 76)
+        | ((rand >> 62) << 64)
+        | (0b10 << 62)
+        | (rand & ((1 << 62) - 1))
+    )
+    return UUID(int=value)
 
 
 def encode_cursor(value: str) -> str:
@@ -18,6 +38,15 @@ def decode_cursor(cursor: str) -> str:
     return b64decode(cursor.encode()).decode()
 
 
+def page_size(first: int | None) -> int:
+    """Rows per page for a `first` argument. Raises ValueError out of range."""
+    if first is None:
+        return DEFAULT_PAGE_SIZE
+    if not 1 <= first <= MAX_PAGE_SIZE:
+        raise ValueError(f"first must be between 1 and {MAX_PAGE_SIZE}")
+    return first
+
+
 def build_connection(rows: list[dict], cursor_key: str, limit: int) -> dict:
     has_next = len(rows) > limit
     nodes = rows[:limit]
@@ -46,3 +46,10 @@ async def _init_connection(conn: asyncpg.Connection):
 
 async def create_pool() -> asyncpg.Pool:
     return await asyncpg.create_pool(get_dsn(), init=_init_connection)
+
+
+async def create_connection() -> asyncpg.Connection:
+    """A standalone connection outside the pool, e.g. for LISTEN."""
+    conn = await asyncpg.connect(get_dsn())
+    await _init_connection(conn)
+    return conn
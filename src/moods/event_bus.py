@@ -0,0 +1,194 @@
+"""
+In-process fan-out of change events announced by Postgres NOTIFY.
+
+One dedicated connection LISTENs on the channel fed by the change_events
+outbox trigger, and each event is handed to every subscription whose topics
+match. If the connection drops, the bus reconnects and replays recent events
+from the outbox, skipping ids it already delivered.
+"""
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from datetime import UTC, datetime, timedelta
+
+import asyncpg
+
+from moods.data.utils import queries
+from moods.db import create_connection
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "moods_change_events"
+
+# Replay window before the disconnect, for events whose transaction started
+# earlier but committed while the bus was away.
+CATCH_UP_GRACE = timedelta(minutes=1)
+SEEN_IDS = 10_000
+QUEUE_SIZE = 1_000
+PURGE_INTERVAL = 3600
+
+DB_ERRORS = (OSError, asyncpg.PostgresError, asyncpg.InterfaceError)
+
+
+def _event(row) -> dict:
+    return {"id": row["id"], "topic": row["topic"], "payload": row["payload"]}
+
+
+class Subscription:
+    """Async iterator of events for some topics (all topics if none)."""
+
+    def __init__(self, bus: "EventBus", topics: frozenset[str]):
+        self.bus = bus
+        self.topics = topics
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def wants(self, event: dict) -> bool:
+        return not self.topics or event["topic"] in self.topics
+
+    def put(self, event: dict) -> None:
+        if self.queue.full():
+            # A stalled consumer loses its oldest events, not the whole bus
+            log.warning("Dropping change event for a slow subscriber")
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    def close(self) -> None:
+        self.bus.subscriptions.discard(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        return await self.queue.get()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+class EventBus:
+    def __init__(
+        self,
+        *,
+        retention: timedelta = timedelta(days=1),
+        reconnect_delay: float = 1.0,
+    ):
+        self.retention = retention
+        self.reconnect_delay = reconnect_delay
+        self.subscriptions: set[Subscription] = set()
+        self._seen: OrderedDict[int, None] = OrderedDict()
+        self._conn: asyncpg.Connection | None = None
+        self._lost = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._fetches: set[asyncio.Task] = set()
+        # The listener connection also runs the bus's own queries, one at a time
+        self._query_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        await self._listen()
+        await self._purge()
+        self._task = asyncio.create_task(self._supervise())
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, *self._fetches) if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._conn and not self._conn.is_closed():
+            await self._conn.close()
+
+    def subscribe(self, *topics: str) -> Subscription:
+        """
+        Start receiving events; use as `async with bus.subscribe(...) as s`.
+
+        Events are dicts with id, topic and payload.
+        """
+        subscription = Subscription(self, frozenset(topics))
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def publish(self, event: dict) -> None:
+        """Deliver an event to matching subscriptions, once per id."""
+        if event["id"] in self._seen:
+            return
+        self._seen[event["id"]] = None
+        if len(self._seen) > SEEN_IDS:
+            self._seen.popitem(last=False)
+
+        for subscription in list(self.subscriptions):
+            if subscription.wants(event):
+                subscription.put(event)
+
+    async def _listen(self) -> None:
+        self._lost.clear()
+        self._conn = await create_connection()
+        self._conn.add_termination_listener(lambda _conn: self._lost.set())
+        await self._conn.add_listener(CHANNEL, self._on_notify)
+
+    def _on_notify(self, conn, _pid, _channel, message: str) -> None:
+        event = json.loads(message)
+        if "payload" in event:
+            self.publish(event)
+        else:
+            # Too large for NOTIFY; read it from the outbox
+            task = asyncio.create_task(self._publish_stored(conn, event["id"]))
+            self._fetches.add(task)
+            task.add_done_callback(self._fetches.discard)
+
+    async def _publish_stored(self, conn, event_id: int) -> None:
+        try:
+            async with self._query_lock:
+                row = await queries.get_change_event(conn, id=event_id)
+        except DB_ERRORS:
+            log.exception("Reading change event %s failed", event_id)
+            return
+        if row:
+            self.publish(_event(row))
+
+    async def _purge(self) -> None:
+        try:
+            async with self._query_lock:
+                await queries.purge_change_events(
+                    self._conn, before=datetime.now(UTC) - self.retention
+                )
+        except DB_ERRORS:
+            log.exception("Purging change events failed")
+
+    async def _catch_up(self, since: datetime) -> None:
+        try:
+            async with self._query_lock:
+                rows = [
+                    r
+                    async for r in queries.get_change_events_since(
+                        self._conn, since=since
+                    )
+                ]
+        except DB_ERRORS:
+            log.exception("Replaying change events failed")
+            return
+        for row in rows:
+            self.publish(_event(row))
+
+    async def _supervise(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._lost.wait(), PURGE_INTERVAL)
+            except TimeoutError:
+                await self._purge()
+                continue
+
+            lost_at = datetime.now(UTC)
+            log.warning("Change event listener disconnected; reconnecting")
+            while True:
+                await asyncio.sleep(self.reconnect_delay)
+                try:
+                    await self._listen()
+                    break
+                except DB_ERRORS:
+                    log.exception("Change event listener reconnect failed")
+
+            await self._catch_up(lost_at - CATCH_UP_GRACE)
@@ -0,0 +1,48 @@
+"""
+Import historical mood entries from an NDJSON or CSV file.
+
+Usage: python -m moods.importer --email alice@example.com entries.ndjson
+
+The file uses the same columns as /export/entries.ndjson and .csv (mood,
+notes, tags, createdAt); other columns are ignored.
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from moods.data import Imports, Users
+from moods.data.imports import read_csv, read_ndjson
+from moods.db import create_pool
+
+
+async def run(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--email", required=True, help="Owner of the entries")
+    parser.add_argument("path", type=Path, help="NDJSON or .csv file")
+    args = parser.parse_args(argv)
+
+    pool = await create_pool()
+    try:
+        user = await Users(pool).get_user_by_email(args.email)
+        if not user:
+            parser.error(f"No user with email {args.email}")
+
+        with args.path.open(newline="", encoding="utf-8") as f:
+            rows = read_csv(f) if args.path.suffix == ".csv" else read_ndjson(f)
+            return await Imports(pool).import_entries(str(user["id"]), rows)
+    finally:
+        await pool.close()
+
+
+def main() -> None:
+    result = asyncio.run(run())
+    for reject in result["rejected"]:
+        print(f"line {reject['line']}: {reject['error']}", file=sys.stderr)
+    print(f"Imported {result['imported']}, rejected {len(result['rejected'])}")
+    sys.exit(1 if result["rejected"] else 0)
+
+
+if __name__ == "__main__":
+    main()
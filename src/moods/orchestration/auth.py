@@ -11,6 +11,15 @@ def _generate_code() -> str:
     return f"{secrets.randbelow(1000000):06d}"
 
 
+def decode_token(token: str, jwt_secret: str) -> str | None:
+    """The id of the user a token was issued to, None if it isn't valid."""
+    try:
+        payload = jwt.decode(token, jwt_secret, algorithms=["HS256"])
+        return payload["sub"]
+    except (jwt.InvalidTokenError, KeyError):
+        return None
+
+
 class Auth:
     def __init__(self, users: Users, email: Email, settings):
         self.users = users
@@ -67,8 +76,4 @@ class Auth:
             return None
 
     def decode_token(self, token: str) -> str | None:
-        try:
-            payload = jwt.decode(token, self.jwt_secret, algorithms=["HS256"])
-            return payload["sub"]
-        except (jwt.InvalidTokenError, KeyError):
-            return None
+        return decode_token(token, self.jwt_secret)
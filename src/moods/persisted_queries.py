@@ -0,0 +1,119 @@
+"""
+Automatic persisted queries (APQ) for the GraphQL HTTP endpoint.
+
+Clients may send `extensions.persistedQuery.sha256Hash` instead of the query
+text, which keeps request bodies small and lets queries go over GET. Hashes
+of the shared operations are preloaded from the manifest written by
+graphql/generate.py; any other query is registered the first time a client
+sends it together with its hash, in a bounded LRU. Documents are parsed once,
+when they are loaded or registered. Requests are resolved by the HTTP handler
+in moods.resolvers.http.
+"""
+
+import json
+import logging
+from hashlib import sha256
+from pathlib import Path
+
+from graphql import DocumentNode, GraphQLError, parse
+from moods.query_cache import LRUCache
+
+log = logging.getLogger(__name__)
+
+MANIFEST = Path(__file__).parent.parent.parent / "graphql" / "persisted-queries.json"
+
+# Queries registered at runtime beyond the manifest
+MAX_REGISTERED = 1000
+
+
+class PersistedQueryError(Exception):
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.code = code
+
+    def to_dict(self) -> dict:
+        return {"message": str(self), "extensions": {"code": self.code}}
+
+
+def _parse(query: str) -> DocumentNode | None:
+    try:
+        return parse(query)
+    except GraphQLError:
+        return None
+
+
+class PersistedQueries:
+    def __init__(
+        self,
+        manifest: dict[str, str] | None = None,
+        *,
+        max_registered: int = MAX_REGISTERED,
+    ):
+        self.manifest: dict[str, tuple[str, DocumentNode]] = {}
+        for query_hash, query in (manifest or {}).items():
+            document = _parse(query)
+            if document is None:
+                log.warning("Skipping unparsable persisted query %s", query_hash)
+            else:
+                self.manifest[query_hash] = (query, document)
+        self.registered = LRUCache(max_registered)
+
+    @classmethod
+    def load(cls, path: Path = MANIFEST) -> "PersistedQueries":
+        try:
+            manifest = json.loads(path.read_text())
+        except FileNotFoundError:
+            log.warning("No persisted query manifest at %s", path)
+            manifest = {}
+        return cls(manifest)
+
+    def get(self, query_hash: str) -> tuple[str, DocumentNode] | None:
+        return self.manifest.get(query_hash) or self.registered.get(query_hash)
+
+    def register(self, query_hash: str, query: str) -> DocumentNode | None:
+        """Remember a query sent with its hash; None if it doesn't parse."""
+        if entry := self.get(query_hash):
+            return entry[1]
+        document = _parse(query)
+        if document is None:
+            # Left to the normal path, which reports the syntax error
+            return None
+        self.registered.put(query_hash, (query, document))
+        return document
+
+    def resolve(self, data: dict) -> tuple[dict, DocumentNode | None]:
+        """
+        Fill in the query of an APQ request.
+
+        Returns the request data and its parsed document, or the data
+        unchanged and None when the request doesn't use APQ.
+        """
+        extensions = data.get("extensions")
+        if not isinstance(extensions, dict):
+            return data, None
+        persisted = extensions.get("persistedQuery")
+        if not isinstance(persisted, dict):
+            return data, None
+        if persisted.get("version") != 1:
+            raise PersistedQueryError(
+                "Unsupported persisted query version", "PERSISTED_QUERY_NOT_SUPPORTED"
+            )
+
+        query_hash = persisted.get("sha256Hash")
+        query = data.get("query")
+        if query:
+            if not isinstance(query, str) or (
+                sha256(query.encode()).hexdigest() != query_hash
+            ):
+                raise PersistedQueryError(
+                    "provided sha does not match query", "PERSISTED_QUERY_HASH_MISMATCH"
+                )
+            return data, self.register(query_hash, query)
+
+        entry = self.get(query_hash) if isinstance(query_hash, str) else None
+        if entry is None:
+            raise PersistedQueryError(
+                "PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND"
+            )
+        query, document = entry
+        return {**data, "query": query}, document
@@ -0,0 +1,132 @@
+"""
+Caches in front of GraphQL parsing, validation and introspection.
+
+Clients send a small fixed set of operations, so parsed documents are kept in
+an LRU keyed by the query text and validation results per document and rule
+set. Introspection results depend only on the schema and are cached whole.
+Hit and miss counts are reported by /health.
+"""
+
+import json
+from collections import OrderedDict
+from collections.abc import Hashable
+
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    GraphQLSchema,
+    OperationType,
+    get_operation_ast,
+    parse,
+    validate,
+)
+
+MAX_DOCUMENTS = 500
+MAX_INTROSPECTION_RESULTS = 32
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently read entry."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value) -> None:
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self.data), "hits": self.hits, "misses": self.misses}
+
+
+class QueryCache:
+    def __init__(
+        self,
+        *,
+        max_documents: int = MAX_DOCUMENTS,
+        max_introspection_results: int = MAX_INTROSPECTION_RESULTS,
+    ):
+        self.documents = LRUCache(max_documents)
+        self.validations = LRUCache(max_documents)
+        self.introspection = LRUCache(max_introspection_results)
+
+    def parse(self, _context, data: dict) -> DocumentNode:
+        """Ariadne `query_parser`: syntax errors propagate and aren't cached."""
+        query = data["query"]
+        document = self.documents.get(query)
+        if document is None:
+            document = parse(query)
+            self.documents.put(query, document)
+        return document
+
+    def validate(
+        self,
+        schema: GraphQLSchema,
+        document: DocumentNode,
+        rules=None,
+        max_errors: int | None = None,
+        type_info=None,
+    ) -> list:
+        """
+        Ariadne `query_validator`, remembering results per document.
+
+        Rules marked `per_request` (they depend on variables) are run every
+        time, after the cached rules pass.
+        """
+        if type_info is not None:
+            return validate(schema, document, rules, max_errors, type_info)
+
+        rules = tuple(rules or ())
+        request_rules = tuple(r for r in rules if getattr(r, "per_request", False))
+        cached_rules = tuple(r for r in rules if r not in request_rules)
+
+        # Keyed by identity, which parse() keeps stable per query text. The
+        # entry holds the document so its id can't be reused while cached.
+        key = (id(document), cached_rules, max_errors)
+        entry = self.validations.get(key)
+        if entry is None:
+            errors = validate(schema, document, cached_rules or None, max_errors)
+            entry = (document, errors)
+            self.validations.put(key, entry)
+        if entry[1] or not request_rules:
+            return entry[1]
+        return validate(schema, document, request_rules, max_errors)
+
+    def introspection_key(self, document: DocumentNode, data: dict) -> tuple | None:
+        """Cache key for an operation that only reads the schema, else None."""
+        operation = get_operation_ast(document, data.get("operationName"))
+        if operation is None or operation.operation != OperationType.QUERY:
+            return None
+        for selection in operation.selection_set.selections:
+            if not (
+                isinstance(selection, FieldNode)
+                and selection.name.value.startswith("__")
+            ):
+                return None
+        return (
+            data["query"],
+            data.get("operationName"),
+            json.dumps(data.get("variables"), sort_keys=True),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "documents": self.documents.stats(),
+            "validations": self.validations.stats(),
+            "introspection": self.introspection.stats(),
+        }
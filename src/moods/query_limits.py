@@ -0,0 +1,158 @@
+"""
+Validation rules bounding how much work one GraphQL operation can ask for.
+
+Depth counts nested field selections. Cost estimates how many objects an
+operation can return: every object field counts once per parent object, and
+lists multiply what is selected inside them, connections by their page size
+(`first`, or the default) and other lists by LIST_SIZE. Introspection fields
+count towards neither. Page sizes themselves are capped in the data layer.
+"""
+
+from collections.abc import Iterator
+
+from graphql import (
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLNamedType,
+    GraphQLObjectType,
+    InlineFragmentNode,
+    SelectionSetNode,
+    ValidationContext,
+    ValidationRule,
+    get_argument_values,
+    get_named_type,
+    get_nullable_type,
+    is_list_type,
+)
+from moods.data.utils import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+# Assumed length of list fields without a `first` argument
+LIST_SIZE = 10
+
+
+def _fields(
+    context: ValidationContext,
+    selection_set: SelectionSetNode,
+    parent_type: GraphQLNamedType | None,
+    seen: frozenset[str],
+) -> Iterator[tuple[FieldNode, GraphQLNamedType | None, frozenset[str]]]:
+    """
+    Yield (field, parent type, fragments expanded so far) with fragments
+    flattened. Fragments already expanded on the path are skipped, so cycles
+    end here rather than in NoFragmentCyclesRule's error.
+    """
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            if not selection.name.value.startswith("__"):
+                yield selection, parent_type, seen
+        elif isinstance(selection, InlineFragmentNode):
+            fragment_type = parent_type
+            if selection.type_condition:
+                name = selection.type_condition.name.value
+                fragment_type = context.schema.get_type(name)
+            yield from _fields(context, selection.selection_set, fragment_type, seen)
+        elif isinstance(selection, FragmentSpreadNode):
+            name = selection.name.value
+            fragment = context.get_fragment(name)
+            if fragment and name not in seen:
+                fragment_type = context.schema.get_type(
+                    fragment.type_condition.name.value
+                )
+                yield from _fields(
+                    context, fragment.selection_set, fragment_type, seen | {name}
+                )
+
+
+def _depth(context, selection_set, seen=frozenset()) -> int:
+    return max(
+        (
+            1 + (_depth(context, f.selection_set, s) if f.selection_set else 0)
+            for f, _type, s in _fields(context, selection_set, None, seen)
+        ),
+        default=0,
+    )
+
+
+def _page_size(field_def, field: FieldNode, variables: dict | None) -> int:
+    try:
+        first = get_argument_values(field_def, field, variables).get("first")
+    except GraphQLError:
+        first = None  # Bad variables are reported when the operation runs
+    if first is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(first, MAX_PAGE_SIZE))
+
+
+def _cost(
+    context: ValidationContext,
+    selection_set: SelectionSetNode,
+    parent_type: GraphQLNamedType | None,
+    variables: dict | None,
+    count: int = 1,
+    page_size: int | None = None,
+    seen: frozenset[str] = frozenset(),
+) -> int:
+    total = 0
+    for field, field_parent, field_seen in _fields(
+        context, selection_set, parent_type, seen
+    ):
+        if not (field.selection_set and isinstance(field_parent, GraphQLObjectType)):
+            continue  # Scalars are free
+        field_def = field_parent.fields.get(field.name.value)
+        if field_def is None:
+            continue
+
+        field_count = count
+        if is_list_type(get_nullable_type(field_def.type)):
+            # `edges` of a connection are as long as its page
+            field_count *= page_size or LIST_SIZE
+        child_page_size = None
+        if "first" in field_def.args:
+            child_page_size = _page_size(field_def, field, variables)
+
+        total += field_count + _cost(
+            context,
+            field.selection_set,
+            get_named_type(field_def.type),
+            variables,
+            field_count,
+            child_page_size,
+            field_seen,
+        )
+    return total
+
+
+def depth_limit_rule(max_depth: int) -> type[ValidationRule]:
+    class DepthLimitRule(ValidationRule):
+        def enter_operation_definition(self, node, *_args):
+            depth = _depth(self.context, node.selection_set)
+            if depth > max_depth:
+                self.report_error(
+                    GraphQLError(
+                        f"Query depth {depth} exceeds the maximum of {max_depth}",
+                        node,
+                    )
+                )
+
+    return DepthLimitRule
+
+
+def cost_limit_rule(max_cost: int, variables: dict | None) -> type[ValidationRule]:
+    class CostLimitRule(ValidationRule):
+        # Depends on the request's variables, so QueryCache doesn't keep it
+        per_request = True
+
+        def enter_operation_definition(self, node, *_args):
+            root_type = self.context.schema.get_root_type(node.operation)
+            cost = _cost(self.context, node.selection_set, root_type, variables)
+            if cost > max_cost:
+                self.report_error(
+                    GraphQLError(
+                        f"Query cost {cost} exceeds the maximum of {max_cost}",
+                        node,
+                        extensions={"cost": {"requested": cost, "maximum": max_cost}},
+                    )
+                )
+
+    return CostLimitRule
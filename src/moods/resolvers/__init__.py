@@ -1,14 +1,31 @@
+from datetime import timedelta
 from pathlib import Path
 
 from ariadne import load_schema_from_path, make_executable_schema
 from ariadne.asgi import GraphQL
+from ariadne.asgi.handlers import GraphQLTransportWSHandler
 from asyncpg import Pool
 
-from moods.data import Moods, Shares, Tags, Users, create_loaders
+from moods.data import (
+    Changes,
+    Moods,
+    Shares,
+    TagCatalog,
+    Tags,
+    UserCache,
+    Users,
+    create_loaders,
+)
+from moods.event_bus import EventBus
 from moods.orchestration.auth import Auth
+from moods.persisted_queries import PersistedQueries
+from moods.query_cache import QueryCache
+from moods.query_limits import cost_limit_rule, depth_limit_rule
 from moods.services.email import Email
 
-from .auth import get_auth_resolvers, get_token
+from .auth import get_auth_resolvers, get_auth_user_id, store_connection_params
+from .changes import get_changes_resolvers
+from .http import MoodsHTTPHandler
 from .mood import get_moods_resolver
 from .scalars import scalars
 from .tag import get_tag_resolvers
@@ -17,37 +34,72 @@ from .user import get_user_resolvers
 SCHEMA_DIR = Path(__file__).parent.parent / "schema"
 
 
-def create_gql(pool: Pool, settings) -> GraphQL:
-    moods = Moods(pool)
+def create_gql(
+    pool: Pool,
+    settings,
+    events: EventBus,
+    *,
+    persisted_queries: PersistedQueries | None = None,
+    query_cache: QueryCache | None = None,
+    user_cache: UserCache | None = None,
+    tag_catalog: TagCatalog | None = None,
+) -> GraphQL:
+    changes = Changes(pool)
+    tag_catalog = tag_catalog or TagCatalog(pool)
+    mutation_key_ttl = timedelta(hours=settings.mutation_key_ttl_hours)
+    moods = Moods(
+        pool,
+        use_visibility_index=settings.visibility_index,
+        mutation_key_ttl=mutation_key_ttl,
+        tag_catalog=tag_catalog,
+    )
     shares = Shares(pool)
-    tags = Tags(pool)
-    users = Users(pool)
+    tags = Tags(pool, catalog=tag_catalog)
+    users = Users(pool, mutation_key_ttl=mutation_key_ttl, cache=user_cache)
     email = Email(settings)
     auth = Auth(users, email, settings)
 
+    query_cache = query_cache or QueryCache()
+    depth_limit = depth_limit_rule(settings.query_max_depth)
+
+    def validation_rules(_context, _document, data):
+        variables = data.get("variables")
+        return [depth_limit, cost_limit_rule(settings.query_max_cost, variables)]
+
     type_defs = load_schema_from_path(str(SCHEMA_DIR))
 
     schema = make_executable_schema(
         type_defs,
         get_auth_resolvers(auth),
-        get_moods_resolver(moods),
+        get_changes_resolvers(changes),
+        get_moods_resolver(moods, events),
         scalars,
         get_tag_resolvers(tags),
-        get_user_resolvers(moods, shares, users),
+        get_user_resolvers(shares, users),
         convert_names_case=True,
     )
 
     async def get_context(request, _data=None):
-        token = get_token(request)
-        auth_user_id = auth.decode_token(token)
+        auth_user_id = get_auth_user_id(request, settings)
 
         return {
             "request": request,
             "auth_user_id": auth_user_id,
-            **create_loaders(pool),
+            **create_loaders(pool, user_cache, tag_catalog, moods),
         }
 
-    return GraphQL(schema, context_value=get_context)
+    return GraphQL(
+        schema,
+        context_value=get_context,
+        execute_get_queries=True,
+        query_parser=query_cache.parse,
+        query_validator=query_cache.validate,
+        validation_rules=validation_rules,
+        http_handler=MoodsHTTPHandler(
+            persisted_queries or PersistedQueries.load(), query_cache
+        ),
+        websocket_handler=GraphQLTransportWSHandler(on_connect=store_connection_params),
+    )
 
 
 __all__ = ["create_gql"]
@@ -1,7 +1,7 @@
 from ariadne import MutationType
 
 from graphql import GraphQLError
-from moods.orchestration.auth import Auth
+from moods.orchestration.auth import Auth, decode_token
 
 COOKIE_NAME = "moods_token"
 
@@ -17,8 +17,21 @@ def get_token(request):
     auth_header = request.headers.get("authorization", "")
     if auth_header.startswith("Bearer "):
         return auth_header[7:]
-    else:
-        return request.cookies.get(COOKIE_NAME)
+    # Websocket clients can't set headers; they may send the token in the
+    # graphql-ws connection_init payload instead
+    params = request.scope.get("connection_params") or {}
+    return params.get("token") or request.cookies.get(COOKIE_NAME)
+
+
+def get_auth_user_id(request, settings) -> str | None:
+    """The authenticated user's id, from a bearer token or the cookie."""
+    token = get_token(request)
+    return decode_token(token, settings.jwt_secret) if token else None
+
+
+def store_connection_params(websocket, payload) -> None:
+    """graphql-ws on_connect hook keeping the connection_init payload."""
+    websocket.scope["connection_params"] = payload if isinstance(payload, dict) else {}
 
 
 class AuthResolver:
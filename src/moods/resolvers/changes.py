@@ -0,0 +1,22 @@
+from ariadne import QueryType
+
+from moods.data import Changes
+from moods.resolvers.auth import require_auth
+
+
+class ChangesResolver:
+    def __init__(self, changes: Changes):
+        self.changes = changes
+
+    async def resolve_changes_since(self, _obj, info, *, token=None):
+        user_id = require_auth(info)
+        return await self.changes.get_changes(viewer_id=user_id, token=token)
+
+
+def get_changes_resolvers(changes: Changes) -> list[QueryType]:
+    changes_resolver = ChangesResolver(changes)
+
+    query = QueryType()
+    query.set_field("changesSince", changes_resolver.resolve_changes_since)
+
+    return [query]
@@ -0,0 +1,96 @@
+import json
+from contextlib import suppress
+
+from ariadne.asgi.handlers import GraphQLHTTPHandler
+from ariadne.exceptions import HttpBadRequestError
+from starlette.requests import Request
+
+from graphql import DocumentNode, GraphQLError, OperationType, get_operation_ast
+from moods.persisted_queries import PersistedQueries, PersistedQueryError
+from moods.query_cache import QueryCache
+
+
+def _is_query(document: DocumentNode, data: dict) -> bool:
+    operation = get_operation_ast(document, data.get("operationName"))
+    return operation is not None and operation.operation == OperationType.QUERY
+
+
+def _json_param(request: Request, name: str):
+    value = request.query_params.get(name, "").strip()
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError as ex:
+        raise HttpBadRequestError(f"{name} query arg is not a valid JSON") from ex
+
+
+class MoodsHTTPHandler(GraphQLHTTPHandler):
+    """
+    Ariadne's HTTP handler plus persisted queries (including hashed GETs)
+    and cached introspection results.
+    """
+
+    def __init__(self, persisted: PersistedQueries, cache: QueryCache, **kwargs):
+        super().__init__(**kwargs)
+        self.persisted = persisted
+        self.cache = cache
+
+    @staticmethod
+    def _is_hashed_get(request: Request) -> bool:
+        return request.method == "GET" and "extensions" in request.query_params
+
+    async def handle_request(self, request: Request):
+        # The base handler only executes GETs that carry a `query` param
+        if self.execute_get_queries and self._is_hashed_get(request):
+            return await self.graphql_http_server(request)
+        return await super().handle_request(request)
+
+    async def extract_data_from_request(self, request: Request) -> dict | list:
+        if self.execute_get_queries and self._is_hashed_get(request):
+            return self.extract_data_from_get_request(request)
+        return await super().extract_data_from_request(request)
+
+    def extract_data_from_get_request(self, request: Request) -> dict:
+        operation_name = request.query_params.get("operationName", "").strip()
+        return {
+            # Not stripped: the hash covers the exact text
+            "query": request.query_params.get("query") or None,
+            "operationName": operation_name or None,
+            "variables": _json_param(request, "variables"),
+            "extensions": _json_param(request, "extensions"),
+        }
+
+    async def execute_graphql_query(
+        self, request, data, *, context_value=None, query_document=None
+    ):
+        introspection_key = None
+        if isinstance(data, dict):
+            try:
+                data, query_document = self.persisted.resolve(data)
+            except PersistedQueryError as error:
+                # 200 like other GraphQL errors, so APQ clients read the code
+                # and retry with the full query
+                return True, {"errors": [error.to_dict()]}
+
+            if query_document is None and isinstance(data.get("query"), str):
+                # Syntax errors are reported by the normal path
+                with suppress(GraphQLError):
+                    query_document = self.cache.parse(context_value, data)
+            if query_document is not None:
+                # Lets ETagMiddleware tag the response; mutations are never
+                # tagged, and websocket operations have no HTTP response
+                if isinstance(request, Request) and _is_query(query_document, data):
+                    request.state.graphql_query = True
+                introspection_key = self.cache.introspection_key(query_document, data)
+                if introspection_key:
+                    result = self.cache.introspection.get(introspection_key)
+                    if result is not None:
+                        return True, result
+
+        success, result = await super().execute_graphql_query(
+            request, data, context_value=context_value, query_document=query_document
+        )
+        if introspection_key and success and "errors" not in result:
+            self.cache.introspection.put(introspection_key, result)
+        return success, result
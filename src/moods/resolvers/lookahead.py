@@ -0,0 +1,46 @@
+from collections.abc import Iterable, Iterator
+
+from graphql import (
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLResolveInfo,
+    InlineFragmentNode,
+    SelectionSetNode,
+)
+
+
+def _field_nodes(
+    info: GraphQLResolveInfo, selection_sets: Iterable[SelectionSetNode | None]
+) -> Iterator[FieldNode]:
+    for selection_set in selection_sets:
+        if selection_set is None:
+            continue
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection
+            elif isinstance(selection, InlineFragmentNode):
+                yield from _field_nodes(info, [selection.selection_set])
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = info.fragments.get(selection.name.value)
+                if fragment:
+                    yield from _field_nodes(info, [fragment.selection_set])
+
+
+def selected_fields(info: GraphQLResolveInfo, *path: str) -> set[str]:
+    """
+    Names of the fields selected at `path` below the field being resolved,
+    e.g. `selected_fields(info, "edges", "node")` for a connection's nodes.
+
+    Fragments are expanded; @skip and @include are ignored, so a field is
+    reported whenever it could be requested.
+    """
+    nodes = list(info.field_nodes)
+    for name in path:
+        nodes = [
+            node
+            for node in _field_nodes(info, (n.selection_set for n in nodes))
+            if node.name.value == name
+        ]
+    return {
+        node.name.value for node in _field_nodes(info, (n.selection_set for n in nodes))
+    }
@@ -1,9 +1,13 @@
-from ariadne import MutationType, ObjectType, QueryType
+from ariadne import MutationType, ObjectType, QueryType, SubscriptionType
 
 from moods.data import Moods
+from moods.data.outbox import MOOD_ENTRIES_LOGGED, SHARING_UPDATED
+from moods.event_bus import EventBus
 from moods.resolvers.auth import require_auth
+from moods.resolvers.lookahead import selected_fields
 
 mood_entry = ObjectType("MoodEntry")
+mood_stats = ObjectType("MoodStats")
 
 
 @mood_entry.field("user")
@@ -16,9 +20,26 @@ async def resolve_mood_entry_tags(entry, info):
     return await info.context["mood_entry_tags_loader"].load(entry["id"])
 
 
+def prime_entry_loaders(info, connection: dict) -> dict:
+    """Seed the loaders with the authors and tags read along with a page."""
+    for edge in connection["edges"]:
+        entry = edge["node"]
+        if "user" in entry:
+            info.context["user_loader"].prime(entry["user_id"], entry["user"])
+        if "tags" in entry:
+            info.context["mood_entry_tags_loader"].prime(entry["id"], entry["tags"])
+    return connection
+
+
+@mood_stats.field("user")
+async def resolve_mood_stats_user(stats, info):
+    return await info.context["user_loader"].load(stats["user_id"])
+
+
 class MoodsResolver:
-    def __init__(self, moods: Moods):
+    def __init__(self, moods: Moods, events: EventBus):
         self.moods = moods
+        self.events = events
 
     async def resolve_mood_entries(
         self,
@@ -31,12 +52,27 @@ class MoodsResolver:
         after=None,
     ):
         user_id = require_auth(info)
-        return await self.moods.get_mood_entries(
+        connection = await self.moods.get_mood_entries(
             user_ids=user_ids,
             include_archived=include_archived,
             first=first,
             after=after,
             viewer_id=user_id,
+            fields=selected_fields(info, "edges", "node"),
+        )
+        return prime_entry_loaders(info, connection)
+
+    async def resolve_mood_stats(
+        self, _obj, info, *, user_ids=None, bucket="DAY", **window
+    ):
+        # `from` is a Python keyword, so the date window arrives as **window
+        user_id = require_auth(info)
+        return await self.moods.get_mood_stats(
+            viewer_id=user_id,
+            user_ids=user_ids,
+            start=window.get("from"),
+            end=window.get("to"),
+            bucket=bucket.lower(),
         )
 
     async def resolve_log_mood(self, _obj, info, *, input):
@@ -46,20 +82,80 @@ class MoodsResolver:
             mood=input["mood"],
             notes=input["notes"],
             tags=input.get("tags"),
+            client_mutation_id=input.get("client_mutation_id"),
+        )
+
+    async def resolve_log_moods(self, _obj, info, *, inputs):
+        user_id = require_auth(info)
+        return await self.moods.create_mood_entries(
+            user_id=user_id,
+            entries=[
+                {
+                    "mood": entry["mood"],
+                    "notes": entry["notes"],
+                    "tags": entry.get("tags"),
+                    "client_mutation_id": entry.get("client_mutation_id"),
+                }
+                for entry in inputs
+            ],
         )
 
     async def resolve_archive_mood_entry(self, _obj, info, *, id):
         user_id = require_auth(info)
         return await self.moods.archive_mood_entry(entry_id=id, user_id=user_id)
 
+    async def subscribe_mood_entry_logged(self, _obj, info, *, user_ids=None):
+        # Checked before returning the stream so the error reaches the client
+        user_id = require_auth(info)
+        return self._logged_entries(info, user_id, user_ids)
+
+    async def _logged_entries(self, info, viewer_id, user_ids):
+        """
+        Yield entries logged by authors the viewer can see, as they commit.
+
+        Events from other authors are dropped without a query; the visible
+        author set is reloaded when someone changes sharing with the viewer.
+        Entries from visible authors are read through the visibility index,
+        so share filters apply exactly as they do to moodEntries.
+        """
+        async with self.events.subscribe(MOOD_ENTRIES_LOGGED, SHARING_UPDATED) as sub:
+            authors = await self.moods.get_visible_authors(
+                viewer_id=viewer_id, user_ids=user_ids
+            )
+            async for event in sub:
+                payload = event["payload"]
+                if event["topic"] == SHARING_UPDATED:
+                    if viewer_id in payload["viewer_ids"]:
+                        authors = await self.moods.get_visible_authors(
+                            viewer_id=viewer_id, user_ids=user_ids
+                        )
+                    continue
+                if payload["user_id"] not in authors:
+                    continue
+
+                entries = await self.moods.get_visible_entries(
+                    viewer_id=viewer_id, entry_ids=payload["entry_ids"]
+                )
+                # The context lives as long as the subscription
+                info.context["user_loader"].clear_all()
+                for entry in entries:
+                    yield entry
+
 
-def get_moods_resolver(moods: Moods) -> list[QueryType]:
+def get_moods_resolver(moods: Moods, events: EventBus) -> list[QueryType]:
     query = QueryType()
     mutation = MutationType()
+    subscription = SubscriptionType()
 
-    moods_resolver = MoodsResolver(moods)
+    moods_resolver = MoodsResolver(moods, events)
     query.set_field("moodEntries", moods_resolver.resolve_mood_entries)
+    query.set_field("moodStats", moods_resolver.resolve_mood_stats)
     mutation.set_field("logMood", moods_resolver.resolve_log_mood)
+    mutation.set_field("logMoods", moods_resolver.resolve_log_moods)
     mutation.set_field("archiveMoodEntry", moods_resolver.resolve_archive_mood_entry)
+    subscription.set_source(
+        "moodEntryLogged", moods_resolver.subscribe_mood_entry_logged
+    )
+    subscription.set_field("moodEntryLogged", lambda entry, _info, **_args: entry)
 
-    return [query, mutation, mood_entry]
+    return [query, mutation, subscription, mood_entry, mood_stats]
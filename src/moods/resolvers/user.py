@@ -1,13 +1,37 @@
 from ariadne import MutationType, ObjectType, QueryType
 
-from moods.data import Moods, Shares, Users
+from moods.data import Shares, Users
+from moods.data.loaders import EntriesPage
 from moods.resolvers.auth import require_auth
+from moods.resolvers.lookahead import selected_fields
+from moods.resolvers.mood import prime_entry_loaders
 
 
 async def resolve_user(_obj, info, *, id):
     return await info.context["user_loader"].load(id)
 
 
+async def resolve_user_shared_with(user, info):
+    return await info.context["share_rules_loader"].load(str(user["id"]))
+
+
+async def resolve_user_entries(
+    user, info, *, include_archived=False, first=None, after=None
+):
+    user_id = require_auth(info)
+    connection = await info.context["entries_page_loader"].load(
+        EntriesPage(
+            viewer_id=user_id,
+            user_id=str(user["id"]),
+            first=first,
+            after=after,
+            include_archived=include_archived,
+            fields=frozenset(selected_fields(info, "edges", "node")),
+        )
+    )
+    return prime_entry_loaders(info, connection)
+
+
 async def resolve_share_rule_user(share, info):
     return await info.context["user_loader"].load(str(share["shared_with"]))
 
@@ -17,8 +41,7 @@ async def resolve_share_rule_filters(share, _info):
 
 
 class UserResolver:
-    def __init__(self, moods: Moods, shares: Shares, users: Users):
-        self.moods = moods
+    def __init__(self, shares: Shares, users: Users):
         self.shares = shares
         self.users = users
 
@@ -30,8 +53,13 @@ class UserResolver:
         return await self.users.search_users(query=search)
 
     async def resolve_create_user(self, _obj, info, *, input):
-        require_auth(info)
-        return await self.users.create_user(name=input["name"], email=input["email"])
+        user_id = require_auth(info)
+        return await self.users.create_user(
+            name=input["name"],
+            email=input["email"],
+            created_by=user_id,
+            client_mutation_id=input.get("client_mutation_id"),
+        )
 
     async def resolve_update_user_settings(self, _obj, info, *, input):
         user_id = require_auth(info)
@@ -45,28 +73,19 @@ class UserResolver:
         return await self.users.archive_user(id=id)
 
     async def resolve_update_sharing(self, _obj, info, *, input):
-        user_id = require_auth(info)
-        await self.shares.set_shares(user_id=user_id, rules=input["rules"])
-        return await info.context["user_loader"].load(user_id)
+        payload = await self.resolve_sync_sharing(_obj, info, input=input)
+        return payload["user"]
 
-    async def resolve_user_entries(
-        self, user, info, *, include_archived=False, first=None, after=None
-    ):
+    async def resolve_sync_sharing(self, _obj, info, *, input):
         user_id = require_auth(info)
-        return await self.moods.get_mood_entries(
-            user_ids=[str(user["id"])],
-            include_archived=include_archived,
-            first=first,
-            after=after,
-            viewer_id=user_id,
-        )
-
-    async def resolve_user_shared_with(self, user, info):
-        return await self.shares.get_shares(user_id=str(user["id"]))
+        changed = await self.shares.set_shares(user_id=user_id, rules=input["rules"])
+        info.context["share_rules_loader"].clear(user_id)
+        user = await info.context["user_loader"].load(user_id)
+        return {"user": user, "changed": changed}
 
 
-def get_user_resolvers(moods: Moods, shares: Shares, users: Users) -> list[QueryType]:
-    user_resolver = UserResolver(moods, shares, users)
+def get_user_resolvers(shares: Shares, users: Users) -> list[QueryType]:
+    user_resolver = UserResolver(shares, users)
 
     query = QueryType()
     mutation = MutationType()
@@ -80,8 +99,9 @@ def get_user_resolvers(moods: Moods, shares: Shares, users: Users) -> list[Query
     mutation.set_field("updateUserSettings", user_resolver.resolve_update_user_settings)
     mutation.set_field("archiveUser", user_resolver.resolve_archive_user)
     mutation.set_field("updateSharing", user_resolver.resolve_update_sharing)
-    user_obj.set_field("entries", user_resolver.resolve_user_entries)
-    user_obj.set_field("sharedWith", user_resolver.resolve_user_shared_with)
+    mutation.set_field("syncSharing", user_resolver.resolve_sync_sharing)
+    user_obj.set_field("entries", resolve_user_entries)
+    user_obj.set_field("sharedWith", resolve_user_shared_with)
     share_rule_obj.set_field("user", resolve_share_rule_user)
     share_rule_obj.set_field("filters", resolve_share_rule_filters)
 
@@ -0,0 +1,4 @@
+from .export import create_export
+from .imports import create_import
+
+__all__ = ["create_export", "create_import"]
@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from uuid import UUID
+
+from asyncpg import Pool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route, Router
+
+from moods.data import Moods
+from moods.resolvers.auth import get_auth_user_id
+
+FIELDS = ["id", "userId", "mood", "delta", "notes", "tags", "createdAt", "archivedAt"]
+
+
+def _serialize(entry: dict) -> dict:
+    archived_at = entry["archived_at"]
+    return {
+        "id": str(entry["id"]),
+        "userId": str(entry["user_id"]),
+        "mood": entry["mood"],
+        "delta": entry["delta"],
+        "notes": entry["notes"],
+        "tags": entry["tags"],
+        "createdAt": entry["created_at"].isoformat(),
+        "archivedAt": archived_at.isoformat() if archived_at else None,
+    }
+
+
+class ExportHandler:
+    def __init__(self, moods: Moods, settings):
+        self.moods = moods
+        self.settings = settings
+
+    def _parse_request(self, request: Request) -> dict | Response:
+        viewer_id = get_auth_user_id(request, self.settings)
+        if not viewer_id:
+            return JSONResponse({"error": "Authentication required"}, status_code=401)
+
+        user_ids = request.query_params.getlist("userId") or None
+        try:
+            for user_id in user_ids or []:
+                UUID(user_id)
+        except ValueError:
+            return JSONResponse({"error": "Invalid userId"}, status_code=400)
+
+        include_archived = request.query_params.get("includeArchived") == "true"
+        return {
+            "viewer_id": viewer_id,
+            "user_ids": user_ids,
+            "include_archived": include_archived,
+        }
+
+    async def entries_ndjson(self, request: Request) -> Response:
+        params = self._parse_request(request)
+        if isinstance(params, Response):
+            return params
+
+        async def lines() -> AsyncIterator[str]:
+            async for entry in self.moods.export_mood_entries(**params):
+                yield json.dumps(_serialize(entry)) + "\n"
+
+        return StreamingResponse(
+            lines(),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": 'attachment; filename="entries.ndjson"'},
+        )
+
+    async def entries_csv(self, request: Request) -> Response:
+        params = self._parse_request(request)
+        if isinstance(params, Response):
+            return params
+
+        async def lines() -> AsyncIterator[str]:
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+            writer.writeheader()
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            async for entry in self.moods.export_mood_entries(**params):
+                row = _serialize(entry)
+                row["tags"] = ";".join(row["tags"])
+                writer.writerow(row)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        return StreamingResponse(
+            lines(),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="entries.csv"'},
+        )
+
+
+def create_export(pool: Pool, settings) -> Router:
+    moods = Moods(pool, use_visibility_index=settings.visibility_index)
+    handler = ExportHandler(moods, settings)
+
+    return Router(
+        routes=[
+            Route("/entries.ndjson", handler.entries_ndjson, methods=["GET"]),
+            Route("/entries.csv", handler.entries_csv, methods=["GET"]),
+        ]
+    )
@@ -0,0 +1,65 @@
+import io
+
+from asyncpg import Pool
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route, Router
+
+from moods.data import Imports, TagCatalog
+from moods.data.imports import read_csv, read_ndjson
+from moods.resolvers.auth import get_auth_user_id
+
+
+async def _read_body(request: Request, max_bytes: int) -> bytes | None:
+    """The request body; None, read no further, once it exceeds max_bytes."""
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        return None
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            return None
+    return bytes(body)
+
+
+class ImportHandler:
+    def __init__(self, imports: Imports, settings):
+        self.imports = imports
+        self.settings = settings
+        self.max_body_bytes = settings.import_max_body_mb * 1024 * 1024
+
+    async def entries(self, request: Request) -> Response:
+        user_id = get_auth_user_id(request, self.settings)
+        if not user_id:
+            return JSONResponse({"error": "Authentication required"}, status_code=401)
+
+        body = await _read_body(request, self.max_body_bytes)
+        if body is None:
+            limit = self.settings.import_max_body_mb
+            return JSONResponse(
+                {"error": f"Body larger than {limit} MB"}, status_code=413
+            )
+        try:
+            text = await run_in_threadpool(body.decode, "utf-8")
+        except UnicodeDecodeError:
+            return JSONResponse({"error": "Body must be UTF-8"}, status_code=400)
+
+        # Quoted CSV fields and JSON strings may hold line breaks of their own,
+        # so only the format's record separator splits rows.
+        if request.headers.get("content-type", "").startswith("text/csv"):
+            rows = read_csv(io.StringIO(text, newline=""))
+        else:
+            rows = read_ndjson(text.split("\n"))
+        result = await self.imports.import_entries(user_id, rows)
+        return JSONResponse(result)
+
+
+def create_import(
+    pool: Pool, settings, *, tag_catalog: TagCatalog | None = None
+) -> Router:
+    imports = Imports(pool, tag_catalog=tag_catalog)
+    handler = ImportHandler(imports, settings)
+
+    return Router(routes=[Route("/entries", handler.entries, methods=["POST"])])
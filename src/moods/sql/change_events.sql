@@ -0,0 +1,18 @@
+-- name: add_change_event(topic, payload)!
+insert into change_events (topic, payload)
+values (:topic, :payload::jsonb);
+
+-- name: get_change_event(id)^
+select id, topic, payload, created_at
+from change_events
+where id = :id;
+
+-- name: get_change_events_since(since)
+select id, topic, payload, created_at
+from change_events
+where created_at >= :since
+order by id;
+
+-- name: purge_change_events(before)!
+delete from change_events
+where created_at < :before;
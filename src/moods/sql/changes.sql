@@ -0,0 +1,57 @@
+-- name: get_change_watermark()$
+-- Every transaction below the current snapshot's xmin has finished, so rows
+-- stamped at or above it are the only ones a later call can still miss.
+select pg_snapshot_xmin(pg_current_snapshot())::text;
+
+-- name: has_incoming_share_changes(viewer_id, since)$
+-- Share changes can delete visibility rows, which changesSince can't report.
+select exists (
+  select 1
+  from mood_shares ms
+  where ms.shared_with = :viewer_id::uuid
+    and (
+      ms.change_xid >= :since::text::xid8
+      or exists (
+        select 1 from mood_share_filters f
+        where f.mood_share_id = ms.id
+          and f.change_xid >= :since::text::xid8
+      )
+    )
+);
+
+-- name: get_changed_entries(viewer_id, since, row_limit)
+select me.id, me.user_id, me.mood, me.notes, me.created_at, me.archived_at, v.delta
+from mood_entry_visibility v
+join mood_entries me on me.id = v.entry_id
+where v.viewer_id = :viewer_id::uuid
+  and v.change_xid >= :since::text::xid8
+order by v.entry_id desc
+limit :row_limit;
+
+-- name: get_changed_tags(since)
+select name, metadata, archived_at
+from tags
+where change_xid >= :since::text::xid8
+order by name;
+
+-- name: get_changed_users(since)
+select id, name, email, icon, settings, archived_at
+from users
+where change_xid >= :since::text::xid8
+order by name;
+
+-- name: get_changed_shares(user_id, since)
+-- The user's share rules, archived ones included, that were written or had
+-- a filter written since the watermark.
+select ms.id, ms.user_id, ms.shared_with, ms.created_at, ms.archived_at
+from mood_shares ms
+where ms.user_id = :user_id::uuid
+  and (
+    ms.change_xid >= :since::text::xid8
+    or exists (
+      select 1 from mood_share_filters f
+      where f.mood_share_id = ms.id
+        and f.change_xid >= :since::text::xid8
+    )
+  )
+order by ms.created_at;
@@ -0,0 +1,194 @@
+-- name: create_import_entries_staging()!
+create temp table import_entries (
+  line       integer     not null,
+  id         uuid        not null,
+  mood       integer     not null,
+  notes      text        not null,
+  created_at timestamptz not null
+) on commit drop;
+
+-- name: create_import_tags_staging()!
+create temp table import_entry_tags (
+  entry_id uuid not null,
+  tag_name text not null
+) on commit drop;
+
+-- name: create_import_visibility_staging()!
+create temp table import_visibility (
+  viewer_id uuid    not null,
+  entry_id  uuid    not null,
+  staged    boolean not null,
+  delta     integer
+) on commit drop;
+
+-- name: analyze_import_staging()!
+analyze import_entries, import_entry_tags;
+
+-- name: remove_repeated_import_entries()
+-- Drops staged rows that repeat an earlier row of the file (same instant,
+-- mood and notes), returning the line each one repeats.
+delete from import_entries s
+using (
+  select line,
+         first_value(line) over (
+           partition by created_at, mood, notes order by line
+         ) as first_line
+  from import_entries
+) r
+where r.line = s.line
+  and r.first_line <> r.line
+returning s.line, r.first_line;
+
+-- name: remove_import_duplicates(user_id)
+-- Drops staged rows that repeat an existing entry of the user (same instant,
+-- mood and notes), so re-running an import doesn't double the history.
+delete from import_entries s
+using mood_entries me
+where me.user_id = :user_id::uuid
+  and me.created_at = s.created_at
+  and me.mood = s.mood
+  and me.notes = s.notes
+returning s.line;
+
+-- name: merge_import_tags()
+-- Creates every staged tag that doesn't exist yet, returning their names.
+insert into tags (name)
+select distinct st.tag_name
+from import_entry_tags st
+join import_entries s on s.id = st.entry_id
+on conflict do nothing
+returning name;
+
+-- name: merge_import_entries(user_id)$
+with inserted as (
+  insert into mood_entries (id, user_id, mood, notes, created_at)
+  select s.id, :user_id::uuid, s.mood, s.notes, s.created_at
+  from import_entries s
+  returning 1
+)
+select count(*) from inserted;
+
+-- name: merge_import_entry_tags()!
+-- Tags are already deduplicated per entry while parsing.
+insert into mood_entry_tags (mood_entry_id, tag_name)
+select st.entry_id, st.tag_name
+from import_entry_tags st
+join import_entries s on s.id = st.entry_id;
+
+-- name: stage_import_visibility(user_id)!
+-- Set-based mood_share_allows: filters are matched against the staged tags
+-- once, rather than calling the function per (share, entry) pair.
+with shares as (
+  select ms.id, ms.shared_with,
+         exists (
+           select 1 from mood_share_filters f
+           where f.mood_share_id = ms.id
+             and f.is_include
+             and f.archived_at is null
+         ) as has_includes
+  from mood_shares ms
+  where ms.user_id = :user_id::uuid
+    and ms.archived_at is null
+),
+matches as (
+  select distinct f.mood_share_id, st.entry_id, f.is_include
+  from import_entry_tags st
+  join share_filter_tag_matches m on m.tag_name = st.tag_name
+  join mood_share_filters f on f.id = m.filter_id and f.archived_at is null
+  join shares sh on sh.id = f.mood_share_id
+)
+insert into import_visibility (viewer_id, entry_id, staged)
+select :user_id::uuid, s.id, true
+from import_entries s
+union all
+select sh.shared_with, s.id, true
+from shares sh
+cross join import_entries s
+where (
+    not sh.has_includes
+    or exists (
+      select 1 from matches m
+      where m.mood_share_id = sh.id and m.entry_id = s.id and m.is_include
+    )
+  )
+  and not exists (
+    select 1 from matches m
+    where m.mood_share_id = sh.id and m.entry_id = s.id and not m.is_include
+  );
+
+-- name: analyze_import_visibility()!
+analyze import_visibility;
+
+-- name: stage_import_deltas(user_id)!
+-- Set-based previous_visible_mood over the author's existing and staged rows
+-- together: a row's predecessor is the unarchived row whose running count of
+-- unarchived rows is one less (or equal, for an archived row). Existing rows
+-- whose delta changes are added to the staging table unstaged.
+with combined as (
+  select v.viewer_id, v.entry_id, v.archived, v.delta, me.mood, false as staged
+  from mood_entry_visibility v
+  join mood_entries me on me.id = v.entry_id
+  where v.user_id = :user_id::uuid
+  union all
+  select iv.viewer_id, iv.entry_id, false, null, s.mood, true
+  from import_visibility iv
+  join import_entries s on s.id = iv.entry_id
+),
+ranked as (
+  select c.*,
+         count(*) filter (where not c.archived) over (
+           partition by c.viewer_id order by c.entry_id
+         ) as unarchived_upto
+  from combined c
+),
+deltas as (
+  select r.viewer_id, r.entry_id, r.staged, r.delta as old_delta,
+         r.mood - p.mood as delta
+  from ranked r
+  left join ranked p
+    on p.viewer_id = r.viewer_id
+   and not p.archived
+   and p.unarchived_upto = r.unarchived_upto - (case when r.archived then 0 else 1 end)
+),
+staged as (
+  update import_visibility iv
+  set delta = d.delta
+  from deltas d
+  where d.staged
+    and iv.viewer_id = d.viewer_id
+    and iv.entry_id = d.entry_id
+)
+insert into import_visibility (viewer_id, entry_id, staged, delta)
+select d.viewer_id, d.entry_id, false, d.delta
+from deltas d
+where not d.staged
+  and d.delta is distinct from d.old_delta;
+
+-- name: merge_import_visibility(user_id)!
+insert into mood_entry_visibility (viewer_id, entry_id, user_id, delta)
+select iv.viewer_id, iv.entry_id, :user_id::uuid, iv.delta
+from import_visibility iv
+where iv.staged;
+
+-- name: merge_import_deltas()!
+update mood_entry_visibility v
+set delta = iv.delta
+from import_visibility iv
+where not iv.staged
+  and v.viewer_id = iv.viewer_id
+  and v.entry_id = iv.entry_id;
+
+-- name: add_import_rollups(user_id)!
+insert into mood_daily_rollups as r
+  (viewer_id, user_id, day, entry_count, mood_sum, mood_min, mood_max)
+select iv.viewer_id, :user_id::uuid, (s.created_at at time zone 'UTC')::date,
+       count(*), sum(s.mood), min(s.mood), max(s.mood)
+from import_visibility iv
+join import_entries s on s.id = iv.entry_id
+where iv.staged
+group by 1, 2, 3
+on conflict (viewer_id, user_id, day) do update
+  set entry_count = r.entry_count + excluded.entry_count,
+      mood_sum = r.mood_sum + excluded.mood_sum,
+      mood_min = least(r.mood_min, excluded.mood_min),
+      mood_max = greatest(r.mood_max, excluded.mood_max);
@@ -1,54 +1,200 @@
--- name: get_mood_entries(user_ids, include_archived, after_id, page_limit, viewer_id)
-with entries as (
-  select me.id, me.user_id, me.mood, me.notes, me.created_at, me.archived_at,
-         me.mood - lag(me.mood) over (partition by me.user_id order by me.id) as delta
+-- name: get_visible_authors(viewer_id, user_ids)
+-- The viewer plus everyone currently sharing with them, narrowed to user_ids.
+select a.user_id
+from (
+  select :viewer_id::uuid as user_id
+  union
+  select ms.user_id
+  from mood_shares ms
+  where ms.shared_with = :viewer_id::uuid
+    and ms.archived_at is null
+) a
+where a.user_id is not null
+  and (:user_ids::uuid[] IS NULL OR a.user_id = ANY(:user_ids::uuid[]));
+
+-- name: get_author_mood_entries(user_id, include_archived, after_id, page_limit, viewer_id, with_notes, with_tags, with_user)
+-- One author's entries as seen by the viewer. The page is cut from the
+-- visibility index before touching mood_entries, and the cursor is compared
+-- against a sentinel rather than guarded by IS NULL so it stays an index
+-- condition in generic plans. The lateral lookup cannot be flattened, so the
+-- entries are fetched by primary key one per page row even when a generic
+-- plan has no idea how small the page is. Notes, tag names and the author are
+-- only read when requested; the flags are plan-time constants, so the tag and
+-- author lookups are never executed when theirs is false. Tag details come
+-- from the in-memory TagCatalog.
+select me.*, v.delta, t.tag_names,
+       u.author_name, u.author_email, u.author_icon, u.author_settings,
+       u.author_archived_at
+from (
+  select v.entry_id, v.delta
+  from mood_entry_visibility v
+  where v.viewer_id = :viewer_id::uuid
+    and v.user_id = :user_id::uuid
+    and v.entry_id < coalesce(:after_id::uuid, 'ffffffff-ffff-ffff-ffff-ffffffffffff')
+    and (:include_archived::boolean OR NOT v.archived)
+  order by v.entry_id desc
+  limit :page_limit
+) v
+cross join lateral (
+  select me.id, me.user_id, me.mood,
+         case when :with_notes::boolean then me.notes end as notes,
+         me.created_at, me.archived_at
   from mood_entries me
-  where (:user_ids::uuid[] IS NULL OR me.user_id = ANY(:user_ids::uuid[]))
-    and (:include_archived::boolean OR me.archived_at IS NULL)
+  where me.id = v.entry_id
+  limit 1
+) me
+cross join lateral (
+  select array_agg(met.tag_name order by met.tag_name) as tag_names
+  from mood_entry_tags met
+  where :with_tags::boolean and met.mood_entry_id = me.id
+) t
+left join lateral (
+  select u.name as author_name, u.email as author_email, u.icon as author_icon,
+         u.settings as author_settings, u.archived_at as author_archived_at
+  from users u
+  where :with_user::boolean and u.id = me.user_id
+  limit 1
+) u on true
+order by v.entry_id desc;
+
+-- name: get_authors_mood_entries(viewer_id, user_ids, include_archived, after_ids, page_limits, with_notes, with_tags, with_user)
+-- Several get_author_mood_entries pages in one query, for User.entries across
+-- many users: page k is user_ids[k]'s entries before after_ids[k], at most
+-- page_limits[k] of them. Authors the viewer can't see (as in
+-- get_visible_authors) have empty pages. Each page is still cut from the
+-- visibility index by the lateral subquery, once per requested page.
+select p.page, me.*, v.delta, t.tag_names,
+       u.author_name, u.author_email, u.author_icon, u.author_settings,
+       u.author_archived_at
+from unnest(
+  :user_ids::uuid[], :include_archived::boolean[], :after_ids::uuid[],
+  :page_limits::int[]
+) with ordinality as p(user_id, include_archived, after_id, page_limit, page)
+cross join lateral (
+  select v.entry_id, v.delta
+  from mood_entry_visibility v
+  where v.viewer_id = :viewer_id::uuid
+    and v.user_id = p.user_id
+    and v.entry_id < coalesce(p.after_id, 'ffffffff-ffff-ffff-ffff-ffffffffffff')
+    and (p.include_archived OR NOT v.archived)
     and (
-        me.user_id = :viewer_id::uuid
+        p.user_id = :viewer_id::uuid
         OR EXISTS (
             SELECT 1 FROM mood_shares ms
-            WHERE ms.user_id = me.user_id
+            WHERE ms.user_id = p.user_id
               AND ms.shared_with = :viewer_id::uuid
               AND ms.archived_at IS NULL
-              AND (
-                  NOT EXISTS (
-                      SELECT 1 FROM mood_share_filters f
-                      WHERE f.mood_share_id = ms.id AND f.is_include = true
-                        AND f.archived_at IS NULL
-                  )
-                  OR EXISTS (
-                      SELECT 1 FROM mood_share_filters f
-                      JOIN mood_entry_tags met ON met.mood_entry_id = me.id
-                      WHERE f.mood_share_id = ms.id
-                        AND f.is_include = true
-                        AND f.archived_at IS NULL
-                        AND met.tag_name ~ f.pattern
-                  )
-              )
-              AND NOT EXISTS (
-                  SELECT 1 FROM mood_share_filters f
-                  JOIN mood_entry_tags met ON met.mood_entry_id = me.id
-                  WHERE f.mood_share_id = ms.id
-                    AND f.is_include = false
-                    AND f.archived_at IS NULL
-                    AND met.tag_name ~ f.pattern
-              )
         )
     )
-)
-select id, user_id, mood, notes, created_at, archived_at, delta
-from entries
-where (:after_id::uuid IS NULL OR id < :after_id::uuid)
-order by id desc
+  order by v.entry_id desc
+  limit p.page_limit
+) v
+cross join lateral (
+  select me.id, me.user_id, me.mood,
+         case when :with_notes::boolean then me.notes end as notes,
+         me.created_at, me.archived_at
+  from mood_entries me
+  where me.id = v.entry_id
+  limit 1
+) me
+cross join lateral (
+  select array_agg(met.tag_name order by met.tag_name) as tag_names
+  from mood_entry_tags met
+  where :with_tags::boolean and met.mood_entry_id = me.id
+) t
+left join lateral (
+  select u.name as author_name, u.email as author_email, u.icon as author_icon,
+         u.settings as author_settings, u.archived_at as author_archived_at
+  from users u
+  where :with_user::boolean and u.id = me.user_id
+  limit 1
+) u on true
+order by p.page, v.entry_id desc;
+
+-- name: get_mood_entries_live(user_ids, include_archived, after_id, page_limit, viewer_id, with_delta, with_notes, with_tags, with_user)
+-- Evaluates share filters per row instead of reading mood_entry_visibility.
+-- Kept as a fallback and as a correctness check for the visibility table,
+-- so it runs the filter regexes itself rather than reading
+-- share_filter_tag_matches (see mood_share_allows_live).
+-- The previous-entry lookup behind delta, notes, tags and the author are
+-- skipped unless requested, as in get_author_mood_entries.
+select me.id, me.user_id, me.mood,
+       case when :with_notes::boolean then me.notes end as notes,
+       me.created_at, me.archived_at,
+       me.mood - prev.mood as delta,
+       t.tag_names,
+       u.author_name, u.author_email, u.author_icon, u.author_settings,
+       u.author_archived_at
+from mood_entries me
+left join lateral (
+  select p.mood
+  from mood_entries p
+  where :with_delta::boolean
+    and p.user_id = me.user_id
+    and p.id < me.id
+    and p.archived_at IS NULL
+    and (
+        p.user_id = :viewer_id::uuid
+        OR EXISTS (
+            SELECT 1 FROM mood_shares ms
+            WHERE ms.user_id = p.user_id
+              AND ms.shared_with = :viewer_id::uuid
+              AND ms.archived_at IS NULL
+              AND mood_share_allows_live(ms.id, p.id)
+        )
+    )
+  order by p.id desc
+  limit 1
+) prev on true
+cross join lateral (
+  select array_agg(met.tag_name order by met.tag_name) as tag_names
+  from mood_entry_tags met
+  where :with_tags::boolean and met.mood_entry_id = me.id
+) t
+left join lateral (
+  select u.name as author_name, u.email as author_email, u.icon as author_icon,
+         u.settings as author_settings, u.archived_at as author_archived_at
+  from users u
+  where :with_user::boolean and u.id = me.user_id
+  limit 1
+) u on true
+where (:user_ids::uuid[] IS NULL OR me.user_id = ANY(:user_ids::uuid[]))
+  and (:include_archived::boolean OR me.archived_at IS NULL)
+  and me.id < coalesce(:after_id::uuid, 'ffffffff-ffff-ffff-ffff-ffffffffffff')
+  and (
+      me.user_id = :viewer_id::uuid
+      OR EXISTS (
+          SELECT 1 FROM mood_shares ms
+          WHERE ms.user_id = me.user_id
+            AND ms.shared_with = :viewer_id::uuid
+            AND ms.archived_at IS NULL
+            AND mood_share_allows_live(ms.id, me.id)
+      )
+  )
+order by me.id desc
 limit :page_limit;
 
--- name: create_mood_entry(user_id, mood, notes)^
-insert into mood_entries (user_id, mood, notes)
-values (:user_id, :mood, :notes)
+-- name: create_mood_entry(id, user_id, mood, notes)^
+insert into mood_entries (id, user_id, mood, notes)
+values (:id, :user_id, :mood, :notes)
 returning id, user_id, mood, notes, created_at, archived_at;
 
+-- name: get_mood_entries_by_ids(ids)
+select id, user_id, mood, notes, created_at, archived_at
+from mood_entries
+where id = ANY(:ids::uuid[]);
+
+-- name: get_visible_mood_entries(viewer_id, entry_ids)
+-- The given entries that the viewer can currently see, oldest first.
+select me.id, me.user_id, me.mood, me.notes, me.created_at, me.archived_at,
+       v.delta
+from mood_entry_visibility v
+join mood_entries me on me.id = v.entry_id
+where v.viewer_id = :viewer_id::uuid
+  and v.entry_id = ANY(:entry_ids::uuid[])
+  and not v.archived
+order by v.entry_id;
+
 -- name: archive_mood_entry(id, user_id)^
 update mood_entries
 set archived_at = now()
@@ -57,12 +203,240 @@ where id = :id
   and archived_at is null
 returning id, user_id, mood, notes, created_at, archived_at;
 
--- name: add_mood_entry_tag(mood_entry_id, tag_name)!
-insert into mood_entry_tags (mood_entry_id, tag_name)
-values (:mood_entry_id, lower(:tag_name));
+-- name: get_archived_mood_entry(id, user_id)^
+-- Answers a repeated archiveMoodEntry with the entry as it was archived.
+select id, user_id, mood, notes, created_at, archived_at
+from mood_entries
+where id = :id
+  and user_id = :user_id::uuid
+  and archived_at is not null;
+
+-- name: create_mood_entries(ids, user_id, moods, notes)
+insert into mood_entries (id, user_id, mood, notes)
+select e.id, :user_id::uuid, e.mood, e.notes
+from unnest(:ids::uuid[], :moods::integer[], :notes::text[]) as e(id, mood, notes)
+returning id, user_id, mood, notes, created_at, archived_at;
+
+-- name: add_entry_tags(entry_id, tag_names)
+-- Attaches the tags to one entry, lowercased and de-duplicated, creating
+-- missing tags. Returns the names of the tags it created, for the caller to
+-- match against share filters (see add_tag_filter_matches).
+with names as (
+  select distinct lower(n) as tag_name
+  from unnest(:tag_names::text[]) as n
+),
+new_tags as (
+  insert into tags (name)
+  select tag_name from names
+  on conflict do nothing
+  returning name
+),
+entry_tags as (
+  insert into mood_entry_tags (mood_entry_id, tag_name)
+  select :entry_id::uuid, tag_name from names
+)
+select name from new_tags;
 
--- name: get_tags_for_entries(mood_entry_ids)
-select met.mood_entry_id, t.name, t.metadata, t.archived_at
-from tags t
-join mood_entry_tags met on met.tag_name = t.name
-where met.mood_entry_id = ANY(:mood_entry_ids::uuid[]);
+-- name: add_entries_tags(entry_ids, tag_names)
+-- Attaches tag_names[i] to entry_ids[i], creating missing tags, as
+-- add_entry_tags does. Returns the names of the tags it created.
+with pairs as (
+  select distinct p.entry_id, lower(p.tag_name) as tag_name
+  from unnest(:entry_ids::uuid[], :tag_names::text[]) as p(entry_id, tag_name)
+),
+new_tags as (
+  insert into tags (name)
+  select distinct tag_name from pairs
+  on conflict do nothing
+  returning name
+),
+entry_tags as (
+  insert into mood_entry_tags (mood_entry_id, tag_name)
+  select entry_id, tag_name from pairs
+)
+select name from new_tags;
+
+-- name: get_entry_tag_names(mood_entry_ids)
+-- Tag details come from the in-memory TagCatalog.
+select met.mood_entry_id, met.tag_name
+from mood_entry_tags met
+where met.mood_entry_id = ANY(:mood_entry_ids::uuid[])
+order by met.mood_entry_id, met.tag_name;
+
+-- name: add_entries_visibility(entry_ids)!
+insert into mood_entry_visibility (viewer_id, entry_id, user_id, archived)
+select me.user_id, me.id, me.user_id, me.archived_at is not null
+from mood_entries me
+where me.id = ANY(:entry_ids::uuid[])
+union all
+select ms.shared_with, me.id, me.user_id, me.archived_at is not null
+from mood_entries me
+join mood_shares ms on ms.user_id = me.user_id and ms.archived_at is null
+where me.id = ANY(:entry_ids::uuid[])
+  and mood_share_allows(ms.id, me.id)
+on conflict do nothing;
+
+-- name: archive_entry_visibility(entry_id)!
+update mood_entry_visibility
+set archived = true
+where entry_id = :entry_id::uuid;
+
+-- name: refresh_entries_delta(entry_ids)!
+update mood_entry_visibility v
+set delta = me.mood - previous_visible_mood(v.viewer_id, v.user_id, v.entry_id)
+from mood_entries me
+where me.id = v.entry_id
+  and v.entry_id = ANY(:entry_ids::uuid[]);
+
+-- name: refresh_delta_after_archive(entry_id)!
+-- Recomputes, for every viewer of the archived entry, the delta of each
+-- later entry up to and including the next unarchived one.
+update mood_entry_visibility v
+set delta = me.mood - previous_visible_mood(v.viewer_id, v.user_id, v.entry_id)
+from mood_entry_visibility a, mood_entries me
+where a.entry_id = :entry_id::uuid
+  and v.viewer_id = a.viewer_id
+  and v.user_id = a.user_id
+  and v.entry_id > a.entry_id
+  and v.entry_id <= coalesce(
+      (
+          select nv.entry_id
+          from mood_entry_visibility nv
+          join mood_entries nm on nm.id = nv.entry_id
+          where nv.viewer_id = a.viewer_id
+            and nv.user_id = a.user_id
+            and nv.entry_id > a.entry_id
+            and nm.archived_at is null
+          order by nv.entry_id
+          limit 1
+      ),
+      'ffffffff-ffff-ffff-ffff-ffffffffffff'
+  )
+  and me.id = v.entry_id;
+
+-- name: add_entries_rollups(entry_ids)!
+insert into mood_daily_rollups as r
+  (viewer_id, user_id, day, entry_count, mood_sum, mood_min, mood_max)
+select v.viewer_id, v.user_id, (me.created_at at time zone 'UTC')::date,
+       count(*), sum(me.mood), min(me.mood), max(me.mood)
+from mood_entry_visibility v
+join mood_entries me on me.id = v.entry_id
+where v.entry_id = ANY(:entry_ids::uuid[])
+  and not v.archived
+group by 1, 2, 3
+on conflict (viewer_id, user_id, day) do update
+  set entry_count = r.entry_count + excluded.entry_count,
+      mood_sum = r.mood_sum + excluded.mood_sum,
+      mood_min = least(r.mood_min, excluded.mood_min),
+      mood_max = greatest(r.mood_max, excluded.mood_max);
+
+-- name: clear_entry_day_rollups(entry_id)!
+-- Drops the rollups of the entry's day for every viewer of the entry, so
+-- add_entry_day_rollups can rebuild them (min and max can't be decremented).
+delete from mood_daily_rollups r
+using mood_entry_visibility v, mood_entries me
+where v.entry_id = :entry_id::uuid
+  and me.id = v.entry_id
+  and r.viewer_id = v.viewer_id
+  and r.user_id = v.user_id
+  and r.day = (me.created_at at time zone 'UTC')::date;
+
+-- name: add_entry_day_rollups(entry_id)!
+insert into mood_daily_rollups
+  (viewer_id, user_id, day, entry_count, mood_sum, mood_min, mood_max)
+select t.viewer_id, t.user_id, t.day,
+       count(*), sum(de.mood), min(de.mood), max(de.mood)
+from (
+  select v.viewer_id, v.user_id, (me.created_at at time zone 'UTC')::date as day
+  from mood_entry_visibility v
+  join mood_entries me on me.id = v.entry_id
+  where v.entry_id = :entry_id::uuid
+) t
+join mood_entries de
+  on de.user_id = t.user_id
+ and de.created_at >= t.day::timestamp at time zone 'UTC'
+ and de.created_at < (t.day + 1)::timestamp at time zone 'UTC'
+join mood_entry_visibility dv
+  on dv.viewer_id = t.viewer_id
+ and dv.entry_id = de.id
+ and not dv.archived
+group by t.viewer_id, t.user_id, t.day;
+
+-- name: get_mood_stats(viewer_id, user_ids, start, end, bucket)
+-- Buckets the viewer's daily rollups; start and end are inclusive UTC days.
+select r.user_id,
+       date_trunc(:bucket, r.day::timestamp) at time zone 'UTC' as bucket_start,
+       sum(r.entry_count)::integer as count,
+       sum(r.mood_sum)::float / sum(r.entry_count) as average,
+       min(r.mood_min) as min,
+       max(r.mood_max) as max
+from mood_daily_rollups r
+where r.viewer_id = :viewer_id::uuid
+  and (:user_ids::uuid[] IS NULL OR r.user_id = ANY(:user_ids::uuid[]))
+  and (:start::timestamptz IS NULL OR r.day >= (:start::timestamptz at time zone 'UTC')::date)
+  and (:end::timestamptz IS NULL OR r.day <= (:end::timestamptz at time zone 'UTC')::date)
+group by r.user_id, bucket_start
+order by bucket_start, r.user_id;
+
+-- name: export_mood_entries(viewer_id, user_ids, include_archived)
+-- Everything the viewer can see, oldest first, for the streaming export.
+-- Read through export_mood_entries_cursor so rows are fetched in batches.
+select me.id, me.user_id, me.mood, v.delta, me.notes,
+       array(
+         select met.tag_name
+         from mood_entry_tags met
+         where met.mood_entry_id = me.id
+         order by met.tag_name
+       ) as tags,
+       me.created_at, me.archived_at
+from mood_entry_visibility v
+join mood_entries me on me.id = v.entry_id
+where v.viewer_id = :viewer_id::uuid
+  and (:user_ids::uuid[] IS NULL OR v.user_id = ANY(:user_ids::uuid[]))
+  and (:include_archived::boolean OR NOT v.archived)
+order by v.entry_id;
+
+-- name: export_mood_entries_live(viewer_id, user_ids, include_archived)
+-- export_mood_entries evaluating share filters per row, as
+-- get_mood_entries_live does, for when the visibility index is off.
+select me.id, me.user_id, me.mood, me.mood - prev.mood as delta, me.notes,
+       array(
+         select met.tag_name
+         from mood_entry_tags met
+         where met.mood_entry_id = me.id
+         order by met.tag_name
+       ) as tags,
+       me.created_at, me.archived_at
+from mood_entries me
+left join lateral (
+  select p.mood
+  from mood_entries p
+  where p.user_id = me.user_id
+    and p.id < me.id
+    and p.archived_at IS NULL
+    and (
+        p.user_id = :viewer_id::uuid
+        OR EXISTS (
+            SELECT 1 FROM mood_shares ms
+            WHERE ms.user_id = p.user_id
+              AND ms.shared_with = :viewer_id::uuid
+              AND ms.archived_at IS NULL
+              AND mood_share_allows_live(ms.id, p.id)
+        )
+    )
+  order by p.id desc
+  limit 1
+) prev on true
+where (:user_ids::uuid[] IS NULL OR me.user_id = ANY(:user_ids::uuid[]))
+  and (:include_archived::boolean OR me.archived_at IS NULL)
+  and (
+      me.user_id = :viewer_id::uuid
+      OR EXISTS (
+          SELECT 1 FROM mood_shares ms
+          WHERE ms.user_id = me.user_id
+            AND ms.shared_with = :viewer_id::uuid
+            AND ms.archived_at IS NULL
+            AND mood_share_allows_live(ms.id, me.id)
+      )
+  )
+order by me.id;
@@ -0,0 +1,28 @@
+-- name: get_live_mutation_keys(user_id, mutation, keys, ttl_seconds)
+-- The result ids of the given keys that were claimed within the TTL. A
+-- retry is answered from these without writing anything.
+select key, result_id
+from mutation_keys
+where user_id = :user_id::uuid
+  and mutation = :mutation
+  and key = ANY(:keys::text[])
+  and created_at >= now() - make_interval(secs => :ttl_seconds);
+
+-- name: claim_mutation_keys(user_id, mutation, keys, result_ids, ttl_seconds)
+-- Records keys[i] -> result_ids[i] for keys that are new or expired and
+-- returns those. A key another transaction claimed meanwhile is left alone
+-- and not returned (the insert waits for that transaction first), so the
+-- caller reads it back with get_live_mutation_keys.
+insert into mutation_keys (user_id, mutation, key, result_id)
+select :user_id::uuid, :mutation, k.key, k.result_id
+from unnest(:keys::text[], :result_ids::uuid[]) as k(key, result_id)
+on conflict (user_id, mutation, key) do update
+  set result_id = excluded.result_id,
+      created_at = now()
+  where mutation_keys.created_at < now() - make_interval(secs => :ttl_seconds)
+returning key, result_id;
+
+-- name: purge_mutation_keys(ttl_seconds)!
+-- Run periodically; claims already treat expired keys as unused.
+delete from mutation_keys
+where created_at < now() - make_interval(secs => :ttl_seconds);
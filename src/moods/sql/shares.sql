@@ -11,10 +11,39 @@ from mood_share_filters msf
 where msf.mood_share_id = ANY(:share_ids::uuid[])
   and msf.archived_at is null;
 
--- name: archive_shares_for_user(user_id)!
+-- name: get_shares_for_users(user_ids)
+-- Active shares of several owners, each with its active filters as JSON, in
+-- one round trip for ShareRulesLoader.
+select ms.id, ms.user_id, ms.shared_with, ms.created_at, ms.archived_at,
+       coalesce(f.filters, '[]'::json) as filters
+from mood_shares ms
+left join lateral (
+  select json_agg(
+           json_build_object(
+             'id', msf.id,
+             'mood_share_id', msf.mood_share_id,
+             'pattern', msf.pattern,
+             'is_include', msf.is_include,
+             'archived_at', msf.archived_at
+           )
+           order by msf.created_at
+         ) as filters
+  from mood_share_filters msf
+  where msf.mood_share_id = ms.id
+    and msf.archived_at is null
+) f on true
+where ms.user_id = ANY(:user_ids::uuid[])
+  and ms.archived_at is null
+order by ms.user_id, ms.created_at;
+
+-- name: lock_shares_for_user(user_id)!
+-- Serializes concurrent sharing updates by the same user.
+select 1 from users where id = :user_id::uuid for update;
+
+-- name: archive_shares(share_ids)!
 update mood_shares
 set archived_at = now()
-where user_id = :user_id::uuid
+where id = ANY(:share_ids::uuid[])
   and archived_at is null;
 
 -- name: archive_filters_for_shares(share_ids)!
@@ -23,14 +52,94 @@ set archived_at = now()
 where mood_share_id = ANY(:share_ids::uuid[])
   and archived_at is null;
 
--- name: create_share(user_id, shared_with)^
+-- name: archive_filters(filter_ids)!
+update mood_share_filters
+set archived_at = now()
+where id = ANY(:filter_ids::uuid[])
+  and archived_at is null;
+
+-- name: create_shares(user_id, shared_with)
 insert into mood_shares (user_id, shared_with)
-values (:user_id::uuid, :shared_with::uuid)
+select :user_id::uuid, s.shared_with
+from unnest(:shared_with::uuid[]) as s(shared_with)
 on conflict (user_id, shared_with) do update
   set archived_at = null
 returning id, user_id, shared_with, created_at, archived_at;
 
--- name: create_share_filter(mood_share_id, pattern, is_include)^
+-- name: create_share_filters(share_ids, patterns, is_includes)
 insert into mood_share_filters (mood_share_id, pattern, is_include)
-values (:mood_share_id::uuid, :pattern, :is_include)
+select f.mood_share_id, f.pattern, f.is_include
+from unnest(:share_ids::uuid[], :patterns::text[], :is_includes::boolean[])
+  as f(mood_share_id, pattern, is_include)
 returning id, mood_share_id, pattern, is_include, created_at, archived_at;
+
+-- name: lock_filter_tag_matches()!
+-- Serializes share_filter_tag_matches upkeep. New filters are matched
+-- against committed tags and new tags against committed filters, so a filter
+-- and a tag created concurrently would each miss the other. Taken after the
+-- filters or tags are inserted and before matching, as its own statement: a
+-- writer that waited here matches with a snapshot that sees the other's
+-- commit.
+select pg_advisory_xact_lock(hashtext('share_filter_tag_matches'));
+
+-- name: add_filter_tag_matches(filter_ids)!
+insert into share_filter_tag_matches (filter_id, tag_name)
+select f.id, t.name
+from mood_share_filters f
+join tags t on t.name ~ f.pattern
+where f.id = ANY(:filter_ids::uuid[])
+on conflict do nothing;
+
+-- name: add_tag_filter_matches(tag_names)!
+insert into share_filter_tag_matches (filter_id, tag_name)
+select f.id, t.name
+from tags t
+join mood_share_filters f on t.name ~ f.pattern
+where t.name = ANY(:tag_names::text[])
+  and f.archived_at is null
+on conflict do nothing;
+
+-- name: clear_shared_visibility(user_id, viewer_ids)!
+delete from mood_entry_visibility
+where user_id = :user_id::uuid
+  and viewer_id = ANY(:viewer_ids::uuid[])
+  and viewer_id != :user_id::uuid;
+
+-- name: add_shared_visibility(user_id, viewer_ids)!
+insert into mood_entry_visibility (viewer_id, entry_id, user_id, archived)
+select ms.shared_with, me.id, me.user_id, me.archived_at is not null
+from mood_shares ms
+join mood_entries me on me.user_id = ms.user_id
+where ms.user_id = :user_id::uuid
+  and ms.shared_with = ANY(:viewer_ids::uuid[])
+  and ms.archived_at is null
+  and mood_share_allows(ms.id, me.id)
+on conflict do nothing;
+
+-- name: refresh_shared_delta(user_id, viewer_ids)!
+update mood_entry_visibility v
+set delta = me.mood - previous_visible_mood(v.viewer_id, v.user_id, v.entry_id)
+from mood_entries me
+where me.id = v.entry_id
+  and v.user_id = :user_id::uuid
+  and v.viewer_id = ANY(:viewer_ids::uuid[])
+  and v.viewer_id != :user_id::uuid;
+
+-- name: clear_shared_rollups(user_id, viewer_ids)!
+delete from mood_daily_rollups
+where user_id = :user_id::uuid
+  and viewer_id = ANY(:viewer_ids::uuid[])
+  and viewer_id != :user_id::uuid;
+
+-- name: add_shared_rollups(user_id, viewer_ids)!
+insert into mood_daily_rollups
+  (viewer_id, user_id, day, entry_count, mood_sum, mood_min, mood_max)
+select v.viewer_id, v.user_id, (me.created_at at time zone 'UTC')::date,
+       count(*), sum(me.mood), min(me.mood), max(me.mood)
+from mood_entry_visibility v
+join mood_entries me on me.id = v.entry_id
+where v.user_id = :user_id::uuid
+  and v.viewer_id = ANY(:viewer_ids::uuid[])
+  and v.viewer_id != :user_id::uuid
+  and not v.archived
+group by 1, 2, 3;
@@ -4,14 +4,19 @@ from users
 where (:include_archived::boolean IS TRUE OR archived_at IS NULL)
 order by name;
 
+-- name: get_user_by_id(id)^
+select id, name, email, icon, settings, archived_at
+from users
+where id = :id::uuid;
+
 -- name: get_users_by_ids(ids)
 select id, name, email, icon, settings, archived_at
 from users
 where id = ANY(:ids::uuid[]);
 
--- name: create_user(name, email)^
-insert into users (name, email, icon)
-values (:name, :email, 'https://www.gravatar.com/avatar/' || md5(lower(trim(:email))) || '?s=80&d=retro')
+-- name: create_user(id, name, email)^
+insert into users (id, name, email, icon)
+values (:id, :name, :email, 'https://www.gravatar.com/avatar/' || md5(lower(trim(:email))) || '?s=80&d=retro')
 returning id, name, email, icon, settings, archived_at;
 
 -- name: update_user_settings(id, settings)^
@@ -19,10 +19,19 @@ from httpx import ASGITransport
 
 from moods.app import create_app
 from moods.config import settings
+from moods.data import UserCache
 from moods.db import apply_migrations, create_pool
+from moods.event_bus import EventBus
+from moods.query_cache import QueryCache
 from moods.resolvers import create_gql
+from moods.routes import create_export, create_import
 
 TABLES = [
+    "mood_daily_rollups",
+    "mutation_keys",
+    "change_events",
+    "mood_entry_visibility",
+    "share_filter_tag_matches",
     "mood_share_filters",
     "mood_shares",
     "mood_entry_tags",
@@ -44,9 +53,28 @@ async def pool():
 
 
 @pytest.fixture
-async def client(pool):
+async def events():
+    bus = EventBus(reconnect_delay=0.05)
+    await bus.start()
+    yield bus
+    await bus.stop()
+
+
+@pytest.fixture
+async def client(pool, events):
     _app.state.pool = pool
-    _app.state.graphql = create_gql(pool, settings)
+    _app.state.events = events
+    _app.state.query_cache = QueryCache()
+    _app.state.user_cache = UserCache()
+    _app.state.graphql = create_gql(
+        pool,
+        settings,
+        events,
+        query_cache=_app.state.query_cache,
+        user_cache=_app.state.user_cache,
+    )
+    _app.state.export = create_export(pool, settings)
+    _app.state.imports = create_import(pool, settings)
     transport = ASGITransport(app=_app)
     async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
         yield c
@@ -0,0 +1,199 @@
+import moods.data.changes
+from tests.conftest import auth_header, gql
+
+H = auth_header("00000000-0000-0000-0000-000000000000")
+
+CREATE_USER = """
+mutation CreateUser($input: CreateUserInput!) {
+  createUser(input: $input) { id }
+}
+"""
+
+LOG_MOOD = """
+mutation LogMood($input: LogMoodInput!) {
+  logMood(input: $input) { id }
+}
+"""
+
+ARCHIVE_ENTRY = """
+mutation ArchiveMoodEntry($id: ID!) {
+  archiveMoodEntry(id: $id) { id }
+}
+"""
+
+UPDATE_SHARING = """
+mutation UpdateSharing($input: UpdateSharingInput!) {
+  updateSharing(input: $input) { id }
+}
+"""
+
+UPDATE_TAG_METADATA = """
+mutation UpdateTagMetadata($input: UpdateTagMetadataInput!) {
+  updateTagMetadata(input: $input) { name }
+}
+"""
+
+CHANGES_SINCE = """
+query ChangesSince($token: String) {
+  changesSince(token: $token) {
+    token
+    resync
+    entries { id mood delta archivedAt }
+    tags { name metadata }
+    users { id name }
+    sharedWith { id archivedAt user { id } filters { pattern } }
+  }
+}
+"""
+
+
+async def _create_user(client, name, email):
+    body = await gql(
+        client, CREATE_USER, {"input": {"name": name, "email": email}}, headers=H
+    )
+    return body["data"]["createUser"]["id"]
+
+
+async def _log_mood(client, user_id, mood, tags=None):
+    body = await gql(
+        client,
+        LOG_MOOD,
+        {"input": {"mood": mood, "notes": "", "tags": tags or []}},
+        headers=auth_header(user_id),
+    )
+    return body["data"]["logMood"]["id"]
+
+
+async def _share(client, owner_id, rules):
+    await gql(
+        client,
+        UPDATE_SHARING,
+        {"input": {"rules": rules}},
+        headers=auth_header(owner_id),
+    )
+
+
+async def _changes(client, user_id, token=None):
+    body = await gql(
+        client, CHANGES_SINCE, {"token": token}, headers=auth_header(user_id)
+    )
+    return body["data"]["changesSince"]
+
+
+async def test_changes_requires_auth(client):
+    body = await gql(client, CHANGES_SINCE, expect_errors=True)
+    assert body["errors"][0]["message"] == "Authentication required"
+
+
+async def test_changes_without_token_asks_for_resync(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    await _log_mood(client, alice, 5)
+
+    changes = await _changes(client, alice)
+
+    assert changes["resync"] is True
+    assert changes["token"]
+    assert changes["entries"] == []
+
+
+async def test_changes_since_token(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    first = await _log_mood(client, alice, 5)
+    token = (await _changes(client, alice))["token"]
+
+    second = await _log_mood(client, alice, 8, tags=["calm"])
+    changes = await _changes(client, alice, token)
+
+    assert changes["resync"] is False
+    assert changes["entries"] == [
+        {"id": second, "mood": 8, "delta": 3, "archivedAt": None}
+    ]
+    assert changes["tags"] == [{"name": "calm", "metadata": {}}]
+    assert changes["users"] == []
+
+    changes = await _changes(client, alice, changes["token"])
+    assert changes["entries"] == []
+    assert changes["tags"] == []
+
+    await gql(client, ARCHIVE_ENTRY, {"id": first}, headers=auth_header(alice))
+    changes = await _changes(client, alice, changes["token"])
+    by_id = {e["id"]: e for e in changes["entries"]}
+    assert by_id[first]["archivedAt"] is not None
+    assert by_id[second]["delta"] is None
+
+
+async def test_changes_include_tags_users_and_own_shares(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    bob = await _create_user(client, "Bob", "bob@test.com")
+    await _log_mood(client, alice, 5, tags=["calm"])
+    token = (await _changes(client, alice))["token"]
+
+    await gql(
+        client,
+        UPDATE_TAG_METADATA,
+        {"input": {"name": "calm", "metadata": {"emoji": "🌊"}}},
+        headers=auth_header(alice),
+    )
+    carol = await _create_user(client, "Carol", "carol@test.com")
+    await _share(
+        client,
+        alice,
+        [{"userId": bob, "filters": [{"pattern": "calm", "isInclude": True}]}],
+    )
+    changes = await _changes(client, alice, token)
+
+    assert changes["resync"] is False
+    assert changes["tags"] == [{"name": "calm", "metadata": {"emoji": "🌊"}}]
+    assert changes["users"] == [{"id": carol, "name": "Carol"}]
+    [rule] = changes["sharedWith"]
+    assert rule["user"]["id"] == bob
+    assert rule["filters"] == [{"pattern": "calm"}]
+
+    token = changes["token"]
+    await _share(client, alice, [])
+    changes = await _changes(client, alice, token)
+    assert changes["sharedWith"][0]["archivedAt"] is not None
+
+
+async def test_changes_resync_when_shares_with_viewer_change(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    bob = await _create_user(client, "Bob", "bob@test.com")
+    await _share(client, alice, [{"userId": bob, "filters": []}])
+    await _log_mood(client, alice, 5, tags=["private"])
+    token = (await _changes(client, bob))["token"]
+
+    await _share(
+        client,
+        alice,
+        [{"userId": bob, "filters": [{"pattern": "private", "isInclude": False}]}],
+    )
+
+    changes = await _changes(client, bob, token)
+    assert changes["resync"] is True
+    changes = await _changes(client, alice, token)
+    assert changes["resync"] is False
+
+
+async def test_changes_resync_when_too_many_entries(client, monkeypatch):
+    monkeypatch.setattr(moods.data.changes, "CHANGES_LIMIT", 2)
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    token = (await _changes(client, alice))["token"]
+    for mood in (1, 2, 3):
+        await _log_mood(client, alice, mood)
+
+    changes = await _changes(client, alice, token)
+
+    assert changes["resync"] is True
+    assert changes["entries"] == []
+
+
+async def test_changes_rejects_bad_token(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    body = await gql(
+        client,
+        CHANGES_SINCE,
+        {"token": "nope"},
+        expect_errors=True,
+        headers=auth_header(alice),
+    )
+    assert body["errors"][0]["message"] == "Invalid changes token"
@@ -0,0 +1,167 @@
+import json
+from hashlib import sha256
+
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from moods.app import ETagMiddleware
+from tests.conftest import auth_header, gql
+
+H = auth_header("00000000-0000-0000-0000-000000000000")
+
+CREATE_USER = """
+mutation CreateUser($input: CreateUserInput!) {
+  createUser(input: $input) { id }
+}
+"""
+
+UPDATE_TAG_METADATA = """
+mutation UpdateTagMetadata($input: UpdateTagMetadataInput!) {
+  updateTagMetadata(input: $input) { name }
+}
+"""
+
+LOG_MOOD = """
+mutation LogMood($input: LogMoodInput!) {
+  logMood(input: $input) { id }
+}
+"""
+
+TAGS_QUERY = "query Tags { tags { edges { node { name metadata } } } }"
+
+
+def _extensions(query: str) -> dict:
+    digest = sha256(query.encode()).hexdigest()
+    return {"persistedQuery": {"version": 1, "sha256Hash": digest}}
+
+
+async def _tags(client, headers=None):
+    return await client.get(
+        "/graphql", params={"query": TAGS_QUERY}, headers={**H, **(headers or {})}
+    )
+
+
+async def _post_tags(client, headers=None):
+    return await client.post(
+        "/graphql", json={"query": TAGS_QUERY}, headers={**H, **(headers or {})}
+    )
+
+
+async def test_query_responses_carry_an_etag(client):
+    resp = await _tags(client)
+
+    assert resp.status_code == 200
+    etag = resp.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+    assert resp.headers["cache-control"] == "private, no-cache"
+    assert (await _tags(client)).headers["etag"] == etag
+    assert (await _post_tags(client)).headers["etag"] == etag
+
+
+async def test_if_none_match_returns_not_modified(client):
+    etag = (await _tags(client)).headers["etag"]
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        resp = await _tags(client, {"If-None-Match": header})
+        assert resp.status_code == 304
+        assert resp.content == b""
+        assert resp.headers["etag"] == etag
+
+    resp = await _tags(client, {"If-None-Match": '"other"'})
+    assert resp.status_code == 200
+    assert resp.json() == {"data": {"tags": {"edges": []}}}
+
+
+async def test_post_queries_are_not_conditional(client):
+    etag = (await _post_tags(client)).headers["etag"]
+
+    # RFC 9110 only allows 304 for GET and HEAD
+    resp = await _post_tags(client, {"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] == etag
+    assert resp.json() == {"data": {"tags": {"edges": []}}}
+
+
+async def test_repeated_headers_are_kept():
+    async def endpoint(request):
+        request.state.graphql_query = True
+        response = JSONResponse({"data": {}}, headers={"Vary": "Accept"})
+        response.set_cookie("a", "1")
+        response.set_cookie("b", "2")
+        return response
+
+    app = Starlette(
+        routes=[Route("/", endpoint)], middleware=[Middleware(ETagMiddleware)]
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        resp = await client.get("/")
+        etag = resp.headers["etag"]
+        not_modified = await client.get("/", headers={"If-None-Match": etag})
+
+    for r in (resp, not_modified):
+        assert r.headers.get_list("set-cookie") == [
+            "a=1; Path=/; SameSite=lax",
+            "b=2; Path=/; SameSite=lax",
+        ]
+        assert r.headers["vary"] == "Accept, Authorization, Cookie"
+    assert not_modified.status_code == 304
+
+
+async def test_etag_changes_with_the_data(client):
+    alice = await gql(
+        client,
+        CREATE_USER,
+        {"input": {"name": "Alice", "email": "alice@test.com"}},
+        headers=H,
+    )
+    alice_id = alice["data"]["createUser"]["id"]
+    await gql(
+        client,
+        LOG_MOOD,
+        {"input": {"mood": 5, "notes": "", "tags": ["work"]}},
+        headers=auth_header(alice_id),
+    )
+    etag = (await _tags(client)).headers["etag"]
+
+    await gql(
+        client,
+        UPDATE_TAG_METADATA,
+        {"input": {"name": "work", "metadata": {"color": "red"}}},
+        headers=H,
+    )
+    resp = await _tags(client, {"If-None-Match": etag})
+
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
+    [edge] = resp.json()["data"]["tags"]["edges"]
+    assert edge["node"]["metadata"] == {"color": "red"}
+
+
+async def test_mutations_are_not_tagged(client):
+    resp = await client.post(
+        "/graphql",
+        json={
+            "query": CREATE_USER,
+            "variables": {"input": {"name": "Alice", "email": "alice@test.com"}},
+        },
+        headers=H,
+    )
+    assert resp.status_code == 200
+    assert "etag" not in resp.headers
+
+
+async def test_hashed_get_revalidates(client):
+    body = {"query": TAGS_QUERY, "extensions": _extensions(TAGS_QUERY)}
+    etag = (await client.post("/graphql", json=body, headers=H)).headers["etag"]
+
+    resp = await client.get(
+        "/graphql",
+        params={"extensions": json.dumps(_extensions(TAGS_QUERY))},
+        headers={**H, "If-None-Match": etag},
+    )
+    assert resp.status_code == 304
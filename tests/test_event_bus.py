@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from moods.data.outbox import MOOD_ENTRIES_LOGGED, TAG_UPDATED, USER_UPDATED
+from tests.conftest import auth_header, gql
+
+H = auth_header("00000000-0000-0000-0000-000000000000")
+
+CREATE_USER = """
+mutation CreateUser($input: CreateUserInput!) {
+  createUser(input: $input) { id }
+}
+"""
+
+LOG_MOOD = """
+mutation LogMood($input: LogMoodInput!) {
+  logMood(input: $input) { id }
+}
+"""
+
+LOG_MOODS = """
+mutation LogMoods($inputs: [LogMoodInput!]!) {
+  logMoods(inputs: $inputs) { id }
+}
+"""
+
+
+async def _create_user(client, name, email):
+    body = await gql(
+        client, CREATE_USER, {"input": {"name": name, "email": email}}, headers=H
+    )
+    return body["data"]["createUser"]["id"]
+
+
+async def _log_mood(client, user_id, mood):
+    body = await gql(
+        client,
+        LOG_MOOD,
+        {"input": {"mood": mood, "notes": ""}},
+        headers=auth_header(user_id),
+    )
+    return body["data"]["logMood"]["id"]
+
+
+async def _next(subscription):
+    return await asyncio.wait_for(anext(subscription), timeout=5)
+
+
+async def test_events_reach_subscribers(client, events):
+    async with (
+        events.subscribe() as everything,
+        events.subscribe(MOOD_ENTRIES_LOGGED) as entries,
+    ):
+        alice = await _create_user(client, "Alice", "alice@test.com")
+        entry_id = await _log_mood(client, alice, 6)
+
+        created = await _next(everything)
+        assert created["topic"] == USER_UPDATED
+        assert created["payload"] == {"user_id": alice}
+
+        logged = await _next(entries)
+        assert logged["topic"] == MOOD_ENTRIES_LOGGED
+        assert logged["payload"] == {"user_id": alice, "entry_ids": [entry_id]}
+        assert (await _next(everything))["id"] == logged["id"]
+
+    assert not events.subscriptions
+
+
+async def test_large_events_are_read_from_the_outbox(client, events):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    async with events.subscribe(MOOD_ENTRIES_LOGGED) as entries:
+        inputs = [{"mood": 5, "notes": ""} for _ in range(300)]
+        body = await gql(
+            client, LOG_MOODS, {"inputs": inputs}, headers=auth_header(alice)
+        )
+
+        event = await _next(entries)
+        assert event["payload"]["entry_ids"] == [
+            e["id"] for e in body["data"]["logMoods"]
+        ]
+
+
+async def test_rolled_back_writes_emit_nothing(client, events):
+    async with events.subscribe(TAG_UPDATED) as tags:
+        body = await gql(
+            client,
+            'mutation { archiveTag(name: "missing") { name } }',
+            expect_errors=True,
+            headers=H,
+        )
+        assert body["errors"]
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(anext(tags), timeout=0.2)
+
+
+async def test_bus_catches_up_after_reconnect(client, events, pool):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    async with events.subscribe(MOOD_ENTRIES_LOGGED) as entries:
+        pid = events._conn.get_server_pid()
+        await pool.execute("select pg_terminate_backend($1)", pid)
+        # Logged while the events is still reconnecting
+        entry_id = await _log_mood(client, alice, 6)
+
+        event = await _next(entries)
+        assert event["payload"]["entry_ids"] == [entry_id]
+        assert events._conn.get_server_pid() != pid
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(anext(entries), timeout=0.5)
@@ -0,0 +1,202 @@
+import csv
+import io
+import json
+
+from moods.config import settings
+from moods.data import Moods
+from moods.data.utils import queries
+from moods.routes import create_export
+from tests.conftest import _app, auth_cookie, auth_header, gql
+
+H = auth_header("00000000-0000-0000-0000-000000000000")
+
+CREATE_USER = """
+mutation CreateUser($input: CreateUserInput!) {
+  createUser(input: $input) { id }
+}
+"""
+
+LOG_MOOD = """
+mutation LogMood($input: LogMoodInput!) {
+  logMood(input: $input) { id }
+}
+"""
+
+ARCHIVE_ENTRY = """
+mutation ArchiveMoodEntry($id: ID!) {
+  archiveMoodEntry(id: $id) { id }
+}
+"""
+
+UPDATE_SHARING = """
+mutation UpdateSharing($input: UpdateSharingInput!) {
+  updateSharing(input: $input) { id }
+}
+"""
+
+
+async def _create_user(client, name, email):
+    body = await gql(
+        client, CREATE_USER, {"input": {"name": name, "email": email}}, headers=H
+    )
+    return body["data"]["createUser"]["id"]
+
+
+async def _log_mood(client, user_id, mood, notes="", tags=None):
+    body = await gql(
+        client,
+        LOG_MOOD,
+        {"input": {"mood": mood, "notes": notes, "tags": tags or []}},
+        headers=auth_header(user_id),
+    )
+    return body["data"]["logMood"]["id"]
+
+
+def _ndjson(resp) -> list[dict]:
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+
+async def test_export_requires_auth(client):
+    resp = await client.get("/export/entries.ndjson")
+    assert resp.status_code == 401
+    resp = await client.get("/export/entries.csv")
+    assert resp.status_code == 401
+
+
+async def test_export_ndjson(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    first = await _log_mood(client, alice, 4, notes="meh", tags=["tired", "work"])
+    second = await _log_mood(client, alice, 7)
+
+    resp = await client.get("/export/entries.ndjson", headers=auth_header(alice))
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = _ndjson(resp)
+    assert [r["id"] for r in rows] == [first, second]
+    assert rows[0]["userId"] == alice
+    assert rows[0]["notes"] == "meh"
+    assert rows[0]["tags"] == ["tired", "work"]
+    assert rows[0]["delta"] is None
+    assert rows[1]["tags"] == []
+    assert rows[1]["delta"] == 3
+
+
+async def test_export_csv(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    await _log_mood(client, alice, 4, notes="a, b", tags=["tired", "work"])
+
+    resp = await client.get("/export/entries.csv", cookies=auth_cookie(alice))
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert len(rows) == 1
+    assert rows[0]["notes"] == "a, b"
+    assert rows[0]["tags"] == "tired;work"
+    assert rows[0]["mood"] == "4"
+
+
+async def test_export_csv_empty_has_header(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    resp = await client.get("/export/entries.csv", headers=auth_header(alice))
+    assert resp.text.strip() == "id,userId,mood,delta,notes,tags,createdAt,archivedAt"
+
+
+async def test_export_archived(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    entry_id = await _log_mood(client, alice, 4)
+    await gql(client, ARCHIVE_ENTRY, {"id": entry_id}, headers=auth_header(alice))
+
+    resp = await client.get("/export/entries.ndjson", headers=auth_header(alice))
+    assert _ndjson(resp) == []
+
+    resp = await client.get(
+        "/export/entries.ndjson?includeArchived=true", headers=auth_header(alice)
+    )
+    [row] = _ndjson(resp)
+    assert row["archivedAt"] is not None
+
+
+async def test_export_follows_share_filters(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    bob = await _create_user(client, "Bob", "bob@test.com")
+    visible = await _log_mood(client, alice, 6, tags=["work"])
+    await _log_mood(client, alice, 2, tags=["private"])
+    own = await _log_mood(client, bob, 5)
+
+    await gql(
+        client,
+        UPDATE_SHARING,
+        {
+            "input": {
+                "rules": [
+                    {
+                        "userId": bob,
+                        "filters": [{"pattern": "private", "isInclude": False}],
+                    }
+                ]
+            }
+        },
+        headers=auth_header(alice),
+    )
+
+    resp = await client.get("/export/entries.ndjson", headers=auth_header(bob))
+    assert [r["id"] for r in _ndjson(resp)] == [visible, own]
+
+    resp = await client.get(
+        f"/export/entries.ndjson?userId={alice}", headers=auth_header(bob)
+    )
+    assert [r["id"] for r in _ndjson(resp)] == [visible]
+
+
+async def test_export_matches_live_query(client, pool, monkeypatch):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    bob = await _create_user(client, "Bob", "bob@test.com")
+    await _log_mood(client, alice, 6, tags=["work"])
+    archived = await _log_mood(client, alice, 3)
+    await _log_mood(client, alice, 2, tags=["private"])
+    await _log_mood(client, alice, 8)
+    await _log_mood(client, bob, 5)
+    await gql(client, ARCHIVE_ENTRY, {"id": archived}, headers=auth_header(alice))
+    await gql(
+        client,
+        UPDATE_SHARING,
+        {
+            "input": {
+                "rules": [
+                    {
+                        "userId": bob,
+                        "filters": [{"pattern": "private", "isInclude": False}],
+                    }
+                ]
+            }
+        },
+        headers=auth_header(alice),
+    )
+
+    indexed = Moods(pool)
+    live = Moods(pool, use_visibility_index=False)
+    for viewer_id in (alice, bob):
+        for include_archived in (False, True):
+            kwargs = {"viewer_id": viewer_id, "include_archived": include_archived}
+            expected = [e async for e in live.export_mood_entries(**kwargs)]
+            assert [e async for e in indexed.export_mood_entries(**kwargs)] == expected
+
+    # The route follows the visibility_index setting
+    def no_index(*_args, **_kwargs):
+        raise AssertionError("export read the visibility index")
+
+    monkeypatch.setattr(settings, "visibility_index", False)
+    monkeypatch.setattr(_app.state, "export", create_export(pool, settings))
+    monkeypatch.setattr(queries, "export_mood_entries_cursor", no_index)
+    resp = await client.get("/export/entries.ndjson", headers=auth_header(bob))
+    assert [r["mood"] for r in _ndjson(resp)] == [6, 8, 5]
+
+
+async def test_export_rejects_bad_user_id(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    resp = await client.get(
+        "/export/entries.ndjson?userId=nope", headers=auth_header(alice)
+    )
+    assert resp.status_code == 400
@@ -0,0 +1,286 @@
+import json
+from uuid import UUID
+
+from moods.config import settings
+from moods.data import Moods
+from moods.importer import run as run_importer
+from moods.routes import create_import
+from tests.conftest import _app, auth_header, gql
+
+H = auth_header("00000000-0000-0000-0000-000000000000")
+
+CREATE_USER = """
+mutation CreateUser($input: CreateUserInput!) {
+  createUser(input: $input) { id }
+}
+"""
+
+LOG_MOOD = """
+mutation LogMood($input: LogMoodInput!) {
+  logMood(input: $input) { id }
+}
+"""
+
+UPDATE_SHARING = """
+mutation UpdateSharing($input: UpdateSharingInput!) {
+  updateSharing(input: $input) { id }
+}
+"""
+
+MOOD_ENTRIES_QUERY = """
+query MoodEntries($userIds: [ID!]) {
+  moodEntries(userIds: $userIds, first: 100) {
+    edges { node { id mood delta notes createdAt tags { name } } }
+  }
+}
+"""
+
+
+async def _create_user(client, name, email):
+    body = await gql(
+        client, CREATE_USER, {"input": {"name": name, "email": email}}, headers=H
+    )
+    return body["data"]["createUser"]["id"]
+
+
+async def _import(client, user_id, rows, content_type="application/x-ndjson"):
+    if content_type == "text/csv":
+        body = rows
+    else:
+        body = "\n".join(json.dumps(r) for r in rows)
+    headers = {**auth_header(user_id), "Content-Type": content_type}
+    resp = await client.post("/import/entries", content=body, headers=headers)
+    assert resp.status_code == 200
+    return resp.json()
+
+
+async def _entries(client, viewer_id, user_ids=None):
+    body = await gql(
+        client,
+        MOOD_ENTRIES_QUERY,
+        {"userIds": user_ids},
+        headers=auth_header(viewer_id),
+    )
+    return [e["node"] for e in body["data"]["moodEntries"]["edges"]]
+
+
+async def test_import_requires_auth(client):
+    resp = await client.post("/import/entries", content="{}")
+    assert resp.status_code == 401
+
+
+async def test_import_ndjson(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    result = await _import(
+        client,
+        alice,
+        [
+            {"mood": 4, "notes": "old", "tags": ["Work"], "createdAt": "2020-01-01"},
+            {"mood": 6, "createdAt": "2020-01-02T08:30:00+02:00"},
+        ],
+    )
+
+    assert result == {"imported": 2, "rejected": []}
+    entries = await _entries(client, alice)
+    assert [e["mood"] for e in entries] == [6, 4]
+    assert entries[0]["delta"] == 2
+    assert entries[0]["createdAt"] == "2020-01-02T06:30:00+00:00"
+    assert entries[1]["notes"] == "old"
+    assert entries[1]["tags"] == [{"name": "work"}]
+
+
+async def test_import_sorts_into_existing_history(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    await gql(
+        client,
+        LOG_MOOD,
+        {"input": {"mood": 9, "notes": "", "tags": []}},
+        headers=auth_header(alice),
+    )
+    await _import(client, alice, [{"mood": 5, "createdAt": "2021-06-01"}])
+
+    entries = await _entries(client, alice)
+    assert [(e["mood"], e["delta"]) for e in entries] == [(9, 4), (5, None)]
+
+
+async def test_import_csv(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    csv_body = (
+        "mood,notes,tags,createdAt\n"
+        '3,"rainy, cold",sad;tired,2019-03-01T10:00:00+00:00\n'
+        "7,,,2019-03-02T10:00:00+00:00\n"
+    )
+    result = await _import(client, alice, csv_body, content_type="text/csv")
+
+    assert result == {"imported": 2, "rejected": []}
+    entries = await _entries(client, alice)
+    assert entries[1]["notes"] == "rainy, cold"
+    assert sorted(t["name"] for t in entries[1]["tags"]) == ["sad", "tired"]
+
+
+async def test_import_keeps_line_breaks_in_notes(client, pool):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    notes = [
+        "first line\nsecond line",
+        "crlf\r\nkept",
+        "separators\u2028\u2029\x85\x0b\x0c\x1c\x1d\x1e",
+    ]
+    csv_body = "mood,notes,createdAt\r\n" + "".join(
+        f'{i},"{n}",2019-03-0{i}T10:00:00+00:00\r\n'
+        for i, n in enumerate(notes, start=1)
+    )
+    result = await _import(client, alice, csv_body, content_type="text/csv")
+    assert result == {"imported": 3, "rejected": []}
+
+    ndjson_body = json.dumps(
+        {"mood": 4, "notes": notes[2], "createdAt": "2019-03-04"},
+        ensure_ascii=False,
+    )
+    resp = await client.post(
+        "/import/entries", content=ndjson_body, headers=auth_header(alice)
+    )
+    assert resp.json() == {"imported": 1, "rejected": []}
+
+    stored = await pool.fetch(
+        "select notes from mood_entries where user_id = $1 order by created_at",
+        UUID(alice),
+    )
+    assert [r["notes"] for r in stored] == [*notes, notes[2]]
+
+
+async def test_import_reports_rejects(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    body = "\n".join(
+        [
+            json.dumps({"mood": 5, "createdAt": "2020-01-01"}),
+            "not json",
+            json.dumps({"mood": "high", "createdAt": "2020-01-01"}),
+            json.dumps({"mood": 5}),
+            json.dumps({"mood": 6, "createdAt": "2020-01-01", "tags": "x"}),
+            json.dumps({"mood": 99999999999, "createdAt": "2020-01-01"}),
+            json.dumps({"mood": 5, "notes": "a\x00b", "createdAt": "2020-01-01"}),
+            json.dumps({"mood": 5, "createdAt": "2020-01-01", "tags": ["a\x00"]}),
+        ]
+    )
+    resp = await client.post(
+        "/import/entries", content=body, headers=auth_header(alice)
+    )
+
+    result = resp.json()
+    assert result["imported"] == 2
+    assert [r["line"] for r in result["rejected"]] == [2, 3, 4, 6, 7, 8]
+    assert result["rejected"][1]["error"] == "mood must be an integer"
+    assert result["rejected"][3]["error"].startswith("mood must be between")
+    assert result["rejected"][4]["error"] == "notes must not contain NUL characters"
+    assert result["rejected"][5]["error"] == "tags must not contain NUL characters"
+
+
+async def test_import_rejects_large_bodies(client, pool, monkeypatch):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    monkeypatch.setattr(settings, "import_max_body_mb", 1)
+    monkeypatch.setattr(_app.state, "imports", create_import(pool, settings))
+    line = json.dumps({"mood": 5, "notes": "x" * 1000, "createdAt": "2020-01-01"})
+    body = "\n".join([line] * 1100)
+
+    resp = await client.post(
+        "/import/entries", content=body, headers=auth_header(alice)
+    )
+    assert resp.status_code == 413
+
+    # Without a Content-Length the body is cut off as it streams in
+    async def chunks():
+        for _ in range(1100):
+            yield (line + "\n").encode()
+
+    resp = await client.post(
+        "/import/entries", content=chunks(), headers=auth_header(alice)
+    )
+    assert resp.status_code == 413
+    assert await _entries(client, alice) == []
+
+
+async def test_import_skips_duplicates(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    rows = [
+        {"mood": 4, "notes": "a", "createdAt": "2020-01-01T00:00:00Z"},
+        {"mood": 5, "notes": "b", "createdAt": "2020-01-02T00:00:00Z"},
+    ]
+    await _import(client, alice, rows)
+    result = await _import(
+        client, alice, [*rows, {"mood": 6, "createdAt": "2020-02-01"}]
+    )
+
+    assert result["imported"] == 1
+    assert [r["line"] for r in result["rejected"]] == [1, 2]
+    assert len(await _entries(client, alice)) == 3
+
+
+async def test_import_skips_repeats_within_a_file(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    row = {"mood": 4, "notes": "a", "createdAt": "2020-01-01T00:00:00Z"}
+    result = await _import(
+        client,
+        alice,
+        [row, {**row, "notes": "b"}, row, {**row, "createdAt": "2020-01-01"}],
+    )
+
+    assert result == {
+        "imported": 2,
+        "rejected": [
+            {"line": 3, "error": "Duplicate of line 1"},
+            {"line": 4, "error": "Duplicate of line 1"},
+        ],
+    }
+    assert len(await _entries(client, alice)) == 2
+
+
+async def test_import_follows_share_filters(client, pool):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    bob = await _create_user(client, "Bob", "bob@test.com")
+    await gql(
+        client,
+        UPDATE_SHARING,
+        {
+            "input": {
+                "rules": [
+                    {
+                        "userId": bob,
+                        "filters": [{"pattern": "^secret", "isInclude": False}],
+                    }
+                ]
+            }
+        },
+        headers=auth_header(alice),
+    )
+
+    await _import(
+        client,
+        alice,
+        [
+            {"mood": 2, "createdAt": "2020-01-01"},
+            {"mood": 9, "tags": ["secret-diary"], "createdAt": "2020-01-02"},
+            {"mood": 5, "createdAt": "2020-01-03"},
+        ],
+    )
+
+    seen = await _entries(client, bob, user_ids=[alice])
+    assert [(e["mood"], e["delta"]) for e in seen] == [(5, 3), (2, None)]
+
+    live = Moods(pool, use_visibility_index=False)
+    for viewer_id in (alice, bob):
+        expected = await live.get_mood_entries(viewer_id=viewer_id)
+        assert await Moods(pool).get_mood_entries(viewer_id=viewer_id) == expected
+
+        stats = await Moods(pool).get_mood_stats(viewer_id=viewer_id)
+        assert sum(s["count"] for s in stats) == len(expected["edges"])
+
+
+async def test_import_cli(client, tmp_path):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    path = tmp_path / "entries.ndjson"
+    path.write_text(json.dumps({"mood": 4, "createdAt": "2020-01-01"}) + "\n")
+
+    result = await run_importer(["--email", "alice@test.com", str(path)])
+
+    assert result == {"imported": 1, "rejected": []}
+    assert len(await _entries(client, alice)) == 1
@@ -0,0 +1,161 @@
+from datetime import UTC, datetime, timedelta
+
+from tests.conftest import auth_header, gql
+
+H = auth_header("00000000-0000-0000-0000-000000000000")
+
+CREATE_USER = """
+mutation CreateUser($input: CreateUserInput!) {
+  createUser(input: $input) { id }
+}
+"""
+
+LOG_MOOD = """
+mutation LogMood($input: LogMoodInput!) {
+  logMood(input: $input) { id }
+}
+"""
+
+ARCHIVE_ENTRY = """
+mutation ArchiveMoodEntry($id: ID!) {
+  archiveMoodEntry(id: $id) { id }
+}
+"""
+
+UPDATE_SHARING = """
+mutation UpdateSharing($input: UpdateSharingInput!) {
+  updateSharing(input: $input) { id }
+}
+"""
+
+MOOD_STATS_QUERY = """
+query MoodStats(
+  $userIds: [ID!], $from: DateTime, $to: DateTime, $bucket: MoodStatsBucket
+) {
+  moodStats(userIds: $userIds, from: $from, to: $to, bucket: $bucket) {
+    user { id }
+    bucketStart count average min max
+  }
+}
+"""
+
+
+async def _create_user(client, name, email):
+    body = await gql(
+        client, CREATE_USER, {"input": {"name": name, "email": email}}, headers=H
+    )
+    return body["data"]["createUser"]["id"]
+
+
+async def _log_mood(client, user_id, mood, tags=None):
+    body = await gql(
+        client,
+        LOG_MOOD,
+        {"input": {"mood": mood, "notes": "", "tags": tags or []}},
+        headers=auth_header(user_id),
+    )
+    return body["data"]["logMood"]["id"]
+
+
+async def _mood_stats(client, viewer_id, **variables):
+    body = await gql(
+        client, MOOD_STATS_QUERY, variables, headers=auth_header(viewer_id)
+    )
+    assert "errors" not in body, body
+    return body["data"]["moodStats"]
+
+
+def _today() -> datetime:
+    now = datetime.now(UTC)
+    return datetime(now.year, now.month, now.day, tzinfo=UTC)
+
+
+async def test_mood_stats_daily(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    for mood in (3, 8, 4):
+        await _log_mood(client, alice, mood)
+
+    stats = await _mood_stats(client, alice)
+
+    assert stats == [
+        {
+            "user": {"id": alice},
+            "bucketStart": _today().isoformat(),
+            "count": 3,
+            "average": 5.0,
+            "min": 3,
+            "max": 8,
+        }
+    ]
+
+
+async def test_mood_stats_buckets(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    await _log_mood(client, alice, 6)
+
+    today = _today()
+    week = await _mood_stats(client, alice, bucket="WEEK")
+    month = await _mood_stats(client, alice, bucket="MONTH")
+
+    assert week[0]["bucketStart"] == (
+        (today - timedelta(days=today.weekday())).isoformat()
+    )
+    assert month[0]["bucketStart"] == today.replace(day=1).isoformat()
+
+
+async def test_mood_stats_date_window(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    await _log_mood(client, alice, 6)
+
+    today = _today()
+    yesterday = (today - timedelta(days=1)).isoformat()
+    tomorrow = (today + timedelta(days=1)).isoformat()
+
+    assert await _mood_stats(client, alice, to=yesterday) == []
+    assert await _mood_stats(client, alice, **{"from": tomorrow}) == []
+    assert len(await _mood_stats(client, alice, to=today.isoformat())) == 1
+
+
+async def test_mood_stats_skip_archived_entries(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    await _log_mood(client, alice, 5)
+    low = await _log_mood(client, alice, 1)
+    await _log_mood(client, alice, 7)
+
+    await gql(client, ARCHIVE_ENTRY, {"id": low}, headers=auth_header(alice))
+
+    [stats] = await _mood_stats(client, alice)
+    assert (stats["count"], stats["min"], stats["max"]) == (2, 5, 7)
+
+
+async def test_mood_stats_follow_share_filters(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    bob = await _create_user(client, "Bob", "bob@test.com")
+    await _log_mood(client, alice, 9, tags=["work"])
+    await _log_mood(client, alice, 2, tags=["private"])
+
+    # No share yet: bob sees nothing of alice
+    assert await _mood_stats(client, bob, userIds=[alice]) == []
+
+    await gql(
+        client,
+        UPDATE_SHARING,
+        {
+            "input": {
+                "rules": [
+                    {
+                        "userId": bob,
+                        "filters": [{"pattern": "private", "isInclude": False}],
+                    }
+                ]
+            }
+        },
+        headers=auth_header(alice),
+    )
+    await _log_mood(client, alice, 5)
+
+    [stats] = await _mood_stats(client, bob, userIds=[alice])
+    assert (stats["count"], stats["min"], stats["max"]) == (2, 5, 9)
+
+    [own] = await _mood_stats(client, alice)
+    assert (own["count"], own["min"], own["max"]) == (3, 2, 9)
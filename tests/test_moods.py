@@ -1,3 +1,8 @@
+import asyncio
+import contextlib
+
+from moods.data import Moods, loaders
+from moods.data.mutation_keys import purge_mutation_keys
 from tests.conftest import auth_header, gql
 
 H = auth_header("00000000-0000-0000-0000-000000000000")
@@ -35,6 +40,16 @@ query MoodEntries(
 }
 """
 
+LOG_MOODS = """
+mutation LogMoods($inputs: [LogMoodInput!]!) {
+  logMoods(inputs: $inputs) {
+    id mood notes createdAt
+    user { id }
+    tags { name }
+  }
+}
+"""
+
 ARCHIVE_ENTRY = """
 mutation ArchiveMoodEntry($id: ID!) {
   archiveMoodEntry(id: $id) {
@@ -77,6 +92,13 @@ async def test_log_mood(client):
     assert tag_names == ["happy", "sunny"]
 
 
+async def test_log_mood_normalizes_tags(client):
+    user = await _create_user(client)
+    entry = await _log_mood(client, user["id"], tags=["Work", "work", "WORK", "gym"])
+
+    assert sorted(t["name"] for t in entry["tags"]) == ["gym", "work"]
+
+
 async def test_query_mood_entries(client):
     user = await _create_user(client)
     h = auth_header(user["id"])
@@ -147,6 +169,27 @@ async def test_archive_mood_entry(client):
     body = await gql(client, MOOD_ENTRIES_QUERY, headers=h)
     assert len(body["data"]["moodEntries"]["edges"]) == 0
 
+
+async def test_archive_mood_entry_retry_returns_entry(client):
+    user = await _create_user(client)
+    h = auth_header(user["id"])
+    entry = await _log_mood(client, user["id"])
+    first = await gql(client, ARCHIVE_ENTRY, {"id": entry["id"]}, headers=h)
+
+    retry = await gql(client, ARCHIVE_ENTRY, {"id": entry["id"]}, headers=h)
+    assert retry == first
+
+    # Someone else's archived entry is still not found
+    other = await _create_user(client, email="other@test.com")
+    body = await gql(
+        client,
+        ARCHIVE_ENTRY,
+        {"id": entry["id"]},
+        headers=auth_header(other["id"]),
+        expect_errors=True,
+    )
+    assert body["errors"][0]["message"] == "Mood entry not found"
+
     body = await gql(client, MOOD_ENTRIES_QUERY, {"includeArchived": True}, headers=h)
     assert len(body["data"]["moodEntries"]["edges"]) == 1
 
@@ -267,7 +310,7 @@ async def test_mood_entry_delta_across_pages(client):
     assert page1["edges"][0]["node"]["delta"] == 4  # 10 - 6
     assert page1["edges"][1]["node"]["delta"] == 4  # 6 - 2
 
-    # Page 2: oldest entry — delta still computed correctly via CTE
+    # Page 2: oldest entry — delta is stored, not derived from the page
     body = await gql(
         client,
         DELTA_QUERY,
@@ -279,6 +322,58 @@ async def test_mood_entry_delta_across_pages(client):
     assert page2["edges"][0]["node"]["delta"] is None  # first entry
 
 
+async def test_mood_entry_delta_after_archive(client):
+    user = await _create_user(client)
+    h = auth_header(user["id"])
+    await _log_mood(client, user["id"], mood=5, notes="first")
+    second = await _log_mood(client, user["id"], mood=8, notes="second")
+    await _log_mood(client, user["id"], mood=3, notes="third")
+
+    await gql(client, ARCHIVE_ENTRY, {"id": second["id"]}, headers=h)
+
+    body = await gql(client, DELTA_QUERY, {"userIds": [user["id"]]}, headers=h)
+    edges = body["data"]["moodEntries"]["edges"]
+    assert [e["node"]["mood"] for e in edges] == [3, 5]
+    assert edges[0]["node"]["delta"] == -2  # 3 - 5, skipping the archived 8
+
+
+async def test_mood_entry_delta_follows_viewer_filters(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    bob = await _create_user(client, "Bob", "bob@test.com")
+    SHARE = (
+        "mutation UpdateSharing($input: UpdateSharingInput!)"
+        " { updateSharing(input: $input) { id } }"
+    )
+    await gql(
+        client,
+        SHARE,
+        {
+            "input": {
+                "rules": [
+                    {
+                        "userId": bob["id"],
+                        "filters": [{"pattern": "private", "isInclude": False}],
+                    }
+                ]
+            }
+        },
+        headers=auth_header(alice["id"]),
+    )
+    await _log_mood(client, alice["id"], mood=5, notes="a1")
+    await _log_mood(client, alice["id"], mood=9, notes="a2", tags=["private"])
+    await _log_mood(client, alice["id"], mood=6, notes="a3")
+
+    body = await gql(client, DELTA_QUERY, headers=auth_header(alice["id"]))
+    edges = body["data"]["moodEntries"]["edges"]
+    assert edges[0]["node"]["delta"] == -3  # 6 - 9
+
+    # Bob never sees the private entry, so his delta skips it
+    body = await gql(client, DELTA_QUERY, headers=auth_header(bob["id"]))
+    edges = body["data"]["moodEntries"]["edges"]
+    assert [e["node"]["mood"] for e in edges] == [6, 5]
+    assert edges[0]["node"]["delta"] == 1  # 6 - 5
+
+
 async def test_mood_entries_pagination(client):
     user = await _create_user(client)
     h = auth_header(user["id"])
@@ -309,3 +404,204 @@ async def test_mood_entries_pagination(client):
     page3 = body["data"]["moodEntries"]
     assert len(page3["edges"]) == 1
     assert page3["pageInfo"]["hasNextPage"] is False
+
+
+async def test_log_moods(client):
+    user = await _create_user(client)
+    h = auth_header(user["id"])
+    inputs = [
+        {"mood": 3, "notes": "first", "tags": ["Tired", "work", "tired"]},
+        {"mood": 6, "notes": "second"},
+        {"mood": 9, "notes": "third", "tags": ["happy"]},
+    ]
+
+    body = await gql(client, LOG_MOODS, {"inputs": inputs}, headers=h)
+    created = body["data"]["logMoods"]
+
+    assert [e["notes"] for e in created] == ["first", "second", "third"]
+    assert all(e["user"]["id"] == user["id"] for e in created)
+    assert sorted(t["name"] for t in created[0]["tags"]) == ["tired", "work"]
+    assert created[1]["tags"] == []
+
+    # Timeline order and deltas follow the input order
+    body = await gql(client, DELTA_QUERY, {"userIds": [user["id"]]}, headers=h)
+    edges = body["data"]["moodEntries"]["edges"]
+    assert [e["node"]["id"] for e in edges] == [e["id"] for e in reversed(created)]
+    assert [e["node"]["delta"] for e in edges] == [3, 3, None]
+
+
+async def test_log_moods_after_existing_entry(client):
+    user = await _create_user(client)
+    h = auth_header(user["id"])
+    await _log_mood(client, user["id"], mood=5)
+    await gql(client, LOG_MOODS, {"inputs": [{"mood": 7, "notes": "later"}]}, headers=h)
+
+    body = await gql(client, DELTA_QUERY, {"userIds": [user["id"]]}, headers=h)
+    edges = body["data"]["moodEntries"]["edges"]
+    assert [(e["node"]["mood"], e["node"]["delta"]) for e in edges] == [
+        (7, 2),
+        (5, None),
+    ]
+
+
+async def test_log_moods_empty(client):
+    user = await _create_user(client)
+    body = await gql(client, LOG_MOODS, {"inputs": []}, headers=auth_header(user["id"]))
+    assert body["data"]["logMoods"] == []
+
+
+async def test_log_moods_requires_auth(client):
+    body = await gql(
+        client,
+        LOG_MOODS,
+        {"inputs": [{"mood": 5, "notes": ""}]},
+        expect_errors=True,
+    )
+    assert body["errors"][0]["message"] == "Authentication required"
+
+
+async def test_log_mood_retry_with_client_mutation_id(client):
+    user = await _create_user(client)
+    h = auth_header(user["id"])
+    variables = {"input": {"mood": 6, "notes": "", "clientMutationId": "abc"}}
+
+    first = await gql(client, LOG_MOOD, variables, headers=h)
+    retry = await gql(client, LOG_MOOD, variables, headers=h)
+
+    assert retry["data"]["logMood"] == first["data"]["logMood"]
+    body = await gql(client, MOOD_ENTRIES_QUERY, headers=h)
+    assert len(body["data"]["moodEntries"]["edges"]) == 1
+
+
+async def test_log_moods_skips_used_client_mutation_ids(client):
+    user = await _create_user(client)
+    h = auth_header(user["id"])
+    body = await gql(
+        client,
+        LOG_MOOD,
+        {"input": {"mood": 4, "notes": "sent", "clientMutationId": "a"}},
+        headers=h,
+    )
+    sent = body["data"]["logMood"]
+
+    # The offline queue replays "a" after the app lost logMood's response
+    inputs = [
+        {"mood": 4, "notes": "sent", "clientMutationId": "a"},
+        {"mood": 6, "notes": "queued", "clientMutationId": "b"},
+        {"mood": 6, "notes": "queued", "clientMutationId": "b"},
+        {"mood": 8, "notes": "no key"},
+    ]
+    body = await gql(client, LOG_MOODS, {"inputs": inputs}, headers=h)
+    created = body["data"]["logMoods"]
+
+    assert created[0]["id"] == sent["id"]
+    assert created[1]["id"] == created[2]["id"]
+    assert [e["notes"] for e in created] == ["sent", "queued", "queued", "no key"]
+
+    body = await gql(client, DELTA_QUERY, {"userIds": [user["id"]]}, headers=h)
+    edges = body["data"]["moodEntries"]["edges"]
+    assert [(e["node"]["mood"], e["node"]["delta"]) for e in edges] == [
+        (8, 2),
+        (6, 2),
+        (4, None),
+    ]
+
+
+async def test_client_mutation_id_expires(client, pool):
+    user = await _create_user(client)
+    h = auth_header(user["id"])
+    variables = {"input": {"mood": 6, "notes": "", "clientMutationId": "abc"}}
+
+    first = await gql(client, LOG_MOOD, variables, headers=h)
+    await pool.execute(
+        "update mutation_keys set created_at = now() - interval '2 days'"
+    )
+    retry = await gql(client, LOG_MOOD, variables, headers=h)
+
+    assert retry["data"]["logMood"]["id"] != first["data"]["logMood"]["id"]
+    assert await pool.fetchval("select count(*) from mutation_keys") == 1
+
+
+async def test_client_mutation_id_retry_writes_nothing(client, pool):
+    user = await _create_user(client)
+    h = auth_header(user["id"])
+    variables = {"input": {"mood": 6, "notes": "", "clientMutationId": "abc"}}
+
+    await gql(client, LOG_MOOD, variables, headers=h)
+    before = await pool.fetchrow("select xmin::text, ctid::text from mutation_keys")
+    await gql(client, LOG_MOOD, variables, headers=h)
+    after = await pool.fetchrow("select xmin::text, ctid::text from mutation_keys")
+
+    assert after == before
+
+
+async def test_expired_mutation_keys_are_purged(client, pool):
+    user = await _create_user(client)
+    h = auth_header(user["id"])
+    for key in ("old", "new"):
+        variables = {"input": {"mood": 6, "notes": "", "clientMutationId": key}}
+        await gql(client, LOG_MOOD, variables, headers=h)
+    await pool.execute(
+        "update mutation_keys set created_at = now() - interval '2 days'"
+        " where key = 'old'"
+    )
+
+    purge = asyncio.create_task(purge_mutation_keys(pool))
+    try:
+        async with asyncio.timeout(5):
+            while await pool.fetchval("select count(*) from mutation_keys") > 1:
+                await asyncio.sleep(0.01)
+    finally:
+        purge.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await purge
+
+    assert await pool.fetchval("select key from mutation_keys") == "new"
+
+
+async def test_mood_entries_read_only_selected_fields(client, pool):
+    user = await _create_user(client)
+    h = auth_header(user["id"])
+    await _log_mood(client, user["id"], mood=5, notes="first", tags=["walk"])
+    await _log_mood(client, user["id"], mood=8, notes="second", tags=["run", "gym"])
+
+    light = await Moods(pool).get_mood_entries(viewer_id=user["id"], fields={"mood"})
+    assert [(e["node"]["notes"], e["node"]["delta"]) for e in light["edges"]] == [
+        (None, 3),
+        (None, None),
+    ]
+    assert all("tags" not in e["node"] for e in light["edges"])
+
+    # Fields selected through fragments count too
+    body = await gql(
+        client,
+        """
+        query { moodEntries { edges { node { ...Entry } } } }
+        fragment Entry on MoodEntry { ... on MoodEntry { notes tags { name } } }
+        """,
+        headers=h,
+    )
+    assert [e["node"] for e in body["data"]["moodEntries"]["edges"]] == [
+        {"notes": "second", "tags": [{"name": "gym"}, {"name": "run"}]},
+        {"notes": "first", "tags": [{"name": "walk"}]},
+    ]
+
+
+async def test_mood_entries_prime_loaders(client, monkeypatch):
+    alice = await _create_user(client)
+    await _log_mood(client, alice["id"], tags=["walk"])
+
+    loaded = []
+
+    async def batch_load_fn(self, keys):
+        loaded.append(keys)
+        return [None] * len(keys)
+
+    monkeypatch.setattr(loaders.UserLoader, "batch_load_fn", batch_load_fn)
+    monkeypatch.setattr(loaders.MoodEntryTagsLoader, "batch_load_fn", batch_load_fn)
+
+    body = await gql(client, MOOD_ENTRIES_QUERY, headers=auth_header(alice["id"]))
+    [edge] = body["data"]["moodEntries"]["edges"]
+    assert edge["node"]["user"] == {"id": alice["id"], "name": "Alice"}
+    assert edge["node"]["tags"] == [{"name": "walk"}]
+    assert loaded == []
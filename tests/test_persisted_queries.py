@@ -0,0 +1,121 @@
+import json
+import runpy
+from hashlib import sha256
+from pathlib import Path
+
+import pytest
+
+from moods.config import settings
+from moods.persisted_queries import PersistedQueries
+from moods.resolvers import create_gql
+from tests.conftest import _app, auth_header
+
+H = auth_header("00000000-0000-0000-0000-000000000000")
+
+GENERATE = Path(__file__).parent.parent / "graphql" / "generate.py"
+
+TAGS_QUERY = "query Tags { tags { edges { node { name } } } }"
+
+CREATE_USER = """
+mutation CreateUser($input: CreateUserInput!) {
+  createUser(input: $input) { id }
+}
+"""
+
+
+def _hash(query: str) -> str:
+    return sha256(query.encode()).hexdigest()
+
+
+def _extensions(query: str) -> dict:
+    return {"persistedQuery": {"version": 1, "sha256Hash": _hash(query)}}
+
+
+@pytest.fixture
+def persisted(client, pool, events):
+    persisted = PersistedQueries()
+    _app.state.graphql = create_gql(pool, settings, events, persisted_queries=persisted)
+    return persisted
+
+
+async def test_registers_and_reuses_queries(client, persisted):
+    body = {"extensions": _extensions(TAGS_QUERY)}
+    resp = await client.post("/graphql", json=body, headers=H)
+    assert resp.json()["errors"][0]["extensions"]["code"] == (
+        "PERSISTED_QUERY_NOT_FOUND"
+    )
+
+    resp = await client.post("/graphql", json={**body, "query": TAGS_QUERY}, headers=H)
+    assert resp.json() == {"data": {"tags": {"edges": []}}}
+
+    resp = await client.post("/graphql", json=body, headers=H)
+    assert resp.status_code == 200
+    assert resp.json() == {"data": {"tags": {"edges": []}}}
+
+
+async def test_rejects_mismatched_hash(client, persisted):
+    resp = await client.post(
+        "/graphql",
+        json={"query": TAGS_QUERY, "extensions": _extensions("query { other }")},
+        headers=H,
+    )
+    assert resp.json()["errors"][0]["message"] == "provided sha does not match query"
+    assert not persisted.registered.data
+
+
+async def test_hashed_get_runs_queries_only(client, persisted):
+    persisted.register(_hash(TAGS_QUERY), TAGS_QUERY)
+    resp = await client.get(
+        "/graphql",
+        params={"extensions": json.dumps(_extensions(TAGS_QUERY))},
+        headers=H,
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {"data": {"tags": {"edges": []}}}
+
+    persisted.register(_hash(CREATE_USER), CREATE_USER)
+    variables = {"input": {"name": "Alice", "email": "alice@test.com"}}
+    resp = await client.get(
+        "/graphql",
+        params={
+            "extensions": json.dumps(_extensions(CREATE_USER)),
+            "variables": json.dumps(variables),
+        },
+        headers=H,
+    )
+    assert resp.status_code == 400
+    assert "errors" in resp.json()
+
+
+async def test_registered_queries_are_bounded():
+    persisted = PersistedQueries(max_registered=2)
+    queries = [
+        f"query Q{i} {{ tags {{ pageInfo {{ hasNextPage }} }} }}" for i in range(3)
+    ]
+    for query in queries:
+        persisted.register(_hash(query), query)
+
+    assert persisted.get(_hash(queries[0])) is None
+    assert persisted.get(_hash(queries[2]))[0] == queries[2]
+
+
+async def test_manifest_covers_generated_clients(client, pool, events):
+    generate = runpy.run_path(str(GENERATE))
+    manifest = generate["build_manifest"]()
+    _app.state.graphql = create_gql(
+        pool, settings, events, persisted_queries=PersistedQueries(manifest)
+    )
+
+    tags = generate["read_operation"]("tags")
+    for text in (tags, generate["cljs_text"](tags), generate["ts_text"](tags)):
+        resp = await client.post(
+            "/graphql", json={"extensions": _extensions(text)}, headers=H
+        )
+        assert resp.json() == {
+            "data": {
+                "tags": {
+                    "edges": [],
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                }
+            }
+        }
@@ -0,0 +1,74 @@
+from moods.query_cache import LRUCache
+from tests.conftest import _app, auth_header, gql
+
+H = auth_header("00000000-0000-0000-0000-000000000000")
+
+TAGS_QUERY = "query Tags { tags { edges { node { name } } } }"
+
+INTROSPECTION_QUERY = """
+query Types($name: String!) {
+  __schema { queryType { name } }
+  __type(name: $name) { name kind }
+}
+"""
+
+
+def _stats():
+    return _app.state.query_cache.stats()
+
+
+async def test_repeated_queries_are_parsed_and_validated_once(client):
+    for _ in range(3):
+        body = await gql(client, TAGS_QUERY, headers=H)
+        assert body == {"data": {"tags": {"edges": []}}}
+
+    stats = _stats()
+    assert stats["documents"] == {"size": 1, "hits": 2, "misses": 1}
+    assert stats["validations"] == {"size": 1, "hits": 2, "misses": 1}
+
+
+async def test_invalid_queries_keep_failing(client):
+    for _ in range(2):
+        resp = await client.post("/graphql", json={"query": "query { tags {"})
+        assert resp.status_code == 400
+        assert "Syntax Error" in resp.json()["errors"][0]["message"]
+
+        resp = await client.post("/graphql", json={"query": "query { nope }"})
+        assert resp.status_code == 400
+        assert "Cannot query field 'nope'" in resp.json()["errors"][0]["message"]
+
+    assert _stats()["documents"]["size"] == 1
+    assert _stats()["validations"]["hits"] == 1
+
+
+async def test_introspection_results_are_cached(client):
+    first = await gql(client, INTROSPECTION_QUERY, {"name": "MoodEntry"})
+    again = await gql(client, INTROSPECTION_QUERY, {"name": "MoodEntry"})
+    other = await gql(client, INTROSPECTION_QUERY, {"name": "Tag"})
+
+    assert first == again
+    assert first["data"]["__type"] == {"name": "MoodEntry", "kind": "OBJECT"}
+    assert other["data"]["__type"]["name"] == "Tag"
+    assert _stats()["introspection"] == {"size": 2, "hits": 1, "misses": 2}
+
+    # Mixed with data fields, the result depends on more than the schema
+    await gql(client, "query { __typename tags { edges { cursor } } }", headers=H)
+    assert _stats()["introspection"]["misses"] == 2
+
+
+async def test_health_reports_cache_counters(client):
+    await gql(client, TAGS_QUERY, headers=H)
+    resp = await client.get("/health")
+    assert resp.json()["caches"]["documents"] == {"size": 1, "hits": 0, "misses": 1}
+
+
+def test_lru_evicts_least_recently_read():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert list(cache.data) == ["a", "c"]
+    assert cache.stats() == {"size": 2, "hits": 1, "misses": 1}
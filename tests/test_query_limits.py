@@ -0,0 +1,100 @@
+from pathlib import Path
+
+from graphql import get_introspection_query, parse, specified_rules, validate
+from moods.config import settings
+from moods.data.utils import MAX_PAGE_SIZE
+from moods.query_limits import cost_limit_rule, depth_limit_rule
+from tests.conftest import _app, auth_header, gql
+
+H = auth_header("00000000-0000-0000-0000-000000000000")
+
+OPERATIONS_DIR = Path(__file__).parent.parent / "graphql" / "operations"
+
+DEEP_QUERY = """
+query {
+  users {
+    entries { edges { node { user {
+      entries { edges { node { user {
+        entries { edges { node { id } } }
+      } } } }
+    } } } }
+  }
+}
+"""
+
+ENTRY_TAGS_QUERY = """
+query Entries($first: Int) {
+  users { entries(first: $first) { edges { node { tags { name } } } } }
+}
+"""
+
+
+def _validate(query: str, variables: dict | None = None) -> list:
+    rules = (
+        *specified_rules,
+        depth_limit_rule(settings.query_max_depth),
+        cost_limit_rule(settings.query_max_cost, variables),
+    )
+    return validate(_app.state.graphql.http_handler.schema, parse(query), rules)
+
+
+async def _post(client, query, variables=None):
+    return await client.post(
+        "/graphql", json={"query": query, "variables": variables or {}}, headers=H
+    )
+
+
+async def test_client_operations_fit_the_limits(client):
+    for path in sorted(OPERATIONS_DIR.glob("*.graphql")):
+        errors = _validate(path.read_text(), {"first": MAX_PAGE_SIZE})
+        assert errors == [], path.name
+
+    assert _validate(get_introspection_query()) == []
+
+
+async def test_deep_queries_are_rejected(client):
+    resp = await _post(client, DEEP_QUERY)
+
+    assert resp.status_code == 400
+    [error] = resp.json()["errors"]
+    assert error["message"] == "Query depth 13 exceeds the maximum of 10"
+
+
+async def test_cost_scales_with_first(client):
+    resp = await _post(client, ENTRY_TAGS_QUERY, {"first": 5})
+    assert resp.status_code == 200
+    assert "errors" not in resp.json()
+
+    # Same document, now served from the validation cache
+    resp = await _post(client, ENTRY_TAGS_QUERY, {"first": MAX_PAGE_SIZE})
+    assert resp.status_code == 400
+    [error] = resp.json()["errors"]
+    assert error["message"] == "Query cost 12020 exceeds the maximum of 5000"
+    assert error["extensions"]["cost"] == {"requested": 12020, "maximum": 5000}
+
+
+async def test_page_size_is_capped(client):
+    for first in (0, MAX_PAGE_SIZE + 1):
+        body = await gql(
+            client,
+            "query($first: Int) { moodEntries(first: $first) { edges { cursor } } }",
+            {"first": first},
+            expect_errors=True,
+            headers=H,
+        )
+        assert body["errors"][0]["message"] == (
+            f"first must be between 1 and {MAX_PAGE_SIZE}"
+        )
+
+
+async def test_fragment_cycles_are_reported_not_followed(client):
+    resp = await _post(
+        client,
+        """
+        query { users { ...Shares } }
+        fragment Shares on User { sharedWith { user { ...Shares } } }
+        """,
+    )
+    assert resp.status_code == 400
+    message = resp.json()["errors"][0]["message"]
+    assert message == "Cannot spread fragment 'Shares' within itself."
@@ -0,0 +1,165 @@
+"""
+Plan-regression tests for the timeline queries.
+
+Seeds a few thousand entries, then checks EXPLAIN ANALYZE output so the
+per-author keyset pagination keeps using indexes and stops after the
+requested page, in both custom and generic plans.
+"""
+
+import pytest
+
+from moods.data import Shares, Users
+from moods.data.utils import queries
+
+ENTRIES_PER_USER = 3000
+PAGE_LIMIT = 26
+SCANNED_TABLES = {"mood_entries", "mood_entry_visibility"}
+
+
+@pytest.fixture
+async def seeded(pool):
+    alice = await Users(pool).create_user(name="Alice", email="alice@test.com")
+    bob = await Users(pool).create_user(name="Bob", email="bob@test.com")
+
+    async with pool.acquire() as conn:
+        entry_ids = [
+            r["id"]
+            for r in await conn.fetch(
+                """
+                insert into mood_entries (user_id, mood, notes, created_at)
+                select u.id, (i % 10) + 1, 'seed', now() - i * interval '1 hour'
+                from unnest($1::uuid[]) u(id), generate_series(1, $2) i
+                returning id
+                """,
+                [alice["id"], bob["id"]],
+                ENTRIES_PER_USER,
+            )
+        ]
+        await queries.add_entries_visibility(conn, entry_ids=entry_ids)
+
+    await Shares(pool).set_shares(
+        user_id=str(alice["id"]),
+        rules=[{"user_id": str(bob["id"]), "filters": []}],
+    )
+
+    async with pool.acquire() as conn:
+        await queries.refresh_entries_delta(conn, entry_ids=entry_ids)
+        await conn.execute("ANALYZE mood_entries, mood_entry_visibility")
+
+    return {"alice": alice["id"], "bob": bob["id"]}
+
+
+def _literal(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, list):
+        return "'{" + ",".join(str(v) for v in value) + "}'"
+    return f"'{value}'"
+
+
+async def _explain(conn, name: str, plan_cache_mode: str, **params) -> dict:
+    """Run a named query through PREPARE/EXECUTE and return its JSON plan."""
+    order = queries.driver_adapter.var_sorted[name]
+    args = ", ".join(_literal(params[p]) for p in order)
+    await conn.execute(f"SET plan_cache_mode = {plan_cache_mode}")
+    await conn.execute(f"PREPARE plan_check AS {getattr(queries, name).sql}")
+    try:
+        result = await conn.fetchval(
+            f"EXPLAIN (ANALYZE, FORMAT JSON) EXECUTE plan_check({args})"
+        )
+    finally:
+        await conn.execute("DEALLOCATE plan_check")
+        await conn.execute("RESET plan_cache_mode")
+    return result[0]["Plan"]
+
+
+def _nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def _assert_bounded(plan: dict, max_rows: int):
+    examined = dict.fromkeys(SCANNED_TABLES, 0)
+    for node in _nodes(plan):
+        relation = node.get("Relation Name")
+        if relation not in SCANNED_TABLES:
+            continue
+        assert node["Node Type"] != "Seq Scan", node
+        rows = node["Actual Rows"] + node.get("Rows Removed by Filter", 0)
+        examined[relation] += rows * node["Actual Loops"]
+    for relation, rows in examined.items():
+        assert rows <= max_rows, (relation, rows)
+
+
+async def _cursor_at(conn, viewer_id, offset: int, user_id=None):
+    return await conn.fetchval(
+        """
+        select entry_id from mood_entry_visibility
+        where viewer_id = $1 and ($2::uuid is null or user_id = $2)
+        order by entry_id desc
+        offset $3 limit 1
+        """,
+        viewer_id,
+        user_id,
+        offset,
+    )
+
+
+@pytest.mark.parametrize("plan_cache_mode", ["auto", "force_generic_plan"])
+@pytest.mark.parametrize("page", [0, 80])
+async def test_author_page_is_bounded(pool, seeded, plan_cache_mode, page):
+    async with pool.acquire() as conn:
+        after_id = (
+            await _cursor_at(
+                conn, seeded["bob"], page * PAGE_LIMIT, user_id=seeded["alice"]
+            )
+            if page
+            else None
+        )
+        plan = await _explain(
+            conn,
+            "get_author_mood_entries",
+            plan_cache_mode,
+            viewer_id=seeded["bob"],
+            user_id=seeded["alice"],
+            include_archived=False,
+            after_id=after_id,
+            page_limit=PAGE_LIMIT,
+            with_notes=True,
+            with_tags=True,
+            with_user=True,
+        )
+    assert plan["Actual Rows"] == PAGE_LIMIT
+    _assert_bounded(plan, max_rows=2 * PAGE_LIMIT)
+
+
+@pytest.mark.parametrize("plan_cache_mode", ["auto", "force_generic_plan"])
+async def test_unrequested_lookups_are_not_executed(pool, seeded, plan_cache_mode):
+    async with pool.acquire() as conn:
+        plan = await _explain(
+            conn,
+            "get_mood_entries_live",
+            plan_cache_mode,
+            viewer_id=seeded["bob"],
+            user_ids=[seeded["alice"]],
+            include_archived=False,
+            after_id=None,
+            page_limit=PAGE_LIMIT,
+            with_delta=False,
+            with_notes=False,
+            with_tags=False,
+            with_user=False,
+        )
+    lookups = [
+        node
+        for node in _nodes(plan)
+        if node.get("Relation Name") in {"mood_entry_tags", "tags", "users"}
+        or node.get("Alias") == "p"
+    ]
+    # Custom plans drop them outright, generic plans gate them off
+    assert all(node["Actual Loops"] == 0 for node in lookups), lookups
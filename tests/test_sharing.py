@@ -1,3 +1,10 @@
+import asyncio
+
+import pytest
+
+from moods.data import Moods, Shares, loaders
+from moods.data.shares import match_new_filters, match_new_tags
+from moods.data.utils import queries
 from tests.conftest import auth_header, gql
 
 H = auth_header("00000000-0000-0000-0000-000000000000")
@@ -16,6 +23,15 @@ mutation UpdateSharing($input: UpdateSharingInput!) {
 }
 """
 
+SYNC_SHARING = """
+mutation SyncSharing($input: UpdateSharingInput!) {
+  syncSharing(input: $input) {
+    changed
+    user { id sharedWith { id user { id name } filters { id pattern isInclude } } }
+  }
+}
+"""
+
 USER_SHARED_WITH = """
 query User($id: ID!) {
   user(id: $id) {
@@ -107,6 +123,92 @@ async def test_update_sharing_replaces_rules(client):
     assert user["sharedWith"][0]["user"]["id"] == carol["id"]
 
 
+async def test_sync_sharing_reports_unchanged(client):
+    alice = await _create_user(client, "Alice", "alice@example.com")
+    bob = await _create_user(client, "Bob", "bob@example.com")
+    rules = [
+        {
+            "userId": bob["id"],
+            "filters": [
+                {"pattern": "happy", "isInclude": True},
+                {"pattern": "private", "isInclude": False},
+            ],
+        }
+    ]
+
+    first = await gql(
+        client,
+        SYNC_SHARING,
+        {"input": {"rules": rules}},
+        headers=auth_header(alice["id"]),
+    )
+    rules[0]["filters"].reverse()
+    second = await gql(
+        client,
+        SYNC_SHARING,
+        {"input": {"rules": rules}},
+        headers=auth_header(alice["id"]),
+    )
+
+    assert first["data"]["syncSharing"]["changed"] is True
+    assert second["data"]["syncSharing"]["changed"] is False
+    assert second["data"]["syncSharing"]["user"] == first["data"]["syncSharing"]["user"]
+
+
+async def test_sync_sharing_keeps_unchanged_rows(client):
+    alice = await _create_user(client, "Alice", "alice@example.com")
+    bob = await _create_user(client, "Bob", "bob@example.com")
+    happy = {"pattern": "happy", "isInclude": True}
+    sad = {"pattern": "sad", "isInclude": True}
+
+    body = await gql(
+        client,
+        SYNC_SHARING,
+        {"input": {"rules": [{"userId": bob["id"], "filters": [happy]}]}},
+        headers=auth_header(alice["id"]),
+    )
+    [before] = body["data"]["syncSharing"]["user"]["sharedWith"]
+
+    body = await gql(
+        client,
+        SYNC_SHARING,
+        {"input": {"rules": [{"userId": bob["id"], "filters": [happy, sad]}]}},
+        headers=auth_header(alice["id"]),
+    )
+    assert body["data"]["syncSharing"]["changed"] is True
+    [after] = body["data"]["syncSharing"]["user"]["sharedWith"]
+
+    assert after["id"] == before["id"]
+    filter_ids = {f["pattern"]: f["id"] for f in after["filters"]}
+    assert filter_ids["happy"] == before["filters"][0]["id"]
+    assert set(filter_ids) == {"happy", "sad"}
+
+
+async def test_sharing_accepts_uppercase_user_ids(client):
+    alice = await _create_user(client, "Alice", "alice@example.com")
+    bob = await _create_user(client, "Bob", "bob@example.com")
+    rules = [{"userId": bob["id"].upper(), "filters": []}]
+
+    body = await gql(
+        client,
+        SYNC_SHARING,
+        {"input": {"rules": rules}},
+        headers=auth_header(alice["id"]),
+    )
+    assert body["data"]["syncSharing"]["changed"] is True
+    [rule] = body["data"]["syncSharing"]["user"]["sharedWith"]
+    assert rule["user"]["id"] == bob["id"]
+
+    # The same viewer in either case is the same rule
+    body = await gql(
+        client,
+        SYNC_SHARING,
+        {"input": {"rules": rules}},
+        headers=auth_header(alice["id"]),
+    )
+    assert body["data"]["syncSharing"]["changed"] is False
+
+
 async def test_shared_entries_visible(client):
     alice = await _create_user(client, "Alice", "alice@example.com")
     bob = await _create_user(client, "Bob", "bob@example.com")
@@ -469,3 +571,168 @@ async def test_entries_with_no_tags_visible_with_exclude_only(client):
     entries = await _query_entries(client, headers=auth_header(bob["id"]))
     assert len(entries) == 1
     assert entries[0]["mood"] == 5
+
+
+async def test_filter_matches_tags_created_after_share(client):
+    alice = await _create_user(client, "Alice", "alice@example.com")
+    bob = await _create_user(client, "Bob", "bob@example.com")
+
+    # Filters exist before any of the tags they should match
+    await gql(
+        client,
+        UPDATE_SHARING,
+        {
+            "input": {
+                "rules": [
+                    {
+                        "userId": bob["id"],
+                        "filters": [
+                            {"pattern": "^hap", "isInclude": True},
+                            {"pattern": "secret$", "isInclude": False},
+                        ],
+                    }
+                ]
+            }
+        },
+        headers=auth_header(alice["id"]),
+    )
+
+    await _log_mood(client, alice["id"], 7, tags=["happy"])
+    await _log_mood(client, alice["id"], 6, tags=["happy", "topsecret"])
+    await _log_mood(client, alice["id"], 3, tags=["unhappy"])
+
+    entries = await _query_entries(client, headers=auth_header(bob["id"]))
+    assert [e["mood"] for e in entries] == [7]
+
+
+async def test_live_query_evaluates_filter_regexes(client, pool):
+    alice = await _create_user(client, "Alice", "alice@example.com")
+    bob = await _create_user(client, "Bob", "bob@example.com")
+    await _log_mood(client, alice["id"], 7, tags=["happy"])
+    await _log_mood(client, alice["id"], 6, tags=["happy", "topsecret"])
+    await _log_mood(client, alice["id"], 3, tags=["unhappy"])
+    await gql(
+        client,
+        UPDATE_SHARING,
+        {
+            "input": {
+                "rules": [
+                    {
+                        "userId": bob["id"],
+                        "filters": [
+                            {"pattern": "^hap", "isInclude": True},
+                            {"pattern": "secret$", "isInclude": False},
+                        ],
+                    }
+                ]
+            }
+        },
+        headers=auth_header(alice["id"]),
+    )
+
+    # The live query is the check on the match table, so must not read it
+    async with pool.acquire() as conn:
+        await conn.execute("delete from share_filter_tag_matches")
+    live = Moods(pool, use_visibility_index=False)
+    page = await live.get_mood_entries(viewer_id=bob["id"])
+    assert [e["node"]["mood"] for e in page["edges"]] == [7]
+
+
+async def test_shared_with_is_batched_across_users(client, pool):
+    alice = await _create_user(client, "Alice", "alice@example.com")
+    bob = await _create_user(client, "Bob", "bob@example.com")
+    carol = await _create_user(client, "Carol", "carol@example.com")
+    work_filter = [{"pattern": "^work", "isInclude": False}]
+    rules = {
+        alice["id"]: [
+            {"userId": bob["id"], "filters": work_filter},
+            {"userId": carol["id"], "filters": []},
+        ],
+        bob["id"]: [{"userId": alice["id"], "filters": work_filter}],
+    }
+    for owner_id, owner_rules in rules.items():
+        await gql(
+            client,
+            UPDATE_SHARING,
+            {"input": {"rules": owner_rules}},
+            headers=auth_header(owner_id),
+        )
+
+    loader = loaders.ShareRulesLoader(pool)
+    owners = [alice["id"], bob["id"], carol["id"]]
+    batched = await loader.load_many(owners)
+    for owner_id, rules in zip(owners, batched, strict=True):
+        expected = await Shares(pool).get_shares(owner_id)
+        assert [_rule(r) for r in rules] == [_rule(r) for r in expected]
+
+    body = await gql(
+        client,
+        "query { users { id sharedWith { user { name } filters { pattern } } } }",
+        headers=H,
+    )
+    shared_with = {u["id"]: u["sharedWith"] for u in body["data"]["users"]}
+    assert shared_with[alice["id"]] == [
+        {"user": {"name": "Bob"}, "filters": [{"pattern": "^work"}]},
+        {"user": {"name": "Carol"}, "filters": []},
+    ]
+    assert shared_with[bob["id"]] == [
+        {"user": {"name": "Alice"}, "filters": [{"pattern": "^work"}]}
+    ]
+    assert shared_with[carol["id"]] == []
+
+
+def _rule(share):
+    return (
+        str(share["id"]),
+        str(share["shared_with"]),
+        [(str(f["id"]), f["pattern"], f["is_include"]) for f in share["filters"]],
+    )
+
+
+async def _new_filter(conn, owner_id, viewer_id, pattern):
+    [share] = [
+        s
+        async for s in queries.create_shares(
+            conn, user_id=owner_id, shared_with=[viewer_id]
+        )
+    ]
+    return [
+        f["id"]
+        async for f in queries.create_share_filters(
+            conn, share_ids=[share["id"]], patterns=[pattern], is_includes=[False]
+        )
+    ]
+
+
+@pytest.mark.parametrize("tag_first", [True, False])
+async def test_concurrent_filter_and_tag_are_matched(client, pool, tag_first):
+    alice = await _create_user(client, "Alice", "alice@example.com")
+    bob = await _create_user(client, "Bob", "bob@example.com")
+
+    async with pool.acquire() as filter_conn, pool.acquire() as tag_conn:
+        filter_tx = filter_conn.transaction()
+        tag_tx = tag_conn.transaction()
+        await filter_tx.start()
+        await tag_tx.start()
+        # Neither transaction can see the other's row when it matches
+        filter_ids = await _new_filter(filter_conn, alice["id"], bob["id"], "secret")
+        await tag_conn.execute("insert into tags (name) values ('topsecret')")
+
+        tag = (match_new_tags(tag_conn, ["topsecret"]), tag_tx)
+        filter_ = (match_new_filters(filter_conn, filter_ids), filter_tx)
+        (first, first_tx), (second, second_tx) = (
+            (tag, filter_) if tag_first else (filter_, tag)
+        )
+
+        await first
+        waiting = asyncio.create_task(second)
+        await asyncio.sleep(0.1)
+        assert not waiting.done()
+        await first_tx.commit()
+        await waiting
+        await second_tx.commit()
+
+    matches = await pool.fetch(
+        "select filter_id, tag_name from share_filter_tag_matches"
+    )
+    assert [tuple(m) for m in matches] == [(filter_ids[0], "topsecret")]
@@ -0,0 +1,189 @@
+import asyncio
+import json
+
+from tests.conftest import _app, _mint_token, auth_header, gql
+
+H = auth_header("00000000-0000-0000-0000-000000000000")
+
+CREATE_USER = """
+mutation CreateUser($input: CreateUserInput!) {
+  createUser(input: $input) { id }
+}
+"""
+
+LOG_MOOD = """
+mutation LogMood($input: LogMoodInput!) {
+  logMood(input: $input) { id }
+}
+"""
+
+UPDATE_SHARING = """
+mutation UpdateSharing($input: UpdateSharingInput!) {
+  updateSharing(input: $input) { id }
+}
+"""
+
+MOOD_ENTRY_LOGGED = """
+subscription MoodEntryLogged($userIds: [ID!]) {
+  moodEntryLogged(userIds: $userIds) { id mood delta user { name } tags { name } }
+}
+"""
+
+
+class GraphQLWebSocket:
+    """Drives the app's graphql-transport-ws endpoint in-process over ASGI."""
+
+    def __init__(self, headers: dict | None = None):
+        self.to_app: asyncio.Queue = asyncio.Queue()
+        self.from_app: asyncio.Queue = asyncio.Queue()
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": "/graphql",
+            "raw_path": b"/graphql",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [
+                (k.lower().encode(), v.encode()) for k, v in (headers or {}).items()
+            ],
+            "subprotocols": ["graphql-transport-ws"],
+            "server": ("test", 80),
+            "client": ("test", 1234),
+        }
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(
+            _app(self.scope, self.to_app.get, self.from_app.put)
+        )
+        await self.to_app.put({"type": "websocket.connect"})
+        assert (await self._receive())["type"] == "websocket.accept"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.to_app.put({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(self.task, timeout=5)
+
+    async def _receive(self, timeout=5):
+        return await asyncio.wait_for(self.from_app.get(), timeout=timeout)
+
+    async def send(self, message: dict) -> None:
+        await self.to_app.put(
+            {"type": "websocket.receive", "text": json.dumps(message)}
+        )
+
+    async def receive(self, timeout=5) -> dict:
+        message = await self._receive(timeout)
+        assert message["type"] == "websocket.send", message
+        return json.loads(message["text"])
+
+    async def init(self, payload: dict | None = None) -> None:
+        await self.send({"type": "connection_init", "payload": payload or {}})
+        assert (await self.receive())["type"] == "connection_ack"
+
+    async def subscribe(self, query: str, variables: dict | None = None) -> None:
+        await self.send(
+            {
+                "id": "1",
+                "type": "subscribe",
+                "payload": {"query": query, "variables": variables or {}},
+            }
+        )
+
+
+async def _create_user(client, name, email):
+    body = await gql(
+        client, CREATE_USER, {"input": {"name": name, "email": email}}, headers=H
+    )
+    return body["data"]["createUser"]["id"]
+
+
+async def _log_mood(client, user_id, mood, tags=None):
+    body = await gql(
+        client,
+        LOG_MOOD,
+        {"input": {"mood": mood, "notes": "", "tags": tags or []}},
+        headers=auth_header(user_id),
+    )
+    return body["data"]["logMood"]["id"]
+
+
+async def _share(client, owner_id, viewer_id, filters=None):
+    rules = [{"userId": viewer_id, "filters": filters or []}]
+    await gql(
+        client,
+        UPDATE_SHARING,
+        {"input": {"rules": rules}},
+        headers=auth_header(owner_id),
+    )
+
+
+async def _subscribed(events, count=1):
+    """Wait until the subscription streams are listening on the bus."""
+    async with asyncio.timeout(5):
+        while len(events.subscriptions) < count:
+            await asyncio.sleep(0.01)
+
+
+async def _next_entry(ws) -> dict:
+    message = await ws.receive()
+    assert message["type"] == "next", message
+    assert "errors" not in message["payload"], message["payload"]
+    return message["payload"]["data"]["moodEntryLogged"]
+
+
+async def test_partner_receives_entries_through_share_filters(client, events):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    bob = await _create_user(client, "Bob", "bob@test.com")
+    carol = await _create_user(client, "Carol", "carol@test.com")
+    await _share(client, alice, bob, [{"pattern": "^private", "isInclude": False}])
+    await _log_mood(client, alice, 4)
+
+    async with GraphQLWebSocket(auth_header(bob)) as ws:
+        await ws.init()
+        await ws.subscribe(MOOD_ENTRY_LOGGED)
+        await _subscribed(events)
+
+        shared = await _log_mood(client, alice, 7, tags=["work"])
+        await _log_mood(client, alice, 1, tags=["private-diary"])
+        await _log_mood(client, carol, 5)
+        own = await _log_mood(client, bob, 6)
+
+        # Events arrive in commit order, so the hidden ones were skipped
+        entry = await _next_entry(ws)
+        assert entry["id"] == shared
+        assert entry["delta"] == 3
+        assert entry["user"] == {"name": "Alice"}
+        assert entry["tags"] == [{"name": "work"}]
+        assert (await _next_entry(ws))["id"] == own
+
+    assert not events.subscriptions
+
+
+async def test_subscription_follows_sharing_changes(client, events):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    bob = await _create_user(client, "Bob", "bob@test.com")
+
+    token = _mint_token(bob)
+    async with GraphQLWebSocket() as ws:
+        await ws.init({"token": token})
+        await ws.subscribe(MOOD_ENTRY_LOGGED, {"userIds": [alice]})
+        await _subscribed(events)
+
+        await _log_mood(client, alice, 3)
+        await _log_mood(client, bob, 5)
+        await _share(client, alice, bob)
+        shared = await _log_mood(client, alice, 8)
+
+        assert (await _next_entry(ws))["id"] == shared
+
+
+async def test_subscription_requires_auth(client, events):
+    async with GraphQLWebSocket() as ws:
+        await ws.init()
+        await ws.subscribe(MOOD_ENTRY_LOGGED)
+
+        message = await ws.receive()
+        assert message["type"] == "error"
+        assert message["payload"][0]["message"] == "Authentication required"
+    assert not events.subscriptions
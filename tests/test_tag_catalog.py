@@ -0,0 +1,132 @@
+import asyncio
+import contextlib
+
+from moods.data import Moods, TagCatalog, Tags, Users
+from tests.conftest import auth_header, gql
+
+TAG_NAMES = [
+    "anxious",
+    "anxiety",
+    "calm",
+    "calming music",
+    "self-care",
+    "selfcare",
+    "work",
+    "workout",
+    "work_stress",
+    "walk",
+    "walking 5k",
+    "gym",
+    "sleep",
+    "slept-well",
+]
+
+SEARCHES = ["anx", "work", "walkin", "self care", "calm musik", "5k", "slep", "zz"]
+
+ENTRY_TAGS_QUERY = """
+query { moodEntries { edges { node { tags { name metadata archivedAt } } } } }
+"""
+
+UPDATE_TAG_METADATA = """
+mutation UpdateTagMetadata($input: UpdateTagMetadataInput!) {
+  updateTagMetadata(input: $input) { name }
+}
+"""
+
+
+async def _log_tags(pool, tag_names) -> str:
+    user = await Users(pool).create_user(name="Tagger", email="tag@test.com")
+    await Moods(pool).create_mood_entry(
+        user_id=str(user["id"]), mood=5, notes="", tags=tag_names
+    )
+    return str(user["id"])
+
+
+async def test_search_matches_pg_trgm(pool):
+    await _log_tags(pool, TAG_NAMES)
+    await Tags(pool).archive_tag("calm")
+    snapshot = await TagCatalog(pool).snapshot()
+
+    async with pool.acquire() as conn:
+        for search in SEARCHES:
+            for include_archived in (False, True):
+                expected = [
+                    r["name"]
+                    for r in await conn.fetch(
+                        """
+                        select name from tags
+                        where name % $1 and ($2 or archived_at is null)
+                        order by similarity(name, $1) desc, name
+                        """,
+                        search,
+                        include_archived,
+                    )
+                ]
+                actual = snapshot.search(
+                    search,
+                    include_archived=include_archived,
+                    after_name=None,
+                    limit=len(TAG_NAMES),
+                )
+                assert [t["name"] for t in actual] == expected, search
+
+
+async def test_snapshot_is_rebuilt_after_writes(pool):
+    catalog = TagCatalog(pool)
+    moods = Moods(pool, tag_catalog=catalog)
+    tags = Tags(pool, catalog=catalog)
+    user_id = await _log_tags(pool, ["calm"])
+
+    first = await catalog.snapshot()
+    assert await catalog.snapshot() is first
+    assert first.names == ("calm",)
+
+    # Logging known tags leaves the catalog alone; a new tag replaces it
+    await moods.create_mood_entry(user_id=user_id, mood=5, notes="", tags=["calm"])
+    assert await catalog.snapshot() is first
+    await moods.create_mood_entries(
+        user_id=user_id, entries=[{"mood": 4, "notes": "", "tags": ["gym"]}]
+    )
+    assert (await catalog.snapshot()).names == ("calm", "gym")
+
+    await tags.update_tag_metadata("gym", {"emoji": "💪"})
+    assert (await catalog.snapshot()).get("gym")["metadata"] == {"emoji": "💪"}
+    await tags.archive_tag("gym")
+    page = await tags.get_tags()
+    assert [e["node"]["name"] for e in page["edges"]] == ["calm"]
+
+
+async def test_entry_tags_come_from_the_catalog(client, pool):
+    user_id = await _log_tags(pool, ["calm", "walk"])
+    h = auth_header(user_id)
+    await gql(
+        client,
+        UPDATE_TAG_METADATA,
+        {"input": {"name": "walk", "metadata": {"color": "green"}}},
+        headers=h,
+    )
+
+    body = await gql(client, ENTRY_TAGS_QUERY, headers=h)
+    [edge] = body["data"]["moodEntries"]["edges"]
+    assert edge["node"]["tags"] == [
+        {"name": "calm", "metadata": {}, "archivedAt": None},
+        {"name": "walk", "metadata": {"color": "green"}, "archivedAt": None},
+    ]
+
+
+async def test_writes_from_other_processes_invalidate(pool, events):
+    catalog = TagCatalog(pool)
+    await _log_tags(pool, ["calm"])
+    await catalog.snapshot()
+    follow = asyncio.create_task(catalog.follow(events))
+    try:
+        await asyncio.sleep(0)
+        # Another process, with its own catalog
+        await Tags(pool).update_tag_metadata("calm", {"emoji": "😌"})
+        async with asyncio.timeout(5):
+            while (await catalog.snapshot()).get("calm")["metadata"] == {}:
+                await asyncio.sleep(0.01)
+    finally:
+        follow.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await follow
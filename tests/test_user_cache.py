@@ -0,0 +1,111 @@
+import asyncio
+import contextlib
+from datetime import timedelta
+
+from moods.data import UserCache, Users
+from tests.conftest import _app, auth_header, gql
+
+H = auth_header("00000000-0000-0000-0000-000000000000")
+
+CREATE_USER = """
+mutation CreateUser($input: CreateUserInput!) {
+  createUser(input: $input) { id }
+}
+"""
+
+USER_QUERY = """
+query User($id: ID!) {
+  user(id: $id) { id name settings archivedAt }
+}
+"""
+
+UPDATE_SETTINGS = """
+mutation UpdateSettings($input: UpdateUserSettingsInput!) {
+  updateUserSettings(input: $input) { id }
+}
+"""
+
+ARCHIVE_USER = """
+mutation ArchiveUser($id: ID!) {
+  archiveUser(id: $id) { id }
+}
+"""
+
+
+async def _create_user(client):
+    body = await gql(
+        client,
+        CREATE_USER,
+        {"input": {"name": "Alice", "email": "alice@test.com"}},
+        headers=H,
+    )
+    return body["data"]["createUser"]["id"]
+
+
+async def _get_user(client, user_id):
+    body = await gql(client, USER_QUERY, {"id": user_id}, headers=H)
+    return body["data"]["user"]
+
+
+def _stats():
+    return _app.state.user_cache.stats()
+
+
+async def test_users_are_cached_across_requests(client):
+    user_id = await _create_user(client)
+    first = await _get_user(client, user_id)
+    again = await _get_user(client, user_id)
+
+    assert first == again
+    assert _stats() == {"size": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+    resp = await client.get("/health")
+    assert resp.json()["caches"]["users"] == _stats()
+
+
+async def test_writes_invalidate_the_cache(client):
+    user_id = await _create_user(client)
+    await _get_user(client, user_id)
+
+    await gql(
+        client,
+        UPDATE_SETTINGS,
+        {"input": {"settings": {"theme": "dark"}}},
+        headers=auth_header(user_id),
+    )
+    assert (await _get_user(client, user_id))["settings"] == {"theme": "dark"}
+
+    await gql(client, ARCHIVE_USER, {"id": user_id}, headers=H)
+    assert (await _get_user(client, user_id))["archivedAt"] is not None
+    assert _stats()["hits"] == 0
+
+
+async def test_writes_from_other_processes_invalidate(client, pool, events):
+    user_id = await _create_user(client)
+    await _get_user(client, user_id)
+    follow = asyncio.create_task(_app.state.user_cache.follow(events))
+    try:
+        # Another process has its own Users, without this cache
+        await Users(pool).update_user_settings(id=user_id, settings={"a": 1})
+        async with asyncio.timeout(5):
+            while _stats()["size"]:
+                await asyncio.sleep(0.01)
+    finally:
+        follow.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await follow
+
+    assert (await _get_user(client, user_id))["settings"] == {"a": 1}
+
+
+def test_rows_expire_and_stale_reads_are_dropped():
+    cache = UserCache(ttl=timedelta(0))
+    cache.put_many([{"id": "a"}], cache.generation)
+    assert cache.get_many(["a"]) == {}
+
+    cache = UserCache()
+    generation = cache.generation
+    cache.invalidate("a")
+    cache.put_many([{"id": "a"}], generation)
+    assert cache.get_many(["a"]) == {}
+    assert cache.stats() == {"size": 0, "hits": 0, "misses": 1, "hit_rate": 0.0}
@@ -1,3 +1,4 @@
+from moods.data import Moods
 from tests.conftest import auth_header, gql
 
 H = auth_header("00000000-0000-0000-0000-000000000000")
@@ -105,3 +106,109 @@ async def test_user_entries_pagination(client):
     page3 = body["data"]["user"]["entries"]
     assert len(page3["edges"]) == 1
     assert page3["pageInfo"]["hasNextPage"] is False
+
+
+UPDATE_SHARING = """
+mutation UpdateSharing($input: UpdateSharingInput!) {
+  updateSharing(input: $input) { id }
+}
+"""
+
+USERS_WITH_ENTRIES = """
+query {
+  users {
+    id
+    entries(first: 2) {
+      edges { cursor node { id notes tags { name } user { name } } }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+"""
+
+
+async def test_user_entries_are_batched_across_users(client, pool, monkeypatch):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    bob = await _create_user(client, "Bob", "bob@test.com")
+    carol = await _create_user(client, "Carol", "carol@test.com")
+    for uid in (alice, bob, carol):
+        for i in range(3):
+            await _log_mood(client, uid, mood=i + 1, notes=f"entry {i}")
+    # Bob shares with Alice; Carol shares with nobody
+    await gql(
+        client,
+        UPDATE_SHARING,
+        {"input": {"rules": [{"userId": alice, "filters": []}]}},
+        headers=auth_header(bob),
+    )
+    moods = Moods(pool)
+    bob_entries = await moods.get_mood_entries(user_ids=[bob], viewer_id=bob)
+    await moods.archive_mood_entry(bob_entries["edges"][0]["node"]["id"], bob)
+
+    own_page = await moods.get_mood_entries(user_ids=[alice], first=1)
+    pages = [
+        {"user_id": alice, "include_archived": False, "first": 2, "after": None},
+        {
+            "user_id": alice,
+            "include_archived": False,
+            "first": 2,
+            "after": own_page["page_info"]["end_cursor"],
+        },
+        {"user_id": bob, "include_archived": False, "first": None, "after": None},
+        {"user_id": bob, "include_archived": True, "first": 1, "after": None},
+        {"user_id": carol, "include_archived": False, "first": 5, "after": None},
+    ]
+    batched = await moods.get_author_pages(viewer_id=alice, pages=pages)
+    for page, connection in zip(pages, batched, strict=True):
+        expected = await moods.get_mood_entries(
+            user_ids=[page["user_id"]],
+            include_archived=page["include_archived"],
+            first=page["first"],
+            after=page["after"],
+            viewer_id=alice,
+        )
+        assert connection == expected
+    assert batched[-1]["edges"] == []
+
+    calls = []
+    get_author_pages = Moods.get_author_pages
+
+    async def counted(self, **kwargs):
+        calls.append(kwargs["pages"])
+        return await get_author_pages(self, **kwargs)
+
+    monkeypatch.setattr(Moods, "get_author_pages", counted)
+    body = await gql(client, USERS_WITH_ENTRIES, headers=auth_header(alice))
+    assert [len(pages) for pages in calls] == [3]
+    entries = {u["id"]: u["entries"] for u in body["data"]["users"]}
+    assert [e["node"]["notes"] for e in entries[alice]["edges"]] == [
+        "entry 2",
+        "entry 1",
+    ]
+    assert entries[alice]["pageInfo"]["hasNextPage"] is True
+    assert [e["node"]["notes"] for e in entries[bob]["edges"]] == ["entry 1", "entry 0"]
+    assert entries[bob]["pageInfo"]["hasNextPage"] is False
+    assert entries[bob]["edges"][0]["node"]["user"] == {"name": "Bob"}
+    assert entries[carol]["edges"] == []
+
+
+async def test_user_entries_argument_errors_stay_on_their_field(client):
+    alice = await _create_user(client, "Alice", "alice@test.com")
+    bob = await _create_user(client, "Bob", "bob@test.com")
+    await _log_mood(client, alice)
+
+    body = await gql(
+        client,
+        f"""
+        query {{
+          alice: user(id: "{alice}") {{ entries(first: 1) {{ edges {{ cursor }} }} }}
+          bob: user(id: "{bob}") {{ entries(first: 0) {{ edges {{ cursor }} }} }}
+        }}
+        """,
+        expect_errors=True,
+        headers=auth_header(alice),
+    )
+    assert len(body["data"]["alice"]["entries"]["edges"]) == 1
+    assert body["data"]["bob"] is None
+    [error] = body["errors"]
+    assert error["path"] == ["bob", "entries"]
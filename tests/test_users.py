@@ -59,6 +59,20 @@ async def test_create_user(client):
     assert user["archivedAt"] is None
 
 
+async def test_create_user_retry_with_client_mutation_id(client):
+    variables = {
+        "input": {
+            "name": "Alice",
+            "email": "alice@example.com",
+            "clientMutationId": "k",
+        }
+    }
+    first = await gql(client, CREATE_USER, variables, headers=H)
+    retry = await gql(client, CREATE_USER, variables, headers=H)
+
+    assert retry["data"]["createUser"] == first["data"]["createUser"]
+
+
 async def test_list_users(client):
     await _create_user(client, "Alice", "alice@example.com")
     await _create_user(client, "Bob", "bob@example.com")
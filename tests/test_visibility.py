@@ -0,0 +1,232 @@
+from datetime import UTC
+
+from moods.data import Moods
+from tests.conftest import auth_header, gql
+
+H = auth_header("00000000-0000-0000-0000-000000000000")
+
+CREATE_USER = """
+mutation CreateUser($input: CreateUserInput!) {
+  createUser(input: $input) { id }
+}
+"""
+
+LOG_MOOD = """
+mutation LogMood($input: LogMoodInput!) {
+  logMood(input: $input) { id }
+}
+"""
+
+LOG_MOODS = """
+mutation LogMoods($inputs: [LogMoodInput!]!) {
+  logMoods(inputs: $inputs) { id }
+}
+"""
+
+ARCHIVE_ENTRY = """
+mutation ArchiveMoodEntry($id: ID!) {
+  archiveMoodEntry(id: $id) { id }
+}
+"""
+
+UPDATE_SHARING = """
+mutation UpdateSharing($input: UpdateSharingInput!) {
+  updateSharing(input: $input) { id }
+}
+"""
+
+
+async def _create_user(client, name, email):
+    body = await gql(
+        client, CREATE_USER, {"input": {"name": name, "email": email}}, headers=H
+    )
+    return body["data"]["createUser"]["id"]
+
+
+async def _log_mood(client, user_id, mood, tags=None):
+    body = await gql(
+        client,
+        LOG_MOOD,
+        {"input": {"mood": mood, "notes": "", "tags": tags or []}},
+        headers=auth_header(user_id),
+    )
+    return body["data"]["logMood"]["id"]
+
+
+async def _share(client, owner_id, rules):
+    await gql(
+        client,
+        UPDATE_SHARING,
+        {"input": {"rules": rules}},
+        headers=auth_header(owner_id),
+    )
+
+
+async def _assert_matches_live(pool, viewer_ids, **kwargs):
+    indexed = Moods(pool)
+    live = Moods(pool, use_visibility_index=False)
+    for viewer_id in viewer_ids:
+        expected = await live.get_mood_entries(viewer_id=viewer_id, first=100, **kwargs)
+        actual = await indexed.get_mood_entries(
+            viewer_id=viewer_id, first=100, **kwargs
+        )
+        assert actual == expected
+
+
+async def _assert_stats_match_live(pool, viewer_ids):
+    live = Moods(pool, use_visibility_index=False)
+    for viewer_id in viewer_ids:
+        page = await live.get_mood_entries(viewer_id=viewer_id, first=100)
+        by_day = {}
+        for edge in page["edges"]:
+            entry = edge["node"]
+            key = (entry["user_id"], entry["created_at"].astimezone(UTC).date())
+            by_day.setdefault(key, []).append(entry["mood"])
+        expected = {
+            key: (len(moods), min(moods), max(moods)) for key, moods in by_day.items()
+        }
+
+        stats = await Moods(pool).get_mood_stats(viewer_id=viewer_id)
+        actual = {
+            (r["user_id"], r["bucket_start"].astimezone(UTC).date()): (
+                r["count"],
+                r["min"],
+                r["max"],
+            )
+            for r in stats
+        }
+        assert actual == expected
+
+
+async def test_visibility_matches_live_query(client, pool):
+    alice = await _create_user(client, "Alice", "alice@example.com")
+    bob = await _create_user(client, "Bob", "bob@example.com")
+    carol = await _create_user(client, "Carol", "carol@example.com")
+
+    await _log_mood(client, alice, 7, tags=["happy"])
+    await _log_mood(client, alice, 3, tags=["sad", "private"])
+    await _log_mood(client, alice, 5)
+    await _log_mood(client, bob, 6, tags=["work"])
+
+    await _share(
+        client,
+        alice,
+        [
+            {"userId": bob, "filters": [{"pattern": "^priv", "isInclude": False}]},
+            {"userId": carol, "filters": [{"pattern": "happy", "isInclude": True}]},
+        ],
+    )
+    await _share(client, bob, [{"userId": alice, "filters": []}])
+
+    # Entries logged after the share rules exist are indexed on insert
+    await _log_mood(client, alice, 9, tags=["happy", "private"])
+    await _log_mood(client, bob, 2)
+
+    viewers = [alice, bob, carol]
+    await _assert_matches_live(pool, viewers)
+    await _assert_matches_live(pool, viewers, user_ids=[alice])
+    await _assert_matches_live(pool, viewers, include_archived=True)
+
+
+async def test_visibility_follows_share_changes(client, pool):
+    alice = await _create_user(client, "Alice", "alice@example.com")
+    bob = await _create_user(client, "Bob", "bob@example.com")
+    await _log_mood(client, alice, 7, tags=["happy"])
+    entry_id = await _log_mood(client, alice, 4, tags=["sad"])
+
+    await _share(
+        client,
+        alice,
+        [{"userId": bob, "filters": [{"pattern": "happy", "isInclude": True}]}],
+    )
+    await _assert_matches_live(pool, [alice, bob])
+
+    await _share(client, alice, [{"userId": bob, "filters": []}])
+    await _assert_matches_live(pool, [alice, bob])
+    await _assert_stats_match_live(pool, [alice, bob])
+
+    await gql(client, ARCHIVE_ENTRY, {"id": entry_id}, headers=auth_header(alice))
+    await _assert_matches_live(pool, [alice, bob])
+    await _assert_stats_match_live(pool, [alice, bob])
+    await _assert_matches_live(pool, [alice, bob], include_archived=True)
+
+    await _share(client, alice, [])
+    await _assert_matches_live(pool, [alice, bob])
+    await _assert_stats_match_live(pool, [alice, bob])
+    result = await Moods(pool).get_mood_entries(viewer_id=bob)
+    assert result["edges"] == []
+
+
+async def test_share_change_leaves_other_viewers_alone(client, pool):
+    alice = await _create_user(client, "Alice", "alice@example.com")
+    bob = await _create_user(client, "Bob", "bob@example.com")
+    carol = await _create_user(client, "Carol", "carol@example.com")
+    await _log_mood(client, alice, 7, tags=["happy"])
+    await _log_mood(client, alice, 4, tags=["sad"])
+
+    carol_rule = {"userId": carol, "filters": []}
+    await _share(client, alice, [{"userId": bob, "filters": []}, carol_rule])
+    before = await pool.fetch(
+        "select ctid, * from mood_entry_visibility where viewer_id = $1", carol
+    )
+
+    await _share(
+        client,
+        alice,
+        [
+            {"userId": bob, "filters": [{"pattern": "sad", "isInclude": False}]},
+            carol_rule,
+        ],
+    )
+    after = await pool.fetch(
+        "select ctid, * from mood_entry_visibility where viewer_id = $1", carol
+    )
+
+    assert after == before
+    await _assert_matches_live(pool, [alice, bob, carol])
+    await _assert_stats_match_live(pool, [alice, bob, carol])
+
+
+async def test_feed_pages_merge_authors_in_order(client, pool):
+    alice = await _create_user(client, "Alice", "alice@example.com")
+    bob = await _create_user(client, "Bob", "bob@example.com")
+    carol = await _create_user(client, "Carol", "carol@example.com")
+    await _share(client, alice, [{"userId": bob, "filters": []}])
+    await _share(client, carol, [{"userId": bob, "filters": []}])
+
+    for mood in range(1, 8):
+        await _log_mood(client, [alice, bob, carol][mood % 3], mood)
+
+    indexed = Moods(pool)
+    live = Moods(pool, use_visibility_index=False)
+    for user_ids in (None, [alice, carol], [carol, bob]):
+        after = None
+        while True:
+            kwargs = {"viewer_id": bob, "user_ids": user_ids, "first": 2}
+            expected = await live.get_mood_entries(after=after, **kwargs)
+            actual = await indexed.get_mood_entries(after=after, **kwargs)
+            assert actual == expected
+            if not actual["page_info"]["has_next_page"]:
+                break
+            after = actual["page_info"]["end_cursor"]
+
+
+async def test_visibility_of_batched_entries(client, pool):
+    alice = await _create_user(client, "Alice", "alice@example.com")
+    bob = await _create_user(client, "Bob", "bob@example.com")
+    await _share(
+        client,
+        alice,
+        [{"userId": bob, "filters": [{"pattern": "^priv", "isInclude": False}]}],
+    )
+    await _log_mood(client, alice, 4)
+
+    inputs = [
+        {"mood": 8, "notes": "", "tags": ["private"]},
+        {"mood": 6, "notes": "", "tags": ["Fresh-Tag"]},
+        {"mood": 2, "notes": "", "tags": []},
+    ]
+    await gql(client, LOG_MOODS, {"inputs": inputs}, headers=auth_header(alice))
+
+    await _assert_matches_live(pool, [alice, bob])
+    await _assert_stats_match_live(pool, [alice, bob])